@@ -0,0 +1,100 @@
+'''
+    Persistence format benchmark - on disk size and save/load time of the json, pickle and binary formats
+
+    The files are written to a temporary directory, the blockchain files of the repository are untouched.
+
+    Run from the repository root:
+        python -m benchmarks.bench_formats
+'''
+# std lib imports
+import contextlib
+import io
+import os
+import random
+import tempfile
+from time import perf_counter
+
+# Own imports
+from block import Block
+from transaction import Transaction
+from util.binary_format import save_binary, load_binary
+from util.files import save_data, load_data
+
+BLOCKS = 1000
+TRANSACTIONS_PER_BLOCK = 20
+ADDRESSES = 100
+REPEAT = 3
+
+def build_chain():
+    '''
+        Build a synthetic chain with keys and signatures the size of real ones
+    '''
+    rng = random.Random(0)
+    addresses = [rng.getrandbits(162 * 8).to_bytes(162, 'big').hex() for _ in range(ADDRESSES)]
+    blockchain = [Block(0, 'genesis', [], 100, 0)]
+
+    for index in range(1, BLOCKS):
+        transactions = []
+
+        for _ in range(TRANSACTIONS_PER_BLOCK):
+            sender, recipient = rng.sample(addresses, 2)
+            signature = rng.getrandbits(128 * 8).to_bytes(128, 'big').hex()
+            transactions.append(Transaction(sender, recipient, signature, round(rng.random() * 10, 2)))
+
+        transactions.append(Transaction('MINING', rng.choice(addresses), '', 10))
+        blockchain.append(Block(index, blockchain[-1].hash, transactions, rng.randrange(1000), 1552800000.0 + index))
+
+    open_transactions = blockchain[-1].transactions[:5]
+    return blockchain, list(open_transactions)
+
+def best_time(function):
+    '''
+        Run a function a few times and return the fastest run in seconds
+    '''
+    times = []
+
+    for _ in range(REPEAT):
+        start = perf_counter()
+        # load_data and save_data print their progress
+        with contextlib.redirect_stdout(io.StringIO()):
+            function()
+        times.append(perf_counter() - start)
+
+    return min(times)
+
+def main():
+    '''
+        Save and load the same chain in every format
+    '''
+    blockchain, open_transactions = build_chain()
+    os.chdir(tempfile.mkdtemp())
+
+    formats = [
+        ('json', 'blockchain.txt',
+         lambda: save_data(blockchain, open_transactions, to_json=True),
+         lambda: load_data(from_json=True)),
+        ('pickle', 'blockchain.p',
+         lambda: save_data(blockchain, open_transactions, to_json=False),
+         lambda: load_data(from_json=False)),
+        ('binary', 'blockchain.bin',
+         lambda: save_binary('blockchain.bin', blockchain, open_transactions),
+         lambda: load_binary('blockchain.bin')),
+    ]
+
+    print(f'{BLOCKS:,} blocks with {TRANSACTIONS_PER_BLOCK + 1} transactions each')
+    print(f'{"format":8s} {"size":>10s} {"save":>10s} {"load":>10s}')
+
+    for name, filename, save, load in formats:
+        save_time = best_time(save)
+        load_time = best_time(load)
+        size = os.path.getsize(filename)
+
+        print(f'{name:8s} {size / 1024:8.0f}KB {save_time * 1000:8.1f}ms {load_time * 1000:8.1f}ms')
+
+    # Every format has to load the exact same chain
+    loaded_chain, loaded_transactions = load_binary('blockchain.bin')
+    assert [block.hash for block in loaded_chain] == [block.hash for block in blockchain]
+    assert [tx.to_ordered_dict() for tx in loaded_transactions] == [tx.to_ordered_dict() for tx in open_transactions]
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+'''
+    Memory benchmark - the memory used by a synthetic chain of 100k transactions
+
+    Run from the repository root:
+        python -m benchmarks.bench_memory
+'''
+# std lib imports
+import gc
+import json
+import tracemalloc
+from collections import OrderedDict
+
+# Own imports
+from block import Block
+from transaction import Transaction
+from util.hash_util import hash_string_256
+
+TRANSACTIONS = 100000
+TRANSACTIONS_PER_BLOCK = 100
+ADDRESSES = 200
+
+
+class DictTransaction:
+    '''
+        The transaction representation from before __slots__ and address interning
+    '''
+    def __init__(self, sender, recipient, signature, amount):
+        self.sender = sender
+        self.recipient = recipient
+        self.amount = amount
+        self.signature = signature
+
+    def to_ordered_dict(self):
+        return OrderedDict([
+            ('sender', self.sender),
+            ('recipient', self.recipient),
+            ('signature', self.signature),
+            ('amount', self.amount)
+        ])
+
+
+class DictBlock:
+    '''
+        The block representation from before __slots__
+    '''
+    def __init__(self, index, previous_hash, transactions, proof, time):
+        self.index = index
+        self.previous_hash = previous_hash
+        self.transactions = transactions
+        self.proof = proof
+        self.timestamp = time
+
+    def to_dict(self):
+        hashable_block = self.__dict__.copy()
+        hashable_block['transactions'] = [tx.to_ordered_dict() for tx in hashable_block['transactions']]
+        return hashable_block
+
+def make_address(number):
+    '''
+        Create a hex encoded string the size of a 1024 bit DER public key
+    '''
+    return '30819f300d06092a864886f70d010101050003818d00' + f'{number:04x}' * 65
+
+def build_chain(block_class, transaction_class):
+    '''
+        Build a synthetic chain, every address is created again for every transaction
+        (like it would be when the chain is parsed from disk)
+    '''
+    blockchain = []
+    previous_hash = 'genesis'
+
+    for index in range(TRANSACTIONS // TRANSACTIONS_PER_BLOCK):
+        transactions = []
+
+        for position in range(TRANSACTIONS_PER_BLOCK):
+            number = index * TRANSACTIONS_PER_BLOCK + position
+            sender = make_address(number % ADDRESSES)
+            recipient = make_address((number * 7 + 1) % ADDRESSES)
+            signature = f'{number:08x}' * 32
+            transactions.append(transaction_class(sender, recipient, signature, number % 50 + 0.5))
+
+        blockchain.append(block_class(index, previous_hash, transactions, index * 3, 1552800000.0 + index))
+        previous_hash = hash_string_256(f'{index}'.encode())
+
+    return blockchain
+
+def measure(block_class, transaction_class):
+    '''
+        Build a chain and return it together with the memory it uses
+    '''
+    gc.collect()
+    tracemalloc.start()
+    blockchain = build_chain(block_class, transaction_class)
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return blockchain, used
+
+def main():
+    '''
+        Compare the memory used by both representations and confirm they serialize identically
+    '''
+    before_chain, before = measure(DictBlock, DictTransaction)
+    after_chain, after = measure(Block, Transaction)
+
+    for before_block, after_block in zip(before_chain[:10], after_chain[:10]):
+        assert json.dumps(before_block.to_dict()) == json.dumps(after_block.to_dict()), \
+            'the __slots__ classes serialize differently'
+
+    print(f'{TRANSACTIONS:,} transactions in {len(after_chain):,} blocks')
+    print(f'before: {before / 1024 / 1024:8.1f} MiB')
+    print(f'after:  {after / 1024 / 1024:8.1f} MiB  ({before / after:.1f}x smaller)')
+
+if __name__ == '__main__':
+    main()
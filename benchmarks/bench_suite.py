@@ -0,0 +1,224 @@
+'''
+    Benchmark suite - ops/sec, latency percentiles and peak memory of the hot paths
+
+    Every hot path is timed call by call, the peak memory is measured with tracemalloc in a
+    separate call afterwards (tracing slows every allocation down, so it would skew the timings).
+    The chain dependent paths run on synthetic chains of every size (see benchmarks.synthetic).
+    The results are printed and written as json, a run can be compared to an earlier one with --compare.
+
+    The files are written to a temporary directory, the blockchain files of the repository are untouched.
+
+    Run from the repository root:
+        python -m benchmarks.bench_suite
+        python -m benchmarks.bench_suite --sizes 1000 10000 --output after.json --compare before.json
+'''
+# std lib imports
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime, timezone
+from time import perf_counter
+
+# Own imports
+from benchmarks.synthetic import build_chain, load_wallets, sign_transactions, DEFAULT_WALLETS_FILE, TRANSACTIONS_PER_BLOCK
+from blockchain import Blockchain
+from util.difficulty import DEFAULT_DIFFICULTY
+from util.files import save_data, load_data
+from util.mining import ProofOfWorkMiner
+from util.verification import Verification
+from wallet import Wallet, verified_signatures
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_OUTPUT = 'benchmark_results.json'
+
+# The amount of timed calls of every hot path
+PROOF_OF_WORK_RUNS = 50
+SIGNATURE_RUNS = 200
+BALANCE_RUNS = 10000
+CHAIN_RUNS = 5
+
+def percentile(samples, fraction):
+    '''
+        Get a percentile of a list of samples
+    '''
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def run_benchmark(name, size, function, runs):
+    '''
+        Time a hot path and measure its peak memory
+
+        Arguments:
+            :name: the name of the hot path
+            :size: the amount of transactions on the chain (None if the path doesn't depend on it)
+            :function: called with the number of the run
+            :runs: the amount of timed calls
+
+        Returns:
+            A dict with the results
+    '''
+    latencies = []
+
+    # Some of the hot paths print their progress
+    with contextlib.redirect_stdout(io.StringIO()):
+        for run in range(runs):
+            start = perf_counter()
+            function(run)
+            latencies.append(perf_counter() - start)
+
+        tracemalloc.start()
+        function(runs)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'name': name,
+        'size': size,
+        'runs': runs,
+        'ops_per_sec': runs / sum(latencies),
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'peak_memory_bytes': peak,
+    }
+
+def chain_independent_benchmarks(wallets):
+    '''
+        Benchmark the hot paths that only depend on a single block or transaction
+    '''
+    blockchain, _ = build_chain(PROOF_OF_WORK_RUNS * TRANSACTIONS_PER_BLOCK, wallets, seed=1)
+    blocks = blockchain[1:]
+    miner = ProofOfWorkMiner()
+
+    # Every run mines another block, so the amount of tried nonces varies like it does for real
+    def proof_of_work(run):
+        block = blocks[run % len(blocks)]
+        miner.proof_of_work(block.transactions[:-1], block.previous_hash, DEFAULT_DIFFICULTY)
+
+    signed = sign_transactions(wallets, SIGNATURE_RUNS + 1)
+
+    # A verified transaction is cached, every run verifies a new one
+    def verify_transaction(run):
+        assert Wallet.verify_transaction(signed[run])
+
+    def verify_cached_transaction(run):
+        assert Wallet.verify_transaction(signed[0])
+
+    verified_signatures.clear()
+    results = [
+        run_benchmark('proof_of_work', None, proof_of_work, PROOF_OF_WORK_RUNS),
+        run_benchmark('verify_transaction', None, verify_transaction, SIGNATURE_RUNS),
+        run_benchmark('verify_transaction[cached]', None, verify_cached_transaction, SIGNATURE_RUNS),
+    ]
+    verified_signatures.clear()
+
+    return results
+
+def chain_benchmarks(size, wallets):
+    '''
+        Benchmark the hot paths that depend on the size of the chain, within the current directory
+    '''
+    blockchain, open_transactions = build_chain(size, wallets)
+    addresses = [wallet.public_key for wallet in wallets]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        save_data(blockchain, open_transactions, to_json=True)
+        node = Blockchain(addresses[0])
+
+    assert Verification.verify_chain(node), 'the synthetic chain is invalid'
+
+    def verify_chain(run):
+        Verification.verify_chain(node)
+
+    def get_balance(run):
+        node.get_balance(addresses[run % len(addresses)])
+
+    def save(to_json):
+        return lambda run: save_data(blockchain, open_transactions, to_json=to_json)
+
+    def load(from_json):
+        return lambda run: load_data(from_json=from_json)
+
+    # The pickle file is created by the first save
+    save(False)(0)
+
+    return [
+        run_benchmark('verify_chain', size, verify_chain, CHAIN_RUNS),
+        run_benchmark('get_balance', size, get_balance, BALANCE_RUNS),
+        run_benchmark('save_data[json]', size, save(True), CHAIN_RUNS),
+        run_benchmark('load_data[json]', size, load(True), CHAIN_RUNS),
+        run_benchmark('save_data[pickle]', size, save(False), CHAIN_RUNS),
+        run_benchmark('load_data[pickle]', size, load(False), CHAIN_RUNS),
+    ]
+
+def print_results(results, baseline=None):
+    '''
+        Print the results as a table, with the change in ops/sec compared to a baseline run
+    '''
+    baseline_ops = {(result['name'], result['size']): result['ops_per_sec'] for result in baseline or []}
+
+    print(f'{"benchmark":28s} {"size":>8s} {"ops/sec":>12s} {"p50":>10s} {"p95":>10s} {"p99":>10s} {"peak mem":>10s}'
+          + (f' {"change":>8s}' if baseline else ''))
+
+    for result in results:
+        size = '-' if result['size'] is None else f'{result["size"]:,}'
+        line = (
+            f'{result["name"]:28s} {size:>8s} {result["ops_per_sec"]:12,.1f} '
+            f'{result["p50_ms"]:8.3f}ms {result["p95_ms"]:8.3f}ms {result["p99_ms"]:8.3f}ms '
+            f'{result["peak_memory_bytes"] / 1024:8.0f}KB'
+        )
+
+        previous = baseline_ops.get((result['name'], result['size']))
+        if previous:
+            line += f' {(result["ops_per_sec"] / previous - 1) * 100:+7.1f}%'
+
+        print(line)
+
+def main():
+    '''
+        Run every benchmark and write the results
+    '''
+    parser = argparse.ArgumentParser(description='Benchmark the hot paths of the blockchain')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='the amounts of transactions on the synthetic chains')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='the json file the results are written to')
+    parser.add_argument('--compare', help='the json results of an earlier run to compare to')
+    parser.add_argument('--wallets', default=DEFAULT_WALLETS_FILE, help='the file the generated wallets are cached in')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    baseline = None
+
+    if args.compare:
+        with open(args.compare, 'r') as open_file:
+            baseline = json.loads(open_file.read())['results']
+
+    wallets = load_wallets(filename=args.wallets)
+    os.chdir(tempfile.mkdtemp())
+
+    results = chain_independent_benchmarks(wallets)
+    for size in args.sizes:
+        results.extend(chain_benchmarks(size, wallets))
+
+    print_results(results, baseline)
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+
+    with open(output, 'w') as open_file:
+        open_file.write(json.dumps(report, indent=2))
+
+    print(f'Results written to {output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+'''
+    valid_proof micro benchmark - hashes per second of the proof of work nonce search
+
+    Run from the repository root:
+        python -m benchmarks.bench_valid_proof
+'''
+# std lib imports
+from time import perf_counter
+
+# Own imports
+from transaction import Transaction
+from util.hash_util import hash_string_256
+from util.verification import Verification
+
+NONCES = 20000
+
+def rehash_valid_proof(transactions, last_hash, proof):
+    '''
+        The nonce check before the prefix was precomputed: everything is serialized and
+        hashed from scratch for every proof
+    '''
+    hashable_txs = [tx.to_ordered_dict() for tx in transactions]
+    guess = (str(hashable_txs) + str(last_hash) + str(proof)).encode()
+    guessed_hash = hash_string_256(guess)
+
+    return guessed_hash[:2] == '00'
+
+def seeded_valid_proof(transactions, last_hash, nonces):
+    '''
+        Check a range of nonces with a prefix that is serialized and hashed once
+    '''
+    hasher = Verification.proof_hasher(Verification.proof_prefix(transactions, last_hash))
+    return [Verification.valid_seeded_proof(hasher, proof) for proof in nonces]
+
+def make_transactions(count):
+    '''
+        Create a list of transactions that look like real ones (hex encoded keys and signatures)
+    '''
+    sender = '30819f300d06092a864886f70d010101050003818d00' + 'ab' * 140
+    recipient = '30819f300d06092a864886f70d010101050003818d00' + 'cd' * 140
+    signature = 'ef' * 128
+
+    return [Transaction(sender, recipient, signature, amount) for amount in range(count)]
+
+def hashes_per_second(function, nonces):
+    '''
+        Time a function that checks every nonce and return the hash rate
+    '''
+    start = perf_counter()
+    function(nonces)
+    elapsed = perf_counter() - start
+
+    return len(nonces) / elapsed
+
+def main():
+    '''
+        Compare the hash rate of both nonce checks and confirm they accept the same proofs
+    '''
+    last_hash = hash_string_256(b'previous block')
+    nonces = range(NONCES)
+
+    for tx_count in (0, 1, 10, 100):
+        transactions = make_transactions(tx_count)
+
+        before = [rehash_valid_proof(transactions, last_hash, proof) for proof in nonces]
+        after = seeded_valid_proof(transactions, last_hash, nonces)
+        assert before == after, 'the seeded nonce check accepted different proofs'
+
+        before_rate = hashes_per_second(
+            lambda nonces: [rehash_valid_proof(transactions, last_hash, proof) for proof in nonces], nonces)
+        after_rate = hashes_per_second(
+            lambda nonces: seeded_valid_proof(transactions, last_hash, nonces), nonces)
+
+        print(
+            f'{tx_count:4d} transactions: '
+            f'before {before_rate:12,.0f} H/s  '
+            f'after {after_rate:12,.0f} H/s  '
+            f'({after_rate / before_rate:6.1f}x)'
+        )
+
+if __name__ == '__main__':
+    main()
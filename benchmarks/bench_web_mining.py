@@ -0,0 +1,103 @@
+'''
+    Web mining benchmark - /chain latency while blocks are mined in the background
+
+    The node runs in a temporary directory, the blockchain files of the repository are untouched.
+
+    Run from the repository root:
+        python -m benchmarks.bench_web_mining
+'''
+# std lib imports
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+from time import perf_counter
+from urllib.request import Request, urlopen
+
+REQUESTS = 200
+CLIENTS = 4
+BLOCKS = 50
+
+def percentile(samples, fraction):
+    '''
+        Get a percentile of a list of samples
+    '''
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def request(url, method='GET'):
+    '''
+        Send a request and return the parsed json response
+    '''
+    with urlopen(Request(url, method=method)) as response:
+        return json.loads(response.read())
+
+def measure_chain(base_url):
+    '''
+        Request /chain from several clients at once and return the latency of every request
+    '''
+    latencies = []
+    lock = threading.Lock()
+
+    def client():
+        for _ in range(REQUESTS // CLIENTS):
+            start = perf_counter()
+            request(base_url + '/chain')
+            elapsed = perf_counter() - start
+
+            with lock:
+                latencies.append(elapsed)
+
+    clients = [threading.Thread(target=client) for _ in range(CLIENTS)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+
+    return latencies
+
+def report(name, latencies):
+    '''
+        Print the latency percentiles of a run
+    '''
+    print(
+        f'{name:16s} p50 {percentile(latencies, 0.50) * 1000:7.2f} ms  '
+        f'p95 {percentile(latencies, 0.95) * 1000:7.2f} ms  '
+        f'p99 {percentile(latencies, 0.99) * 1000:7.2f} ms'
+    )
+
+def main():
+    '''
+        Compare the /chain latency of an idle node to a node that is mining
+    '''
+    repository = os.getcwd()
+    sys.path.insert(0, repository)
+    os.chdir(tempfile.mkdtemp())
+
+    from werkzeug.serving import make_server
+    from web import app
+
+    # Don't print a line for every request
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    request(base_url + '/wallet', method='POST')
+    report('idle', measure_chain(base_url))
+
+    # Queue up mining jobs and measure /chain while they're running
+    jobs = [request(base_url + '/mine', method='POST')['job']['job_id'] for _ in range(BLOCKS)]
+    report('while mining', measure_chain(base_url))
+
+    statuses = [request(f'{base_url}/mine/{job_id}')['job']['status'] for job_id in jobs]
+    print(f'{statuses.count("done")} of {BLOCKS} mining jobs done when the measurement finished')
+
+    server.shutdown()
+    app.mining_jobs.shutdown()
+
+if __name__ == '__main__':
+    main()
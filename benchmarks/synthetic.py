@@ -0,0 +1,122 @@
+'''
+    Synthetic data for the benchmarks - cached RSA wallets and valid chains of any size
+
+    Generating RSA keys is slow and random, so the wallets are generated once and cached in a
+    json file, every run after that uses the exact same addresses. The chains are built from a
+    seeded random generator: the same wallets, size and seed always give the same chain.
+'''
+# std lib imports
+import json
+import os
+import random
+import tempfile
+
+# Own imports
+from block import Block
+from transaction import Transaction
+from util.difficulty import DEFAULT_DIFFICULTY, TARGET_BLOCK_INTERVAL
+from util.merkle import merkle_root
+from util.mining import ProofOfWorkMiner
+from wallet import Wallet
+
+DEFAULT_WALLETS = 50
+DEFAULT_WALLETS_FILE = os.path.join(tempfile.gettempdir(), 'cenzcoin-benchmark-wallets.json')
+TRANSACTIONS_PER_BLOCK = 100
+MINING_REWARD = 10
+
+def load_wallets(count=DEFAULT_WALLETS, filename=DEFAULT_WALLETS_FILE):
+    '''
+        Load the cached wallets, generating (and caching) the ones that are missing
+
+        Arguments:
+            :count: the amount of wallets
+            :filename: the json file the wallets are cached in
+
+        Returns:
+            A list of wallets
+    '''
+    try:
+        with open(filename, 'r') as open_file:
+            keys = json.loads(open_file.read())
+    except (IOError, ValueError):
+        keys = []
+
+    if len(keys) < count:
+        for _ in range(count - len(keys)):
+            keys.append(Wallet().generate_keys())
+
+        with open(filename, 'w') as open_file:
+            open_file.write(json.dumps(keys))
+
+    wallets = []
+    for private_key, public_key in keys[:count]:
+        wallet = Wallet()
+        wallet.private_key, wallet.public_key = private_key, public_key
+        wallets.append(wallet)
+
+    return wallets
+
+def sign_transactions(wallets, count, seed=0):
+    '''
+        Create transactions with valid signatures between the wallets
+
+        Arguments:
+            :wallets: the wallets sending and receiving the coins
+            :count: the amount of transactions
+            :seed: the seed of the random generator
+
+        Returns:
+            A list of signed transactions
+    '''
+    rng = random.Random(seed)
+    transactions = []
+
+    for _ in range(count):
+        sender, recipient = rng.sample(wallets, 2)
+        amount = round(rng.uniform(0.01, 5), 2)
+        signature = sender.sign_transaction(sender.public_key, recipient.public_key, amount)
+        transactions.append(Transaction(sender.public_key, recipient.public_key, signature, amount))
+
+    return transactions
+
+def build_chain(transactions, wallets, transactions_per_block=TRANSACTIONS_PER_BLOCK, seed=0):
+    '''
+        Build a chain that passes Verification.verify_chain: every block has a merkle root, a
+        valid proof of work and a timestamp exactly one target interval after the previous block
+        (so the difficulty never changes). Signing every transaction would take minutes, the
+        transactions carry random signatures of the real size instead (verify_chain doesn't check
+        signatures, sign_transactions creates transactions for benchmarking the verification).
+
+        Arguments:
+            :transactions: the amount of transactions on the chain (excluding the mining rewards)
+            :wallets: the wallets sending and receiving the coins
+            :transactions_per_block: the amount of transactions on every block
+            :seed: the seed of the random generator
+
+        Returns:
+            The blockchain and a list of open transactions
+    '''
+    rng = random.Random(seed)
+    miner = ProofOfWorkMiner()
+    addresses = [wallet.public_key for wallet in wallets]
+    blockchain = [Block(0, 'genesis', [], 100, 0)]
+
+    def random_transaction():
+        sender, recipient = rng.sample(addresses, 2)
+        signature = rng.getrandbits(128 * 8).to_bytes(128, 'big').hex()
+        return Transaction(sender, recipient, signature, round(rng.uniform(0.01, 5), 2))
+
+    for start in range(0, transactions, transactions_per_block):
+        block_transactions = [random_transaction() for _ in range(min(transactions_per_block, transactions - start))]
+
+        previous_hash = blockchain[-1].hash
+        proof = miner.proof_of_work(block_transactions, previous_hash, DEFAULT_DIFFICULTY)
+
+        block_transactions.append(Transaction('MINING', rng.choice(addresses), '', MINING_REWARD))
+        index = len(blockchain)
+        blockchain.append(Block(index, previous_hash, block_transactions, proof,
+                                1552800000.0 + index * TARGET_BLOCK_INTERVAL,
+                                merkle_root=merkle_root(block_transactions), difficulty=DEFAULT_DIFFICULTY))
+
+    open_transactions = [random_transaction() for _ in range(min(transactions_per_block, transactions))]
+    return blockchain, open_transactions
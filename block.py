@@ -1,8 +1,11 @@
 '''
     Block module for blocks that are stored on the blockchain
 '''
+import json
 from time import time
 
+from util.hash_util import hash_block
+
 class Block:
     '''
        Block class for representing a block within the blockchain 
@@ -13,13 +16,121 @@ class Block:
             :transactions: all transactions that occurred on this block
             :proof: the proof of work number used to create this block
             :timestamp: the time this block was created
+            :merkle_root: the merkle root of the transactions (None for blocks mined before merkle roots were added)
+            :difficulty: the amount of leading zero bits of the proof of work (None for blocks mined at the default difficulty
+                         before difficulties were stored)
+            :hash: the memoized hash of the block
+
+        Functions:
+            :to_dict: return the block as a dict
+            :to_header_dict: return the block without its transactions (hashed instead of the whole block when it has a merkle root)
+            :to_json: return the memoized canonical json of the block (used for hashing, saving and the http api)
     '''
-    def __init__(self, index, previous_hash, transactions, proof, time=time()):
+    __slots__ = ('index', 'previous_hash', 'transactions', 'proof', 'timestamp', 'merkle_root', 'difficulty', '__hash', '__json')
+
+    def __init__(self, index, previous_hash, transactions, proof, timestamp=None, merkle_root=None, difficulty=None):
         self.index = index
         self.previous_hash = previous_hash
-        self.transactions = transactions
+        # Stored as a tuple so the transactions can't be changed without reassigning them
+        self.transactions = tuple(transactions)
         self.proof = proof
-        self.timestamp = time
+        # The default is evaluated per block, not once when the module is imported
+        self.timestamp = time() if timestamp is None else timestamp
+        self.merkle_root = merkle_root
+        self.difficulty = difficulty
+
+    def __setattr__(self, name, value):
+        # Changing any part of the block invalidates its memoized hash and json
+        super().__setattr__(name, value)
+        super().__setattr__('_Block__hash', None)
+        super().__setattr__('_Block__json', None)
+
+    def __setstate__(self, state):
+        # Pickles from before __slots__ was used hold a plain dict
+        if isinstance(state, tuple):
+            state = state[1]
+
+        # Blocks pickled before merkle roots and difficulties were added don't have them
+        self.merkle_root = None
+        self.difficulty = None
+
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @property
+    def hash(self):
+        '''
+            The hash of the block, only calculated again after the block was changed
+        '''
+        # Blocks loaded from a pickle file may not have a memoized hash at all
+        block_hash = getattr(self, '_Block__hash', None)
+
+        if block_hash is None:
+            block_hash = hash_block(self)
+            super().__setattr__('_Block__hash', block_hash)
+
+        return block_hash
+
+    def to_dict(self):
+        '''
+            Convert the block into a dict (primarily for hashing and saving)
+
+            Returns:
+                A dict containing the block information, with every transaction as an ordered dict
+        '''
+        block_dict = {
+            'index': self.index,
+            'previous_hash': self.previous_hash,
+            'transactions': [tx.to_ordered_dict() for tx in self.transactions],
+            'proof': self.proof,
+            'timestamp': self.timestamp
+        }
+
+        # Left out of older blocks so their json, and therefore their hash, stays the same
+        if self.merkle_root is not None:
+            block_dict['merkle_root'] = self.merkle_root
+
+        if self.difficulty is not None:
+            block_dict['difficulty'] = self.difficulty
+
+        return block_dict
+
+    def to_header_dict(self):
+        '''
+            Convert the block into a dict without its transactions, which are committed to by
+            the merkle root instead
+
+            Returns:
+                A dict containing the block header
+        '''
+        header_dict = {
+            'index': self.index,
+            'previous_hash': self.previous_hash,
+            'merkle_root': self.merkle_root,
+            'proof': self.proof,
+            'timestamp': self.timestamp
+        }
+
+        if self.difficulty is not None:
+            header_dict['difficulty'] = self.difficulty
+
+        return header_dict
+
+    def to_json(self):
+        '''
+            Convert the block into its canonical json, only serialized again after the block was changed
+
+            Returns:
+                A string containing the json of the block dict (see to_dict)
+        '''
+        # Blocks loaded from a pickle file may not have memoized json at all
+        block_json = getattr(self, '_Block__json', None)
+
+        if block_json is None:
+            block_json = json.dumps(self.to_dict())
+            super().__setattr__('_Block__json', block_json)
+
+        return block_json
 
     def __repr__(self):
         return (
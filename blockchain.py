@@ -2,32 +2,93 @@
     Blockchain module - for all functionality related to the blockchain itself
 '''
 # std lib imports
-from functools import reduce
+from collections import defaultdict
+from time import time
+import threading
 
 # Own imports
-from util.hash_util import hash_block
-from util.files import save_data, load_data
+from util.binary_format import fits_transaction
+from util.storage import FileStorage
+from util.difficulty import chain_work, median_time, next_difficulty, RETARGET_WINDOW
+from util.files import load_peer_nodes, save_peer_nodes
+from util.hash_util import hash_transaction
+from util.ledger import Ledger
+from util.merkle import merkle_root, merkle_proof
+from util.snapshot import Snapshot
+from util.mining import ProofOfWorkMiner, DEFAULT_NONCE_RANGE
 from util.verification import Verification
 from block import Block
+from mempool import DEFAULT_MAX_SIZE, Mempool
 from transaction import Transaction
 
-from wallet import Wallet
-
 MINING_REWARD = 10
 
-def sum_transactions(tx_sum, txs):
+# The maximum amount of open transactions mined into a single block
+MAX_BLOCK_TRANSACTIONS = 1000
+
+class ChainTip:
     '''
-        get_balance helper function for summing a users transaction total
+        An immutable view of the blockchain at one moment, readers grab the current tip without
+        locking and keep seeing the same blocks while writers append new ones
 
-        Arguments:
-            tx_sum: the total sum of all the current transactions
-            txs: all transactions from the currently evaluated block
+        Replacing blocks after a conflict gives the blockchain a new chain, a tip taken before
+        keeps the old fork (the storages that read blocks from disk detach the old chain from the
+        blocks they replace, see StoredChain.detach and LazyChain.detach).
+
+        Attributes:
+            :blocks: the chain the tip was taken from (it may have grown since)
+            :length: the amount of blocks within the view
     '''
-    # Check if there are any transactions on the current checked block
-    if txs:
-        return tx_sum + sum(txs)
+    __slots__ = ('blocks', 'length')
+
+    def __init__(self, blocks, length):
+        self.blocks = blocks
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def last_block(self):
+        '''
+            The last block within the view (None for an empty chain)
+        '''
+        return self.blocks[self.length - 1] if self.length else None
+
+    def get_blocks(self, start, stop=None):
+        '''
+            Get part of the view, indexed like a list
+
+            Arguments:
+                :start: the index of the first block
+                :stop: the index to stop at (exclusive, defaults to the end of the view)
 
-    return tx_sum
+            Returns:
+                A list of blocks
+        '''
+        start, stop, _ = slice(start, stop).indices(self.length)
+        return self.blocks[start:stop]
+
+    def get_inclusion_proof(self, block_index, position):
+        '''
+            Create a merkle proof for a transaction within the view (see Blockchain.get_inclusion_proof)
+        '''
+        if not 0 <= block_index < self.length:
+            return None
+
+        block = self.blocks[block_index]
+
+        if block.merkle_root is None or not 0 <= position < len(block.transactions):
+            return None
+
+        return {
+            'block_index': block_index,
+            'position': position,
+            'transaction': block.transactions[position].to_ordered_dict(),
+            'header': block.to_header_dict(),
+            'block_hash': block.hash,
+            'proof': merkle_proof(block.transactions, position)
+        }
 
 
 class Blockchain:
@@ -36,51 +97,201 @@ class Blockchain:
 
         Properties:
             :chain: the blockchain itself (list of blocks)
-            :open_transactions: all open transactions
+            :open_transactions: all open transactions (kept in a Mempool)
             :hosting_node: the node currently hosting this blockchain
+            :miner: the proof of work engine used for mining blocks
+            :storage: the storage backend the blockchain is persisted with (defaults to FileStorage)
+            :verified_height: the amount of blocks that were already verified (see Verification.verify_chain)
+            :verify_workers: the maximum amount of threads or processes used for verifying signatures
+            :verify_processes: verify signatures with a process pool instead of a thread pool
+            :snapshots: the SnapshotManager used for starting from and taking ledger snapshots (optional)
+            :mempool_max_size: the maximum amount of open transactions (the oldest ones are evicted)
+            :mempool_max_age: the amount of seconds a transaction can stay open (None for no limit)
+            :gossip: announces new transactions and blocks to the peer nodes (optional, see util.gossip)
+            :tip: the ChainTip of the last published chain (read without locking)
+
+        Writers (transactions, blocks, conflicts, mining) are serialized by a lock, readers of the
+        chain use the immutable tip that is published after every change and never wait on them.
+        Reads of balances and open transactions hold the lock only for the lookup itself.
     '''
-    def __init__(self, hosting_node_id):
-        self.__chain, self.__open_transactions = load_data(from_json=True)
+    def __init__(self, hosting_node_id, mining_workers=1, nonce_range=DEFAULT_NONCE_RANGE, storage=None,
+                 verify_workers=None, verify_processes=False, snapshots=None,
+                 mempool_max_size=DEFAULT_MAX_SIZE, mempool_max_age=None):
+        self.storage = storage or FileStorage()
+        self.mempool_max_size = mempool_max_size
+        self.mempool_max_age = mempool_max_age
+        self.verify_workers = verify_workers
+        self.verify_processes = verify_processes
+        self.snapshots = snapshots
+        self.gossip = None
+        self.__lock = threading.RLock()
+        self.__mining_lock = threading.Lock()
+        self.__peer_nodes = set(load_peer_nodes())
+        self.__ledger = Ledger()
+        self.__unapplied_height = None
+        self.load_data()
         self.hosting_node = hosting_node_id
+        self.miner = ProofOfWorkMiner(mining_workers, nonce_range)
 
     @property
     def chain(self):
         '''
             Return a copied version of the blockchain
         '''
-        return self.__chain[:]
+        return self.__tip.get_blocks(0)
 
     @chain.setter
     def chain(self, value):
-        self.__chain = value
+        with self.__lock:
+            self.__chain = value
+            self.verified_height = 0
+
+            # Rebuild the ledger from scratch for the new chain
+            self.__ledger = Ledger()
+            self.__ledger.apply_blocks(self.__chain)
+            self.__unapplied_height = None
+            self.__publish()
+
+    @property
+    def tip(self):
+        '''
+            Get the ChainTip of the blockchain, a consistent view for several reads in a row
+        '''
+        return self.__tip
+
+    def __publish(self):
+        '''
+            Publish the current chain to the readers, writers call this after every change
+        '''
+        self.__tip = ChainTip(self.__chain, len(self.__chain))
+
+    def __len__(self):
+        return self.__tip.length
+
+    def get_blocks(self, start, stop=None):
+        '''
+            Get a copy of part of the blockchain, without copying the whole chain
+
+            Arguments:
+                :start: the index of the first block
+                :stop: the index to stop at (exclusive, defaults to the end of the chain)
+
+            Returns:
+                A list of blocks
+        '''
+        return self.__tip.get_blocks(start, stop)
 
     @property
     def open_transactions(self):
         '''
             Get a copy of the open transactions attached to the blockchain
         '''
-        return self.__open_transactions[:]
+        with self.__lock:
+            return list(self.__mempool)
 
     @open_transactions.setter
     def open_transactions(self, value):
-        self.__open_transactions = value
+        with self.__lock:
+            self.__mempool = self.__new_mempool(value)
+
+    def __new_mempool(self, transactions):
+        '''
+            Create the mempool for a list of open transactions with the configured limits
+        '''
+        return Mempool(transactions, self.mempool_max_size, self.mempool_max_age)
+
+    def load_data(self):
+        '''
+            Load the blockchain and open transactions from disk
+
+            The blocks are only indexed in the ledger the first time it's needed (a balance, a
+            transaction or a block to check), so a lazily loaded chain (see BlockLogStorage) isn't
+            read from disk completely just to start the node.
+        '''
+        with self.__lock:
+            self.__chain, open_transactions = self.storage.load()
+            self.__mempool = self.__new_mempool(open_transactions)
+            self.verified_height = 0
+            self.__ledger = Ledger()
+            self.__unapplied_height = 0
+
+            snapshot = self.snapshots.latest(self.__chain) if self.snapshots else None
+
+            # Start from the latest snapshot and only replay the blocks appended after it
+            if snapshot:
+                self.__ledger = snapshot.ledger
+                self.verified_height = snapshot.verified_height
+                self.__unapplied_height = snapshot.height + 1
+
+            self.__publish()
+
+    def close(self):
+        '''
+            Shut down the mining processes and write everything the storage still has queued
+        '''
+        self.miner.close()
+        self.storage.close()
 
-    def proof_of_work(self):
+    def __get_ledger(self):
+        '''
+            Get the ledger, indexing the blocks that weren't applied to it since loading first
+
+            Returns:
+                The ledger of every block on the blockchain
+        '''
+        with self.__lock:
+            if self.__unapplied_height is not None:
+                self.__ledger.apply_blocks(self.__chain[self.__unapplied_height:])
+                self.__unapplied_height = None
+
+            return self.__ledger
+
+    def take_snapshot(self):
+        '''
+            Save a snapshot of the ledger at the current tip of the blockchain
+        '''
+        with self.__lock:
+            height = len(self.__chain) - 1
+            verified_height = min(self.verified_height, height + 1)
+            snapshot = Snapshot(height, self.__chain[height].hash, verified_height, self.__get_ledger())
+
+            self.snapshots.save(snapshot)
+
+    def next_difficulty(self):
+        '''
+            Calculate the difficulty of the next block from the timestamps of the last blocks
+
+            Returns:
+                The amount of leading zero bits the proof of work of the next block needs
+        '''
+        return next_difficulty(self.__tip.get_blocks(-RETARGET_WINDOW))
+
+    def proof_of_work(self, transactions=None, difficulty=None):
         '''
             Calculate a valid proof of work
 
+            Arguments:
+                :transactions: the transactions of the next block (defaults to the next batch
+                               of open transactions)
+                :difficulty: the difficulty of the next block (defaults to next_difficulty)
+
             Returns:
                 proof number that generates a valid hash
         '''
-        # The last block added to the blockchain
-        last_block = self.chain[-1]
-        last_hash = hash_block(last_block)
-        proof = 0
+        if transactions is None:
+            with self.__lock:
+                transactions = self.__mempool.select(MAX_BLOCK_TRANSACTIONS)
+
+        # The difficulty and the last hash are taken from the same tip
+        tip = self.__tip
 
-        while not Verification.valid_proof(self.__open_transactions, last_hash, proof):
-            proof += 1
+        if difficulty is None:
+            difficulty = next_difficulty(tip.get_blocks(-RETARGET_WINDOW))
 
-        return proof
+        # The last block added to the blockchain
+        last_hash = tip.last_block.hash
+
+        return self.miner.proof_of_work(transactions, last_hash, difficulty)
 
     def get_amount_sent(self, participant):
         '''
@@ -92,15 +303,8 @@ class Blockchain:
             Returns:
                 The amount the participant has sent
         '''
-        # Get the total transactions where the participant is the sender (both open and closed)
-        tx_sent = [[tx.amount for tx in block.transactions if tx.sender == participant] for block in self.__chain]
-        open_tx_sent = [[tx.amount for tx in self.__open_transactions if tx.sender == participant]]
-        tx_sent.extend(open_tx_sent)
-
-        # Sum up the amount the participant has sent
-        amount_sent = reduce(sum_transactions, tx_sent, 0)
-
-        return amount_sent
+        with self.__lock:
+            return self.__get_ledger().amount_sent(participant) + self.__mempool.pending_total(participant)
 
     def get_amount_received(self, participant):
         '''
@@ -112,29 +316,72 @@ class Blockchain:
             Returns:
                 The amount the participant has received
         '''
-        # Get the total transactions where the participant is the receiver (strictly closed)
-        tx_received = [[tx.amount for tx in block.transactions if tx.recipient == participant] for block in self.__chain]
+        with self.__lock:
+            return self.__get_ledger().amount_received(participant)
 
-        # Sum up the amount the participant has received
-        amount_received = reduce(sum_transactions, tx_received, 0)
-
-        return amount_received
-
-    def get_balance(self):
+    def get_balance(self, participant=None):
         '''
             Gets the total balance of a single participant
 
+            Parameters:
+                :participant: the participant to get the balance of (defaults to the hosting node)
+
             Returns:
                 The balance of the participant
         '''
-        participant = self.hosting_node
+        if participant is None:
+            participant = self.hosting_node
+
+        # Open transactions are debited from the sender straight away
+        with self.__lock:
+            return self.__get_ledger().balance(participant) - self.__mempool.pending_total(participant)
+
+    def get_transactions(self, participant, offset=0, limit=None):
+        '''
+            Get the mined transactions a participant sent or received (oldest first),
+            looked up through the ledger instead of scanning the chain
+
+            Parameters:
+                :participant: the participant to get the transactions of
+                :offset: the amount of transactions to skip
+                :limit: the maximum amount of transactions (defaults to every transaction)
+
+            Returns:
+                A list of (block index, transaction position, transaction) tuples
+        '''
+        transactions = []
+
+        with self.__lock:
+            for block_index, position in self.__get_ledger().transaction_locations(participant, offset, limit):
+                transaction = self.__chain[block_index].transactions[position]
+                transactions.append((block_index, position, transaction))
+
+        return transactions
+
+    def get_transaction_count(self, participant):
+        '''
+            Get the amount of mined transactions a participant sent or received
 
-        # Get both the amount sent and received by the participant
-        amount_sent = self.get_amount_sent(participant)
-        amount_received = self.get_amount_received(participant)
+            Parameters:
+                :participant: the participant to count the transactions of
+        '''
+        with self.__lock:
+            return self.__get_ledger().transaction_count(participant)
 
-        # Return the users balance
-        return amount_received - amount_sent
+    def get_inclusion_proof(self, block_index, position):
+        '''
+            Create a proof that a transaction is part of a block, which can be checked against
+            the block header with verify_merkle_proof without any of the other transactions
+
+            Parameters:
+                :block_index: the index of the block holding the transaction
+                :position: the position of the transaction within the block
+
+            Returns:
+                A dict with the transaction, the block header, the block hash and the proof,
+                None if there's no such transaction or the block doesn't have a merkle root
+        '''
+        return self.__tip.get_inclusion_proof(block_index, position)
 
     def get_last_blockchain_value(self):
         '''
@@ -143,13 +390,39 @@ class Blockchain:
             Returns:
                 The last block on the blockchain
         '''
-        if self.__chain:
-            return None
-        else:
-            return self.__chain[-1]
+        return self.__tip.last_block
+
 
+    def add_peer_node(self, node):
+        '''
+            Add a node to the peer nodes
 
-    def add_transaction(self, sender, recipient, signature, amount=1.0):
+            Arguments:
+                :node: the address (host:port) of the node
+        '''
+        with self.__lock:
+            self.__peer_nodes.add(node)
+            save_peer_nodes(self.__peer_nodes)
+
+    def remove_peer_node(self, node):
+        '''
+            Remove a node from the peer nodes
+
+            Arguments:
+                :node: the address (host:port) of the node
+        '''
+        with self.__lock:
+            self.__peer_nodes.discard(node)
+            save_peer_nodes(self.__peer_nodes)
+
+    def get_peer_nodes(self):
+        '''
+            Get a list of all peer nodes
+        '''
+        with self.__lock:
+            return sorted(self.__peer_nodes)
+
+    def add_transaction(self, sender, recipient, signature, amount=1.0, is_receiving=False):
         '''
             Append a new value as well as the last blockcahin value to the block chain
 
@@ -157,13 +430,14 @@ class Blockchain:
                     :sender: The sender of the coins
                     :recipient: The recipient of the coins.
                     :amount: The amount of coins sent with the transaction(default=1.0)
+                    :is_receiving: the transaction was announced by a peer node (a wallet isn't needed)
 
             Returns:
                 True if the transaction is valid, False otherwise
         '''
 
         #Transaction failed, the wallet isn't setup.
-        if not self.hosting_node:
+        if not self.hosting_node and not is_receiving:
             return False
 
         # Use an ordered dict to always ensure the order of keys inside of the dictionary (for consistent hashing)
@@ -171,15 +445,263 @@ class Blockchain:
         # dict orders the key that are entered the order that they're entered in, allowing us to have consistent hashing
         transaction = Transaction(sender, recipient, signature, amount)
 
-        # If the transaction is legitimate, add it to the open transactions list and
-        # keep track of participants
-        if Verification.verify_transaction(transaction, self.get_balance):
-            self.__open_transactions.append(transaction)
-            save_data(self.__chain, self.__open_transactions, to_json=True)
-            return True
+        # A transaction the storage can't encode would fail every block mined with it
+        if not fits_transaction(transaction):
+            return False
+
+        with self.__lock:
+            # The exact same signed transaction was already submitted
+            if transaction in self.__mempool:
+                return False
+
+            # If the transaction is legitimate, add it to the open transactions list and
+            # keep track of participants
+            if Verification.verify_transaction(transaction, self.get_balance):
+                self.__mempool.add(transaction)
+                self.storage.save_open_transactions(self.__chain, self.__mempool)
+
+                if self.gossip:
+                    self.gossip.announce_transaction(transaction)
+                return True
 
         return False
 
+    def add_transactions(self, transactions):
+        '''
+            Add a batch of signed transactions to the open transactions. The signatures are verified
+            in one batch and the funds are checked against one snapshot of the balances, every
+            transaction is accepted or rejected on its own and the accepted ones are saved with a single write
+
+            Arguments:
+                :transactions: a list of transactions (signed by their senders, so no wallet is needed)
+
+            Returns:
+                A list with True (added) or False (rejected) for every transaction, in the same order
+        '''
+        transactions = list(transactions)
+
+        # Signatures don't depend on the state of the blockchain, they're verified before taking the lock
+        signatures = Verification.verify_signatures(transactions, self.verify_workers, self.verify_processes)
+        balances = {}
+        results = []
+
+        with self.__lock:
+            for transaction, valid_signature in zip(transactions, signatures):
+                sender = transaction.sender
+
+                if sender not in balances:
+                    balances[sender] = self.get_balance(sender)
+
+                # The mempool rejects transactions that were already submitted
+                added = (valid_signature and 0 < transaction.amount <= balances[sender]
+                         and fits_transaction(transaction) and self.__mempool.add(transaction))
+
+                if added:
+                    # Later transactions of the same sender can only spend what's left
+                    balances[sender] -= transaction.amount
+
+                    if self.gossip:
+                        self.gossip.announce_transaction(transaction)
+
+                results.append(bool(added))
+
+            if any(results):
+                self.storage.save_open_transactions(self.__chain, self.__mempool)
+
+        return results
+
+    def valid_block_transactions(self, block, ledger=None):
+        '''
+            Check the transactions of a block mined by a peer node: the reward transaction, the
+            signatures and whether every sender can pay for everything they send within the block
+
+            Arguments:
+                :block: the block to check (it follows the last block of the blockchain)
+                :ledger: the ledger of the blocks before the block (defaults to the ledger of the blockchain)
+
+            Returns:
+                True if the transactions are valid, False otherwise
+        '''
+        if ledger is None:
+            ledger = self.__get_ledger()
+
+        if not block.transactions:
+            return False
+
+        transactions = block.transactions[:-1]
+        reward_tx = block.transactions[-1]
+
+        if reward_tx.sender != 'MINING' or reward_tx.amount != MINING_REWARD:
+            return False
+
+        sent = defaultdict(int)
+        for transaction in transactions:
+            if transaction.sender == 'MINING' or transaction.amount <= 0:
+                return False
+            sent[transaction.sender] += transaction.amount
+
+        if any(ledger.balance(sender) < amount for sender, amount in sent.items()):
+            return False
+
+        return all(Verification.verify_signatures(transactions, self.verify_workers, self.verify_processes))
+
+    def add_block(self, block):
+        '''
+            Append a block mined by a peer node
+
+            Arguments:
+                :block: the block, it has to follow the last block of the blockchain
+
+            Returns:
+                True if the block was appended, False if it is invalid or doesn't follow the last block
+        '''
+        with self.__lock:
+            if block.index != len(self.__chain):
+                return False
+
+            previous_blocks = self.__chain[-RETARGET_WINDOW:]
+
+            if not Verification.verify_block(block, previous_blocks):
+                return False
+
+            if not self.valid_block_transactions(block):
+                return False
+
+            # The block was verified, verify_chain doesn't need to check it again
+            if self.verified_height == block.index:
+                self.verified_height += 1
+
+            self.__append_block(block)
+            return True
+
+    def resolve_conflicts(self, chains):
+        '''
+            Replace the blockchain with the valid chain of the peer nodes that took the most work
+            to mine (the sum of 2**difficulty of the blocks after the fork, not the amount of blocks)
+
+            Arguments:
+                :chains: the chains of the peer nodes, each a list of blocks that may start at any height
+                         (only the blocks from where it forks off the blockchain are needed)
+
+            Returns:
+                True if the blockchain was replaced, False if it still took the most work
+        '''
+        with self.__lock:
+            best = None
+            best_work = 0
+
+            for blocks in chains:
+                if not blocks:
+                    continue
+
+                start = blocks[0].index
+                if start > len(self.__chain):
+                    continue
+
+                # Skip the blocks both chains have in common
+                fork = start
+                while (fork < len(self.__chain) and fork - start < len(blocks)
+                       and self.__chain[fork].hash == blocks[fork - start].hash):
+                    fork += 1
+
+                # A chain with another genesis block belongs to another network
+                if fork == 0:
+                    continue
+
+                # Only the blocks after the fork count, the blocks before it are shared
+                new_blocks = blocks[fork - start:]
+                work = chain_work(new_blocks) - chain_work(self.__chain[fork:])
+                if work <= best_work:
+                    continue
+
+                previous_blocks = list(self.__chain[max(fork - RETARGET_WINDOW, 0):fork])
+
+                if self.__verify_blocks(previous_blocks, new_blocks) and self.__valid_fork_transactions(fork, new_blocks):
+                    best = (fork, new_blocks)
+                    best_work = work
+
+            if best is None:
+                return False
+
+            self.__replace_blocks(*best)
+            return True
+
+    def __verify_blocks(self, previous_blocks, blocks):
+        '''
+            Verify a run of blocks that follows a part of the blockchain
+
+            Arguments:
+                :previous_blocks: the last blocks before the run (RETARGET_WINDOW or less, oldest first)
+                :blocks: the blocks to verify
+        '''
+        previous_blocks = list(previous_blocks)
+
+        for block in blocks:
+            if not Verification.verify_block(block, previous_blocks[-RETARGET_WINDOW:]):
+                return False
+            previous_blocks.append(block)
+
+        return True
+
+    def __valid_fork_transactions(self, fork, blocks):
+        '''
+            Check the transactions of every block of a fork the same way add_block does, against
+            a ledger of the blockchain up to the fork that every checked block is applied to
+
+            Arguments:
+                :fork: the index of the first block of the fork
+                :blocks: the blocks of the fork (their headers were already verified)
+
+            Returns:
+                True if the transactions of every block are valid, False otherwise
+        '''
+        ledger = Ledger()
+        ledger.apply_blocks(self.__chain[:fork])
+
+        for block in blocks:
+            if not self.valid_block_transactions(block, ledger):
+                return False
+            ledger.apply_block(block)
+
+        return True
+
+    def __replace_blocks(self, start, blocks):
+        '''
+            Replace every block from a height onward with verified blocks of a peer node, the
+            transactions of the replaced blocks that aren't on the new blocks are opened again
+
+            Arguments:
+                :start: the index of the first replaced block
+                :blocks: the blocks replacing them
+        '''
+        included = set(hash_transaction(tx) for block in blocks for tx in block.transactions)
+        orphaned = [
+            tx for block in self.__chain[start:] for tx in block.transactions[:-1]
+            if hash_transaction(tx) not in included
+        ]
+
+        # The mempool only changes once the storage replaced the blocks
+        open_transactions = [tx for tx in self.__mempool if hash_transaction(tx) not in included]
+        self.__chain = self.storage.replace_blocks(self.__chain, start, blocks, open_transactions)
+        self.__mempool.remove_many(tx for block in blocks for tx in block.transactions)
+
+        if self.verified_height >= start:
+            self.verified_height = len(self.__chain)
+
+        self.__ledger = Ledger()
+        self.__ledger.apply_blocks(self.__chain)
+        self.__unapplied_height = None
+        self.__publish()
+
+        # Balances changed, so the orphaned transactions are checked again
+        reopened = False
+        for transaction in orphaned:
+            if transaction not in self.__mempool and Verification.verify_transaction(transaction, self.get_balance):
+                reopened = self.__mempool.add(transaction) or reopened
+
+        if reopened:
+            self.storage.save_open_transactions(self.__chain, self.__mempool)
+
     def mine_block(self):
         '''
             Mine a block on to the blockchain
@@ -188,39 +710,93 @@ class Blockchain:
                 The mined block if successful, None if not.
         '''
         #Mine failed, the wallet isn't setup.
-        if not self.hosting_node:
+        hosting_node = self.hosting_node
+        if not hosting_node:
             return None
 
-        last_block = self.__chain[-1]
-        hashed_block = hash_block(last_block)
-        proof = self.proof_of_work()
-
-        # Modify a local list of transactions so that users don't get rewarded if 
-        # mining turns out to be unsuccessful
-        copied_transactions = self.__open_transactions[:]
+        # One block is mined at a time, the proof of work is calculated without holding the lock so
+        # transactions and blocks of peer nodes are still accepted in the meantime
+        with self.__mining_lock:
+            while True:
+                with self.__lock:
+                    # Drop transactions that stayed open for too long
+                    if self.__mempool.evict():
+                        self.storage.save_open_transactions(self.__chain, self.__mempool)
+
+                    # Pick the next batch of open transactions on top of the current tip
+                    batch = self.__mempool.select(MAX_BLOCK_TRANSACTIONS)
+                    tip = self.__tip
+
+                # Verify the batch and drop the invalid ones before calculating the proof of
+                # work over the remaining ones
+                results = Verification.verify_signatures(batch, self.verify_workers, self.verify_processes)
+
+                if not all(results):
+                    with self.__lock:
+                        self.__mempool.remove_many(tx for tx, valid in zip(batch, results) if not valid)
+                        self.storage.save_open_transactions(self.__chain, self.__mempool)
+                    batch = [tx for tx, valid in zip(batch, results) if valid]
+
+                hashed_block = tip.last_block.hash
+                difficulty = next_difficulty(tip.get_blocks(-RETARGET_WINDOW))
+                proof = self.miner.proof_of_work(batch, hashed_block, difficulty)
+
+                # Modify a local list of transactions so that users don't get rewarded if 
+                # mining turns out to be unsuccessful
+                copied_transactions = batch[:]
+
+                # Create the reward transaction and add it to the copied transactions list
+                reward_tx = Transaction('MINING', hosting_node, '', MINING_REWARD)
+                copied_transactions.append(reward_tx)
+
+                with self.__lock:
+                    # A block of a peer node was appended (or the chain replaced) while mining,
+                    # start over on top of the new tip
+                    if self.__tip is not tip:
+                        continue
+
+                    # Create the k,v pairs inside of tuples for the ordered dictionary to insert them in the order
+                    # we specify the list
+                    index = tip.length
+                    previous_hash = hashed_block
+                    transactions = copied_transactions
+
+                    # The timestamp has to be later than the median of the last blocks, even if the
+                    # clock of a peer node that mined them runs ahead of ours
+                    timestamp = time()
+                    median = median_time(tip.get_blocks(-RETARGET_WINDOW))
+                    if median is not None and timestamp <= median:
+                        timestamp = median + 1
+
+                    # Create our block, append it to the blockchain, and then save the blockchain
+                    block = Block(index, previous_hash, transactions, proof, timestamp,
+                                  merkle_root=merkle_root(transactions), difficulty=difficulty)
+
+                    self.__append_block(block)
+                    return block
+
+    def __append_block(self, block):
+        '''
+            Append a block to the blockchain, index and persist it and announce it to the peer nodes
+            (the lock is held by the caller)
 
-        # Verify all copied transactions
-        for transaction in copied_transactions:
-            if not Wallet.verify_transaction(transaction):
-                self.__open_transactions.remove(transaction)
-                return None
+            Arguments:
+                :block: the verified block
+        '''
+        # Append the block to the blockchain and remove the mined transactions from the open transactions
+        self.__chain.append(block)
+        self.__mempool.remove_many(block.transactions[:-1])
 
-        # Create the reward transaction and add it to the copied transactions list
-        reward_tx = Transaction('MINING', self.hosting_node, '', MINING_REWARD)
-        copied_transactions.append(reward_tx)
+        # A ledger that wasn't indexed yet picks the block up together with the others
+        if self.__unapplied_height is None:
+            self.__ledger.apply_block(block)
 
-        # Create the k,v pairs inside of tuples for the ordered dictionary to insert them in the order
-        # we specify the list
-        index = len(self.__chain)
-        previous_hash = hashed_block
-        transactions = copied_transactions
+        self.__publish()
 
-        # Create our block, append it to the blockchain, and then save the blockchain
-        block = Block(index, previous_hash, transactions, proof)
+        self.storage.save_block(self.__chain, block, self.__mempool)
 
-        # Append the block to the blockchain and clear all open trnasactions
-        self.__chain.append(block)
-        self.__open_transactions = []
+        if self.snapshots and self.snapshots.is_due(block.index):
+            self.take_snapshot()
 
-        save_data(self.__chain, self.__open_transactions, to_json=True)
-        return block
+        if self.gossip:
+            self.gossip.announce_block(block)
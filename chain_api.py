@@ -0,0 +1,144 @@
+'''
+    Chain api module - the read only routes of a node (the chain, balances, transactions and proofs)
+
+    The routes read from `current_app.blockchain`, which is either the Blockchain of a node (see
+    web.py) or a ChainView of its block store served by reader processes (see reader.py).
+'''
+import json
+
+from flask import Blueprint, Response, current_app, jsonify, request
+
+chain_api = Blueprint('chain_api', __name__)
+
+# The default and maximum amount of transactions on a page of /transactions/<address>
+TRANSACTIONS_PAGE_SIZE = 50
+MAX_TRANSACTIONS_PAGE_SIZE = 1000
+
+@chain_api.route('/chain', methods=['GET'])
+def get_chain():
+    '''
+        Get a snapshot of the current chain, or of a range of it
+
+        Query parameters:
+            :from_height: the index of the first block (defaults to 0)
+            :limit: the maximum amount of blocks (defaults to every block)
+
+        Status codes & Returns:
+           :200: returns a snapshot of the chain in json, the X-Chain-Length header
+                 holds the length of the whole chain
+           :304: the range didn't change since the ETag sent with If-None-Match
+           :400: the range is invalid
+    '''
+    blockchain = current_app.blockchain
+    from_height = request.args.get('from_height', 0, type=int)
+    limit = request.args.get('limit', None, type=int)
+
+    if from_height < 0 or (limit is not None and limit < 0):
+        response = {
+            'message': 'from_height and limit can\'t be negative',
+        }
+        return (jsonify(response), 400)
+
+    # Every read below comes from one tip, so blocks appended meanwhile don't mix in
+    chain_tip = blockchain.tip
+    chain_length = len(chain_tip)
+
+    # The tip hash identifies the state of the whole chain
+    tip = chain_tip.last_block
+    etag = f'{tip.hash}-{from_height}-{limit}'
+    headers = {'X-Chain-Length': str(chain_length)}
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304, headers=headers)
+        response.set_etag(etag)
+        return response
+
+    stop = None if limit is None else from_height + limit
+    chain_snapshot = chain_tip.get_blocks(from_height, stop)
+
+    # Blocks don't change once they're on the chain, so every block keeps the json it was serialized
+    # to (see Block.to_json) and a request only joins the cached json of the requested range
+    body = '[' + ', '.join(block.to_json() for block in chain_snapshot) + ']'
+
+    response = Response(body, status=200, mimetype='application/json', headers=headers)
+    response.set_etag(etag)
+    return response
+
+@chain_api.route('/balance/<address>', methods=['GET'])
+def get_balance(address):
+    '''
+        Get the balance of an address
+
+        Status codes & Returns:
+            :200: returns the balance and the amounts received, sent and pending
+    '''
+    blockchain = current_app.blockchain
+    amount_received = blockchain.get_amount_received(address)
+    amount_sent = blockchain.get_amount_sent(address)
+
+    response = {
+        'address': address,
+        'balance': blockchain.get_balance(address),
+        'amount_received': amount_received,
+        'amount_sent': amount_sent,
+    }
+    return (jsonify(response), 200)
+
+@chain_api.route('/transactions/<address>', methods=['GET'])
+def get_transactions(address):
+    '''
+        Get the mined transactions an address sent or received (oldest first)
+
+        Query parameters:
+            :offset: the amount of transactions to skip (defaults to 0)
+            :limit: the maximum amount of transactions (defaults to TRANSACTIONS_PAGE_SIZE)
+
+        Status codes & Returns:
+            :200: returns a page of transactions and the total amount of transactions
+            :400: the page is invalid
+    '''
+    blockchain = current_app.blockchain
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', TRANSACTIONS_PAGE_SIZE, type=int)
+
+    if offset < 0 or not 0 < limit <= MAX_TRANSACTIONS_PAGE_SIZE:
+        response = {
+            'message': f'offset can\'t be negative and limit has to be between 1 and {MAX_TRANSACTIONS_PAGE_SIZE}',
+        }
+        return (jsonify(response), 400)
+
+    transactions = []
+    for block_index, position, transaction in blockchain.get_transactions(address, offset, limit):
+        dict_tx = transaction.to_ordered_dict()
+        dict_tx['block_index'] = block_index
+        dict_tx['position'] = position
+        transactions.append(dict_tx)
+
+    response = {
+        'address': address,
+        'total': blockchain.get_transaction_count(address),
+        'offset': offset,
+        'transactions': transactions,
+    }
+    return (jsonify(response), 200)
+
+@chain_api.route('/blocks/<int:block_index>/transactions/<int:position>/proof', methods=['GET'])
+def get_inclusion_proof(block_index, position):
+    '''
+        Get a merkle proof that a transaction is part of a block, a light client can check it
+        against the block header without downloading the block
+
+        Status codes & Returns:
+            :200: returns the transaction, the block header and hash and the merkle proof
+            :404: the transaction doesn't exist or its block was mined without a merkle root
+    '''
+    inclusion_proof = current_app.blockchain.get_inclusion_proof(block_index, position)
+
+    if not inclusion_proof:
+        response = {
+            'message': 'No inclusion proof for this transaction',
+        }
+        return (jsonify(response), 404)
+
+    # Keep the header in its hashing order (jsonify would sort the keys)
+    return Response(json.dumps(inclusion_proof), status=200, mimetype='application/json')
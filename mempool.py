@@ -0,0 +1,185 @@
+'''
+    Mempool module - for the open transactions that are waiting to be mined
+'''
+# std lib imports
+from collections import OrderedDict, defaultdict
+from itertools import islice
+from time import time
+
+# Own imports
+from util.hash_util import hash_transaction
+
+# The maximum amount of open transactions, the oldest ones are evicted when it's exceeded
+DEFAULT_MAX_SIZE = 50000
+
+class Mempool:
+    '''
+        The open transactions, indexed by their digest and by their sender
+
+        Transactions are kept in the order they were added, so the oldest transactions are
+        the first ones to be mined and the first ones to be evicted.
+
+        Attributes:
+            :max_size: the maximum amount of transactions in the mempool
+            :max_age: the amount of seconds a transaction can stay in the mempool (None for no limit)
+    '''
+    def __init__(self, transactions=(), max_size=DEFAULT_MAX_SIZE, max_age=None):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.__transactions = OrderedDict()
+        self.__added = {}
+        self.__by_sender = defaultdict(OrderedDict)
+        self.__pending = defaultdict(int)
+
+        for transaction in transactions:
+            self.add(transaction)
+
+    def __len__(self):
+        return len(self.__transactions)
+
+    def __iter__(self):
+        return iter(self.__transactions.values())
+
+    def __contains__(self, transaction):
+        return hash_transaction(transaction) in self.__transactions
+
+    def add(self, transaction, now=None):
+        '''
+            Add a transaction to the mempool
+
+            Arguments:
+                :transaction: the transaction to add
+                :now: the time the transaction was added (defaults to the current time)
+
+            Returns:
+                True if the transaction was added, False if it's already in the mempool
+        '''
+        digest = hash_transaction(transaction)
+
+        if digest in self.__transactions:
+            return False
+
+        self.__transactions[digest] = transaction
+        self.__added[digest] = time() if now is None else now
+        self.__by_sender[transaction.sender][digest] = transaction
+        self.__pending[transaction.sender] += transaction.amount
+
+        # Make room by evicting the oldest transactions
+        while len(self.__transactions) > self.max_size:
+            self.__remove(next(iter(self.__transactions)))
+
+        return True
+
+    def __remove(self, digest):
+        '''
+            Remove a transaction by its digest
+        '''
+        transaction = self.__transactions.pop(digest)
+        del self.__added[digest]
+
+        sender = transaction.sender
+        del self.__by_sender[sender][digest]
+
+        # Don't keep empty entries around for senders without open transactions
+        if self.__by_sender[sender]:
+            self.__pending[sender] -= transaction.amount
+        else:
+            del self.__by_sender[sender]
+            del self.__pending[sender]
+
+        return transaction
+
+    def remove(self, transaction):
+        '''
+            Remove a transaction from the mempool
+
+            Arguments:
+                :transaction: the transaction to remove
+
+            Returns:
+                True if the transaction was removed, False if it wasn't in the mempool
+        '''
+        digest = hash_transaction(transaction)
+
+        if digest not in self.__transactions:
+            return False
+
+        self.__remove(digest)
+        return True
+
+    def remove_many(self, transactions):
+        '''
+            Remove several transactions (for example the ones that were just mined)
+
+            Arguments:
+                :transactions: the transactions to remove
+        '''
+        for transaction in transactions:
+            self.remove(transaction)
+
+    def evict(self, now=None):
+        '''
+            Evict every transaction that is older than the max age
+
+            Arguments:
+                :now: the current time (defaults to the current time)
+
+            Returns:
+                A list of the evicted transactions
+        '''
+        evicted = []
+
+        if self.max_age is None:
+            return evicted
+
+        oldest_allowed = (time() if now is None else now) - self.max_age
+
+        # Transactions are ordered by the time they were added, so stop at the first young one
+        while self.__transactions:
+            digest = next(iter(self.__transactions))
+
+            if self.__added[digest] >= oldest_allowed:
+                break
+
+            evicted.append(self.__remove(digest))
+
+        return evicted
+
+    def select(self, limit):
+        '''
+            Pick the oldest transactions for the next block, without copying the whole mempool
+
+            Arguments:
+                :limit: the maximum amount of transactions to pick
+
+            Returns:
+                A list of at most limit transactions
+        '''
+        return list(islice(self.__transactions.values(), limit))
+
+    def from_sender(self, sender):
+        '''
+            Get the open transactions of a sender
+
+            Arguments:
+                :sender: the address of the sender
+
+            Returns:
+                A list of the senders open transactions
+        '''
+        if sender not in self.__by_sender:
+            return []
+
+        return list(self.__by_sender[sender].values())
+
+    def pending_total(self, sender):
+        '''
+            Get the total amount a sender has sent within open transactions
+
+            Arguments:
+                :sender: the address of the sender
+
+            Returns:
+                The amount pending to be debited from the sender
+        '''
+        return self.__pending.get(sender, 0)
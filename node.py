@@ -2,8 +2,12 @@
     Node module - for any client related things to run the blockchain
 '''
 
+# std lib imports
+import argparse
+
 # Own imports
 from blockchain import Blockchain
+from util.block_log import BlockLogStorage
 from util.verification import Verification
 from wallet import Wallet
 
@@ -14,10 +18,12 @@ class Node:
         Attributes:
             :wallet: the current nodes wallet
             :blockchain: The current blockchain that is connected to the node
+            :storage: where the blockchain is stored (None for the blockchain file)
     '''
-    def __init__(self):
+    def __init__(self, storage=None):
         self.wallet = Wallet()
         self.blockchain = None
+        self.storage = storage
 
     def get_transaction_value(self):
         '''
@@ -41,6 +47,21 @@ class Node:
         user_input = input('Your choice: ')
         return user_input
 
+    def switch_wallet(self):
+        '''
+            Host the blockchain with the current wallet, the blockchain is only loaded
+            from disk the first time
+
+            Returns:
+                :blockchain: the blockchain connected to the node
+        '''
+        if self.blockchain is None:
+            self.blockchain = Blockchain(self.wallet.public_key, storage=self.storage)
+        else:
+            self.blockchain.hosting_node = self.wallet.public_key
+
+        return self.blockchain
+
     def print_blockchain_elements(self):
         '''
             Output all blocks of the blockchain
@@ -85,18 +106,19 @@ class Node:
             elif user_choice == '3':
                 self.print_blockchain_elements()
             elif user_choice == '4':
-                if Verification.verify_transactions(b_chain.open_transactions, b_chain.get_balance):
+                if Verification.verify_transactions(b_chain.open_transactions, b_chain.get_balance,
+                                                    b_chain.verify_workers, b_chain.verify_processes):
                     print('all open transactions are currently valid')
                 else:
                     print('There are invalid transactions')
             elif user_choice == '5':
                 self.wallet.create_keys()
-                b_chain = self.blockchain = Blockchain(self.wallet.public_key)
+                b_chain = self.switch_wallet()
             elif user_choice == '6':
                 self.wallet.save_keys()
             elif user_choice == '7':
                 self.wallet.load_keys()
-                b_chain = self.blockchain = Blockchain(self.wallet.public_key)
+                b_chain = self.switch_wallet()
             elif user_choice == 'q':
                 waiting_for_input = False
 
@@ -104,8 +126,8 @@ class Node:
             # who the owner is and what their balance is
             print(f'Balance of {self.wallet.public_key}: {b_chain.get_balance():6.2f}')
 
-            # Verify the blockchain over every action
-            if not Verification.verify_chain(b_chain):
+            # Verify the blocks added to the blockchain since the last action
+            if not Verification.verify_chain(b_chain, incremental=True):
                 self.print_blockchain_elements()
                 print('Invalid blockchain!')
                 break
@@ -116,8 +138,23 @@ def main():
     '''
         Run a new node instance
     '''
-    node = Node()
-    node.listen_for_input()
+    parser = argparse.ArgumentParser(description='Run a blockchain node from the command line')
+    parser.add_argument('--block-log', help='store the blockchain in an append only block log within this directory')
+    parser.add_argument('--lazy', action='store_true', help='only read the blocks of the block log when they\'re accessed')
+    args = parser.parse_args()
+
+    if args.lazy and not args.block_log:
+        parser.error('--lazy requires --block-log')
+
+    # The block log is started from the blockchain file the first time
+    storage = BlockLogStorage(args.block_log, lazy=args.lazy) if args.block_log else None
+
+    node = Node(storage)
+    try:
+        node.listen_for_input()
+    finally:
+        if node.blockchain:
+            node.blockchain.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,90 @@
+'''
+    Reader module - serves the read only routes of a node from several processes
+
+    The node (web.py) stores its blockchain in a block store and stays the only process that
+    mines and accepts transactions. Every reader process serves the read only routes (see
+    chain_api.py) from a ChainView of that block store, and picks up the blocks the node appends
+    before answering a request. The reader processes accept connections from one shared
+    listening socket, so a single port spreads the requests over every process.
+'''
+import argparse
+import multiprocessing
+import signal
+import socket
+import sys
+
+from flask import Flask
+from flask_cors import CORS
+from werkzeug.serving import make_server
+
+from chain_api import chain_api
+from util.chain_view import ChainView
+from util.snapshot import SnapshotManager
+
+# Setup server
+app = Flask(__name__)
+CORS(app)
+app.register_blueprint(chain_api)
+
+# The amount of reader processes started by default
+DEFAULT_WORKERS = multiprocessing.cpu_count()
+
+@app.before_request
+def refresh_chain():
+    '''
+        Pick up the blocks and open transactions the node saved since the last request
+    '''
+    app.blockchain.refresh()
+
+def serve(listener, host, port, directory, snapshots=None):
+    '''
+        Serve requests in a reader process
+
+        Arguments:
+            :listener: the listening socket shared by every reader process
+            :host: the address the socket listens on
+            :port: the port the socket listens on
+            :directory: the directory of the block store of the node
+            :snapshots: the directory of the snapshots of the node (optional, the ledger is
+                        built from every block without them)
+    '''
+    # Every process maps the block store itself
+    app.blockchain = ChainView(directory, SnapshotManager(snapshots) if snapshots else None)
+
+    server = make_server(host, port, app, threaded=True, fd=listener.fileno())
+    server.serve_forever()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve the read only routes of a node from several processes')
+    parser.add_argument('-p', '--port', type=int, default=5001, help='the port to listen on')
+    parser.add_argument('--host', default='0.0.0.0', help='the address to listen on')
+    parser.add_argument('--block-store', default='blockstore', help='the directory of the block store of the node')
+    parser.add_argument('--snapshots', help='the directory of the snapshots of the node, to start the ledger from')
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS, help='the amount of reader processes')
+    args = parser.parse_args()
+
+    # Bind once before forking, the processes inherit the listening socket
+    listener = socket.create_server((args.host, args.port), backlog=socket.SOMAXCONN)
+    context = multiprocessing.get_context('fork')
+    workers = [
+        context.Process(target=serve, args=(listener, args.host, args.port, args.block_store, args.snapshots), daemon=True)
+        for _ in range(max(args.workers, 1))
+    ]
+
+    for worker in workers:
+        worker.start()
+
+    # Stop the reader processes as well when the node stops this process
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    print(f'Serving {args.block_store} with {len(workers)} reader processes on port {args.port}')
+
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.terminate()
+        listener.close()
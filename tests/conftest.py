@@ -0,0 +1,67 @@
+'''
+    Shared fixtures - every test runs in its own temporary directory, the blockchain files of
+    the repository are untouched
+'''
+# std lib imports
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Own imports
+from block import Block
+from transaction import Transaction
+from util import difficulty as difficulty_module
+from util.difficulty import next_difficulty, TARGET_BLOCK_INTERVAL
+from util.merkle import merkle_root
+from util.mining import ProofOfWorkMiner
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    '''
+        Run the test from a temporary directory
+    '''
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture(autouse=True)
+def fixed_difficulty(monkeypatch):
+    '''
+        Keep the difficulty fixed, so blocks mined in a quick loop don't raise it
+    '''
+    monkeypatch.setattr(difficulty_module, 'TARGET_BLOCK_INTERVAL', None)
+
+@pytest.fixture
+def retarget(monkeypatch):
+    '''
+        Adjust the difficulty toward the real TARGET_BLOCK_INTERVAL, for tests of the retargeting
+    '''
+    monkeypatch.setattr(difficulty_module, 'TARGET_BLOCK_INTERVAL', TARGET_BLOCK_INTERVAL)
+    return TARGET_BLOCK_INTERVAL
+
+@pytest.fixture
+def make_block():
+    '''
+        Mine a block on top of a list of blocks, at the difficulty the blocks call for
+
+        Returns:
+            A function taking the previous blocks (oldest first), the transactions without the
+            reward, the receiver of the reward and the timestamp
+    '''
+    miner = ProofOfWorkMiner()
+
+    def make(previous_blocks, transactions, miner_address='miner', timestamp=None, reward=10, difficulty=None):
+        last_block = previous_blocks[-1]
+
+        if difficulty is None:
+            difficulty = next_difficulty(previous_blocks)
+
+        proof = miner.proof_of_work(transactions, last_block.hash, difficulty)
+        transactions = transactions + [Transaction('MINING', miner_address, '', reward)]
+
+        return Block(last_block.index + 1, last_block.hash, transactions, proof, timestamp,
+                     merkle_root=merkle_root(transactions), difficulty=difficulty)
+
+    return make
@@ -0,0 +1,69 @@
+'''
+    Chain view tests - reading the block store of a node from another process
+'''
+# Own imports
+from blockchain import Blockchain, MINING_REWARD
+from util.block_store import BlockStore, BlockStoreStorage
+from util.chain_view import ChainView
+from util.snapshot import SnapshotManager
+
+def make_node(snapshots=None):
+    node = Blockchain('node', storage=BlockStoreStorage('store'), snapshots=snapshots)
+    for _ in range(5):
+        node.mine_block()
+    node.storage.flush()
+    return node
+
+def count_decoded_blocks(monkeypatch):
+    decoded = []
+    get = BlockStore.get
+    monkeypatch.setattr(BlockStore, 'get', lambda self, height: decoded.append(height) or get(self, height))
+    return decoded
+
+def test_chain_view_follows_the_node():
+    node = make_node()
+    view = ChainView('store')
+    assert len(view) == 6
+    assert view.get_balance('node') == 5 * MINING_REWARD
+
+    node.mine_block()
+    node.storage.flush()
+    assert view.refresh() == 7
+    assert view.get_balance('node') == 6 * MINING_REWARD
+    assert view.get_last_blockchain_value().hash == node.chain[-1].hash
+
+def test_chain_view_starts_from_the_latest_snapshot(monkeypatch):
+    make_node(SnapshotManager('snapshots', interval=2))
+
+    decoded = count_decoded_blocks(monkeypatch)
+    view = ChainView('store', SnapshotManager('snapshots'))
+
+    # The snapshot at height 4 is checked against its block, only the block after it is applied
+    assert sorted(set(decoded)) == [4, 5]
+    assert view.get_balance('node') == 5 * MINING_REWARD
+    assert view.get_transaction_count('node') == 5
+
+def test_chain_view_without_snapshots_decodes_every_block(monkeypatch):
+    make_node(SnapshotManager('snapshots', interval=2))
+
+    decoded = count_decoded_blocks(monkeypatch)
+    view = ChainView('store')
+
+    assert sorted(set(decoded)) == list(range(6))
+    assert view.get_balance('node') == 5 * MINING_REWARD
+
+def test_chain_view_follows_a_shorter_fork(make_block):
+    node = make_node()
+    view = ChainView('store')
+    assert view.get_balance('node') == 5 * MINING_REWARD
+
+    # Replace the last four blocks with two blocks of another miner
+    base = list(node.chain[:2])
+    fork = [make_block(base, [], 'peer')]
+    fork.append(make_block(base + fork, [], 'peer'))
+    node.storage.store.replace(2, fork)
+
+    assert view.refresh() == 4
+    assert view.get_balance('node') == MINING_REWARD
+    assert view.get_balance('peer') == 2 * MINING_REWARD
+    assert view.get_last_blockchain_value().hash == fork[-1].hash
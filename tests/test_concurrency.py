@@ -0,0 +1,79 @@
+'''
+    Concurrency tests - reading the blockchain from several threads while it changes
+'''
+# std lib imports
+import random
+import threading
+
+import pytest
+
+# Own imports
+from blockchain import Blockchain
+from util.block_log import BlockLogStorage
+from util.block_store import BlockStoreStorage
+from util.lru import LRUCache
+from util.storage import FileStorage
+
+THREADS = 9
+
+def run_threads(function):
+    errors = []
+
+    def run(seed):
+        try:
+            function(random.Random(seed))
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=run, args=(seed,)) for seed in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+
+def test_lazy_block_log_reads_from_several_threads():
+    node = Blockchain('node', storage=BlockLogStorage('log'))
+    for _ in range(300):
+        node.mine_block()
+    node.storage.close()
+
+    chain = Blockchain('node', storage=BlockLogStorage('log', lazy=True)).chain
+
+    def read(generator):
+        for _ in range(2000):
+            index = generator.randrange(len(chain))
+            assert chain[index].index == index
+
+    run_threads(read)
+
+@pytest.mark.parametrize('make_storage', [
+    FileStorage,
+    lambda: BlockStoreStorage('store'),
+    lambda: BlockLogStorage('log', lazy=True),
+], ids=['file', 'block store', 'lazy block log'])
+def test_tip_keeps_its_fork_after_a_replacement(make_block, make_storage, monkeypatch):
+    # Every block is read from disk again, a cached block would hide what the tip reads
+    monkeypatch.setattr(LRUCache, 'get', lambda self, key, default=None: default)
+
+    node = Blockchain('node', storage=make_storage())
+    for _ in range(3):
+        node.mine_block()
+
+    # Reopened, so the lazy block log reads the blocks from disk
+    node.storage.close()
+    node = Blockchain('node', storage=make_storage())
+
+    tip = node.tip
+    old_hashes = [block.hash for block in tip.get_blocks(0)]
+
+    fork = list(node.chain[:1])
+    for _ in range(4):
+        fork.append(make_block(fork, [], 'peer'))
+    assert node.resolve_conflicts([fork[1:]])
+    assert [block.hash for block in node.chain] == [block.hash for block in fork]
+
+    assert len(tip) == 4
+    assert [block.hash for block in tip.get_blocks(0)] == old_hashes
+    assert tip.last_block.hash == old_hashes[-1]
@@ -0,0 +1,133 @@
+'''
+    Consensus tests - accepting peer blocks and resolving conflicts with peer chains
+'''
+import pytest
+
+# Own imports
+from blockchain import Blockchain, MINING_REWARD
+from transaction import Transaction
+from util.block_store import BlockStoreStorage
+from util.difficulty import chain_work, DEFAULT_DIFFICULTY, RETARGET_WINDOW, TARGET_BLOCK_INTERVAL
+from util.storage import FileStorage
+from util.verification import Verification
+from wallet import Wallet
+
+# A fixed time in the past, the timestamps of the mined blocks count up from it
+START_TIME = 1552800000.0
+
+def make_node(address='node'):
+    return Blockchain(address)
+
+def test_resolve_conflicts_takes_a_valid_longer_chain(make_block):
+    node = make_node()
+    node.mine_block()
+
+    peer_chain = node.chain[:1]
+    for _ in range(3):
+        peer_chain.append(make_block(peer_chain, [], 'peer'))
+
+    assert node.resolve_conflicts([peer_chain])
+    assert [block.hash for block in node.chain] == [block.hash for block in peer_chain]
+    assert node.get_balance('peer') == 3 * MINING_REWARD
+    assert node.get_balance('node') == 0
+
+def test_resolve_conflicts_rejects_a_forged_fork(make_block):
+    node = make_node()
+    node.mine_block()
+    genesis = node.chain[:1]
+
+    # Unsigned transactions spending coins the sender never had
+    forged = Transaction('someone', 'attacker', '', 1000)
+    first = make_block(genesis, [forged], 'attacker')
+    fork = [first, make_block(genesis + [first], [], 'attacker')]
+
+    assert not node.resolve_conflicts([fork])
+    assert len(node) == 2
+    assert node.get_balance('attacker') == 0
+    assert node.get_balance('someone') == 0
+    assert Verification.verify_chain(node)
+
+def test_resolve_conflicts_rejects_an_invalid_reward(make_block):
+    node = make_node()
+    genesis = node.chain[:1]
+
+    first = make_block(genesis, [], 'attacker', reward=1000)
+    fork = [first, make_block(genesis + [first], [], 'attacker')]
+
+    assert not node.resolve_conflicts([fork])
+    assert len(node) == 1
+
+def test_resolve_conflicts_rejects_a_fork_with_an_overspending_block(make_block):
+    node = make_node()
+    wallet = Wallet()
+    wallet.create_keys()
+    genesis = node.chain[:1]
+
+    # The sender owns the reward of the first block, the second block spends more than that
+    first = make_block(genesis, [], wallet.public_key)
+    amount = MINING_REWARD * 2
+    signature = wallet.sign_transaction(wallet.public_key, 'attacker', amount)
+    spend = Transaction(wallet.public_key, 'attacker', signature, amount)
+    fork = [first, make_block(genesis + [first], [spend], 'attacker')]
+
+    assert not node.resolve_conflicts([fork])
+    assert len(node) == 1
+
+def test_add_block_checks_transactions(make_block):
+    node = make_node()
+    genesis = node.chain[:1]
+
+    forged = Transaction('someone', 'attacker', '', 1000)
+    assert not node.add_block(make_block(genesis, [forged], 'attacker'))
+    assert node.add_block(make_block(genesis, [], 'peer'))
+    assert node.get_balance('peer') == MINING_REWARD
+
+def build_fork(make_block, previous_blocks, length, start_time, interval, miner_address):
+    '''
+        Mine blocks on top of previous_blocks with a fixed amount of seconds between them
+    '''
+    blocks = list(previous_blocks)
+    for number in range(length):
+        timestamp = start_time + number * interval
+        blocks.append(make_block(blocks[-RETARGET_WINDOW:], [], miner_address, timestamp))
+    return blocks[len(previous_blocks):]
+
+def make_retargeting_node(make_block, length, storage=None):
+    node = Blockchain('node', storage=storage)
+    for block in build_fork(make_block, node.chain, length, START_TIME, TARGET_BLOCK_INTERVAL, 'node'):
+        assert node.add_block(block)
+    return node
+
+@pytest.mark.parametrize('make_storage', [FileStorage, lambda: BlockStoreStorage('store')], ids=['file', 'block store'])
+def test_resolve_conflicts_takes_a_shorter_chain_with_more_work(retarget, make_block, make_storage):
+    node = make_retargeting_node(make_block, 11, make_storage())
+
+    # Blocks every second raise the difficulty of the tenth block
+    fork = build_fork(make_block, node.chain[:1], 10, START_TIME, 1, 'peer')
+    assert fork[-1].difficulty > DEFAULT_DIFFICULTY
+    assert chain_work(fork) > chain_work(node.chain[1:])
+
+    assert node.resolve_conflicts([fork])
+    assert len(node) == 11
+    assert node.chain[-1].hash == fork[-1].hash
+    assert node.get_balance('node') == 0
+
+    # The shorter chain is what is stored, and blocks are appended after it
+    node.mine_block()
+    node.storage.close()
+
+    reloaded = Blockchain('node', storage=make_storage())
+    assert [block.hash for block in reloaded.chain] == [block.hash for block in node.chain]
+    assert reloaded.get_balance('peer') == 10 * MINING_REWARD
+
+def test_resolve_conflicts_keeps_a_chain_with_more_work(retarget, make_block):
+    node = make_retargeting_node(make_block, 11)
+
+    # Blocks every minute lower the difficulty of the tenth block
+    fork = build_fork(make_block, node.chain[:1], 12, START_TIME, 60, 'peer')
+    assert fork[-1].difficulty < DEFAULT_DIFFICULTY
+    assert chain_work(fork) < chain_work(node.chain[1:])
+
+    assert not node.resolve_conflicts([fork])
+    assert len(node) == 12
+    assert node.get_balance('peer') == 0
@@ -0,0 +1,154 @@
+'''
+    Ledger tests - the indexed balances and histories match a full scan of the chain, through
+    restarts and reorgs
+'''
+# std lib imports
+from collections import defaultdict
+
+import pytest
+
+# Own imports
+from blockchain import Blockchain
+from util.block_log import BlockLogStorage
+from util.block_store import BlockStoreStorage
+from util.snapshot import SnapshotManager
+from util.storage import FileStorage
+from wallet import Wallet
+
+STORAGES = {
+    'file': FileStorage,
+    'lazy block log': lambda: BlockLogStorage('log', lazy=True),
+    'block store': lambda: BlockStoreStorage('store'),
+}
+
+def rescan(blocks):
+    '''
+        Total up the chain the slow way, from every transaction of every block
+    '''
+    sent = defaultdict(int)
+    received = defaultdict(int)
+
+    for block in blocks:
+        for transaction in block.transactions:
+            sent[transaction.sender] += transaction.amount
+            received[transaction.recipient] += transaction.amount
+
+    return sent, received
+
+def rescan_history(blocks, address):
+    '''
+        Find every transaction an address sent or received the slow way
+    '''
+    return [
+        (block.index, position, transaction)
+        for block in blocks
+        for position, transaction in enumerate(block.transactions)
+        if address in (transaction.sender, transaction.recipient)
+    ]
+
+def build_node(make_storage, snapshots=None):
+    '''
+        Mine a chain with payments between a few addresses, leaving one payment open
+    '''
+    wallet = Wallet()
+    wallet.create_keys()
+    node = Blockchain(wallet.public_key, storage=make_storage(), snapshots=snapshots)
+
+    for _ in range(3):
+        node.mine_block()
+
+    for recipient, amount in [('bob', 2.5), ('carol', 4), (wallet.public_key, 1)]:
+        signature = wallet.sign_transaction(wallet.public_key, recipient, amount)
+        assert node.add_transaction(wallet.public_key, recipient, signature, amount)
+    node.mine_block()
+
+    signature = wallet.sign_transaction(wallet.public_key, 'bob', 3)
+    assert node.add_transaction(wallet.public_key, 'bob', signature, 3)
+
+    return node, wallet
+
+def assert_balances_match(node, addresses):
+    sent, received = rescan(node.chain)
+    pending = defaultdict(int)
+    for transaction in node.open_transactions:
+        pending[transaction.sender] += transaction.amount
+
+    for address in addresses:
+        assert node.get_amount_received(address) == received[address]
+        assert node.get_amount_sent(address) == sent[address] + pending[address]
+        assert node.get_balance(address) == received[address] - sent[address] - pending[address]
+
+@pytest.mark.parametrize('make_storage', STORAGES.values(), ids=STORAGES.keys())
+def test_balances_match_a_full_rescan(make_storage):
+    node, wallet = build_node(make_storage)
+    addresses = [wallet.public_key, 'bob', 'carol', 'MINING', 'nobody']
+    assert_balances_match(node, addresses)
+
+    # Appended blocks are indexed on top of the existing ledger
+    node.mine_block()
+    assert_balances_match(node, addresses)
+
+    # A reloaded node indexes the stored chain
+    node.storage.close()
+    reloaded = Blockchain(wallet.public_key, storage=make_storage())
+    assert_balances_match(reloaded, addresses)
+
+def test_balances_match_a_full_rescan_from_a_snapshot():
+    snapshots = SnapshotManager('snapshots', interval=2)
+    node, wallet = build_node(STORAGES['block store'], snapshots)
+    node.mine_block()
+    node.storage.close()
+    assert snapshots.snapshot_heights()
+
+    reloaded = Blockchain(wallet.public_key, storage=STORAGES['block store'](), snapshots=snapshots)
+    assert_balances_match(reloaded, [wallet.public_key, 'bob', 'carol', 'MINING'])
+
+def test_balances_match_a_full_rescan_after_a_reorg(make_block):
+    node, wallet = build_node(FileStorage)
+
+    # A longer peer chain on top of the first block drops the payments
+    peer_chain = node.chain[:2]
+    for _ in range(5):
+        peer_chain.append(make_block(peer_chain, [], 'peer'))
+
+    assert node.resolve_conflicts([peer_chain])
+    assert_balances_match(node, [wallet.public_key, 'bob', 'carol', 'peer'])
+
+def assert_history_matches(node, addresses):
+    blocks = node.chain
+
+    for address in addresses:
+        history = rescan_history(blocks, address)
+        found = node.get_transactions(address)
+
+        assert [(index, position) for index, position, _ in found] == [(index, position) for index, position, _ in history]
+        assert [tx.to_ordered_dict() for _, _, tx in found] == [tx.to_ordered_dict() for _, _, tx in history]
+        assert node.get_transaction_count(address) == len(history)
+
+        # Pages are slices of the same history
+        assert node.get_transactions(address, offset=1, limit=2) == found[1:3]
+        assert node.get_transactions(address, offset=len(history)) == []
+
+@pytest.mark.parametrize('make_storage', STORAGES.values(), ids=STORAGES.keys())
+def test_history_matches_a_full_rescan(make_storage):
+    node, wallet = build_node(make_storage)
+    addresses = [wallet.public_key, 'bob', 'carol', 'nobody']
+    assert_history_matches(node, addresses)
+
+    # A transaction to yourself is listed once
+    own_payments = [tx for _, _, tx in node.get_transactions(wallet.public_key) if tx.recipient == tx.sender]
+    assert len(own_payments) == 1
+
+    node.storage.close()
+    reloaded = Blockchain(wallet.public_key, storage=make_storage())
+    assert_history_matches(reloaded, addresses)
+
+def test_history_matches_a_full_rescan_after_a_reorg(make_block):
+    node, wallet = build_node(FileStorage)
+
+    peer_chain = node.chain[:2]
+    for _ in range(5):
+        peer_chain.append(make_block(peer_chain, [], 'peer'))
+
+    assert node.resolve_conflicts([peer_chain])
+    assert_history_matches(node, [wallet.public_key, 'bob', 'carol', 'peer'])
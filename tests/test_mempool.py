@@ -0,0 +1,88 @@
+'''
+    Mempool tests - indexing, eviction and the limits a blockchain rebuilds its mempool with
+'''
+# Own imports
+from blockchain import Blockchain
+from mempool import Mempool
+from transaction import Transaction
+
+def make_transaction(sender='alice', recipient='bob', amount=1, signature=None):
+    return Transaction(sender, recipient, signature or f'{sender}-{recipient}-{amount}', amount)
+
+def test_add_rejects_a_duplicate():
+    mempool = Mempool()
+    transaction = make_transaction()
+
+    assert mempool.add(transaction)
+    assert not mempool.add(make_transaction())
+    assert len(mempool) == 1
+    assert transaction in mempool
+    assert mempool.pending_total('alice') == 1
+
+def test_pending_total_follows_adds_and_removes():
+    mempool = Mempool()
+    first = make_transaction(amount=2)
+    second = make_transaction(amount=3.5)
+    mempool.add(first)
+    mempool.add(second)
+    mempool.add(make_transaction('carol', amount=7))
+
+    assert mempool.pending_total('alice') == 5.5
+    assert mempool.from_sender('alice') == [first, second]
+
+    assert mempool.remove(first)
+    assert not mempool.remove(first)
+    assert mempool.pending_total('alice') == 3.5
+
+    mempool.remove_many([second])
+    assert mempool.pending_total('alice') == 0
+    assert mempool.from_sender('alice') == []
+    assert mempool.pending_total('carol') == 7
+
+def test_add_evicts_the_oldest_transactions_when_full():
+    mempool = Mempool(max_size=3)
+    transactions = [make_transaction(amount=amount) for amount in range(1, 6)]
+    for transaction in transactions:
+        mempool.add(transaction)
+
+    assert list(mempool) == transactions[2:]
+    assert mempool.pending_total('alice') == 3 + 4 + 5
+
+def test_evict_drops_the_transactions_past_the_max_age():
+    mempool = Mempool(max_age=60)
+    old = make_transaction(amount=1)
+    young = make_transaction(amount=2)
+    mempool.add(old, now=1000)
+    mempool.add(young, now=1050)
+
+    assert mempool.evict(now=1059) == []
+    assert mempool.evict(now=1061) == [old]
+    assert list(mempool) == [young]
+    assert mempool.pending_total('alice') == 2
+
+    # Without a max age nothing is ever evicted
+    mempool = Mempool()
+    mempool.add(old, now=0)
+    assert mempool.evict(now=10 ** 9) == []
+
+def test_select_picks_the_oldest_transactions_first():
+    mempool = Mempool()
+    transactions = [make_transaction(sender, amount=amount) for amount in range(3) for sender in ('alice', 'bob')]
+    for transaction in transactions:
+        mempool.add(transaction)
+
+    assert mempool.select(4) == transactions[:4]
+    assert mempool.select(100) == transactions
+    assert len(mempool) == len(transactions)
+
+def test_blockchain_keeps_the_mempool_limits():
+    node = Blockchain('node', mempool_max_size=2, mempool_max_age=60)
+    transactions = [make_transaction(amount=amount) for amount in range(1, 4)]
+
+    # Replacing the open transactions keeps the limits
+    node.open_transactions = transactions
+    assert node.open_transactions == transactions[1:]
+
+    node.load_data()
+    node.open_transactions = transactions
+    assert node.open_transactions == transactions[1:]
@@ -0,0 +1,86 @@
+'''
+    Merkle tests - inclusion proofs, header hashing and blocks with a tampered merkle root
+'''
+# std lib imports
+import json
+
+import pytest
+
+# Own imports
+from block import Block
+from blockchain import Blockchain
+from transaction import Transaction
+from util.hash_util import hash_block, hash_string_256
+from util.merkle import merkle_proof, merkle_root, verify_merkle_proof
+from util.verification import Verification
+from wallet import Wallet
+
+def make_transactions(count):
+    return [Transaction(f'sender{number}', 'recipient', f'signature{number}', number + 1) for number in range(count)]
+
+@pytest.mark.parametrize('count', [1, 2, 3, 5, 7, 8, 9])
+def test_every_transaction_has_a_valid_proof(count):
+    transactions = make_transactions(count)
+    root = merkle_root(transactions)
+
+    for position, transaction in enumerate(transactions):
+        proof = merkle_proof(transactions, position)
+        assert verify_merkle_proof(transaction, proof, root)
+
+    # A single transaction is the root itself
+    if count == 1:
+        assert merkle_proof(transactions, 0) == []
+
+@pytest.mark.parametrize('count', [1, 3, 4])
+def test_a_proof_doesnt_hold_for_another_transaction_or_root(count):
+    transactions = make_transactions(count)
+    root = merkle_root(transactions)
+    proof = merkle_proof(transactions, count - 1)
+
+    assert not verify_merkle_proof(Transaction('someone', 'recipient', 'forged', 1000), proof, root)
+    assert not verify_merkle_proof(transactions[-1], proof, merkle_root(make_transactions(count + 1)))
+
+def test_the_hash_of_a_block_is_the_hash_of_its_header():
+    transactions = make_transactions(3)
+    block = Block(1, 'genesis', transactions, 0, 0, merkle_root=merkle_root(transactions), difficulty=8)
+
+    assert block.hash == hash_block(block)
+    assert block.hash == hash_string_256(json.dumps(block.to_header_dict()).encode())
+    assert 'transactions' not in block.to_header_dict()
+
+def test_inclusion_proof_checks_out_against_the_block_hash():
+    wallet = Wallet()
+    wallet.create_keys()
+    node = Blockchain(wallet.public_key)
+    node.mine_block()
+    for recipient in ('bob', 'carol', 'dave'):
+        signature = wallet.sign_transaction(wallet.public_key, recipient, 1)
+        assert node.add_transaction(wallet.public_key, recipient, signature, 1)
+    block = node.mine_block()
+
+    for position, transaction in enumerate(block.transactions):
+        inclusion = node.get_inclusion_proof(block.index, position)
+        header = inclusion['header']
+
+        assert inclusion['block_hash'] == block.hash
+        assert hash_string_256(json.dumps(header).encode()) == block.hash
+        assert verify_merkle_proof(transaction, inclusion['proof'], header['merkle_root'])
+
+    assert node.get_inclusion_proof(block.index, len(block.transactions)) is None
+
+def test_verify_block_rejects_a_tampered_merkle_root(make_block):
+    genesis = Block(0, 'genesis', [], 100, 0)
+    block = make_block([genesis], make_transactions(2))
+    assert Verification.verify_block(block, [genesis])
+
+    # The proof of work doesn't cover the merkle root, the block hash does
+    tampered = Block(block.index, block.previous_hash, block.transactions, block.proof, block.timestamp,
+                     merkle_root=merkle_root(make_transactions(2)[:1]), difficulty=block.difficulty)
+    assert not Verification.verify_block(tampered, [genesis])
+
+    # The reward isn't covered by the proof of work either, only by the merkle root
+    reward = Transaction('MINING', 'attacker', '', 10)
+    swapped = Block(block.index, block.previous_hash, list(block.transactions[:-1]) + [reward],
+                    block.proof, block.timestamp, merkle_root=block.merkle_root, difficulty=block.difficulty)
+    assert Verification.valid_proof(swapped.transactions[:-1], swapped.previous_hash, swapped.proof, swapped.difficulty)
+    assert not Verification.verify_block(swapped, [genesis])
@@ -0,0 +1,205 @@
+'''
+    Storage tests - the blockchain survives a restart and damaged files aren't overwritten
+'''
+# std lib imports
+import json
+import pickle
+
+import pytest
+
+# Own imports
+from blockchain import Blockchain, MINING_REWARD
+from block import Block
+from transaction import Transaction
+from util.binary_format import load_binary, save_binary, RECORD_LENGTH
+from util.block_log import BlockLogStorage, RECORD_HEADER
+from util.block_store import BlockStoreStorage, INDEX_ENTRY
+from util.files import load_open_transactions
+from util.storage import BinaryFileStorage, FileStorage
+from util.write_behind import WriteBehindStorage
+from wallet import Wallet
+
+def make_node(storage):
+    return Blockchain('node', storage=storage)
+
+def test_binary_storage_starts_a_new_chain_without_a_file(workdir):
+    node = make_node(BinaryFileStorage())
+    assert len(node) == 1
+    assert not (workdir / 'blockchain.bin').exists()
+
+def test_binary_storage_reloads_the_chain():
+    node = make_node(BinaryFileStorage())
+    node.mine_block()
+    node.mine_block()
+
+    reloaded = make_node(BinaryFileStorage())
+    assert [block.hash for block in reloaded.chain] == [block.hash for block in node.chain]
+    assert reloaded.get_balance() == 2 * MINING_REWARD
+
+@pytest.mark.parametrize('damage', [
+    lambda data: data[:-7],
+    lambda data: b'garbage' + data[7:],
+], ids=['truncated', 'bad header'])
+def test_binary_storage_keeps_a_damaged_file(workdir, damage):
+    node = make_node(BinaryFileStorage())
+    node.mine_block()
+
+    path = workdir / 'blockchain.bin'
+    damaged = damage(path.read_bytes())
+    path.write_bytes(damaged)
+
+    with pytest.raises(IOError):
+        make_node(BinaryFileStorage())
+
+    assert path.read_bytes() == damaged
+
+def test_transactions_cant_be_changed_after_a_block_hashed_them():
+    transaction = Transaction('alice', 'bob', 'signature', 1)
+    block = Block(1, 'genesis', [transaction], 0, 0)
+    block_hash = block.hash
+
+    with pytest.raises(AttributeError):
+        transaction.amount = 1000
+    with pytest.raises(AttributeError):
+        del transaction.recipient
+    assert block.hash == block_hash
+
+    # Unpickling sets the attributes once as well
+    unpickled = pickle.loads(pickle.dumps(transaction))
+    assert unpickled.to_ordered_dict() == transaction.to_ordered_dict()
+    with pytest.raises(AttributeError):
+        unpickled.amount = 1000
+
+def test_save_binary_keeps_the_old_file_when_a_save_fails(workdir):
+    node = make_node(BinaryFileStorage())
+    node.mine_block()
+
+    path = workdir / 'blockchain.bin'
+    data = path.read_bytes()
+
+    # The block can't be encoded, so the save fails halfway through the chain
+    unencodable = Block(2, 'z' * 70000, [], 0, 0)
+    with pytest.raises(ValueError):
+        save_binary(str(path), node.chain + [unencodable], [])
+
+    assert path.read_bytes() == data
+    blockchain, _ = load_binary(str(path))
+    assert [block.hash for block in blockchain] == [block.hash for block in node.chain]
+
+def test_lazy_block_log_indexes_the_ledger_on_first_use(monkeypatch):
+    node = make_node(BlockLogStorage('log'))
+    for _ in range(3):
+        node.mine_block()
+    node.storage.close()
+
+    reads = []
+    read_block = BlockLogStorage.read_block
+    monkeypatch.setattr(BlockLogStorage, 'read_block', lambda self, location: reads.append(location) or read_block(self, location))
+
+    reloaded = make_node(BlockLogStorage('log', lazy=True))
+    assert len(reloaded) == 4
+    assert reads == []
+
+    assert reloaded.get_balance() == 3 * MINING_REWARD
+    assert len(reads) == 4
+
+    # Blocks appended before the ledger is needed are indexed once
+    reloaded = make_node(BlockLogStorage('log', lazy=True))
+    reloaded.mine_block()
+    assert reloaded.get_balance() == 4 * MINING_REWARD
+    assert reloaded.get_transaction_count('node') == 4
+
+def test_block_store_recovers_from_a_torn_append(workdir):
+    node = make_node(BlockStoreStorage('store'))
+    for _ in range(3):
+        node.mine_block()
+    node.storage.close()
+
+    # A crash while appending: the record is cut off and its index entry is half written
+    data_path = workdir / 'store' / 'blocks.dat'
+    index_path = workdir / 'store' / 'blocks.idx'
+    data_size = data_path.stat().st_size
+    with open(data_path, 'ab') as data, open(index_path, 'ab') as index:
+        data.write(RECORD_LENGTH.pack(1000) + b'{"index": 4')
+        index.write(INDEX_ENTRY.pack(data_size)[:3])
+
+    reloaded = make_node(BlockStoreStorage('store'))
+    assert len(reloaded) == 4
+    assert data_path.stat().st_size == data_size
+    assert reloaded.get_balance() == 3 * MINING_REWARD
+
+    reloaded.mine_block()
+    reloaded.storage.close()
+    assert len(make_node(BlockStoreStorage('store'))) == 5
+
+@pytest.mark.parametrize('lazy', [False, True], ids=['eager', 'lazy'])
+def test_block_log_cuts_off_a_torn_record(lazy):
+    node = make_node(BlockLogStorage('log'))
+    for _ in range(3):
+        node.mine_block()
+    node.storage.close()
+
+    # A crash while appending leaves part of a record at the end of the last segment
+    storage = BlockLogStorage('log', lazy=lazy)
+    path = storage.segment_path(storage.segment_numbers()[-1])
+    with open(path, 'rb') as open_file:
+        data = open_file.read()
+    with open(path, 'ab') as open_file:
+        open_file.write(RECORD_HEADER.pack(1000, 0) + b'{"index": 4')
+
+    reloaded = make_node(storage)
+    assert len(reloaded) == 4
+    assert reloaded.get_balance() == 3 * MINING_REWARD
+    with open(path, 'rb') as open_file:
+        assert open_file.read() == data
+
+    reloaded.mine_block()
+    reloaded.storage.close()
+    assert len(make_node(BlockLogStorage('log'))) == 5
+
+@pytest.mark.parametrize('make_storage', [FileStorage, lambda: BlockLogStorage('log')], ids=['file', 'block log'])
+def test_write_behind_flush_writes_every_queued_save(make_storage):
+    wallet = Wallet()
+    wallet.create_keys()
+    storage = WriteBehindStorage(make_storage(), flush_interval=60, sync_blocks=False)
+    node = Blockchain(wallet.public_key, storage=storage)
+
+    node.mine_block()
+    node.mine_block()
+    signature = wallet.sign_transaction(wallet.public_key, 'bob', 2.5)
+    assert node.add_transaction(wallet.public_key, 'bob', signature, 2.5)
+
+    # Nothing is due yet, the saves stay queued until the barrier
+    reloaded, open_transactions = make_storage().load()
+    assert len(reloaded) == 1
+
+    storage.flush()
+
+    reloaded, open_transactions = make_storage().load()
+    assert [block.hash for block in reloaded] == [block.hash for block in node.chain]
+    assert [tx.signature for tx in open_transactions] == [signature]
+    storage.close()
+
+def test_block_store_node_rejects_transactions_it_cant_store():
+    wallet = Wallet()
+    wallet.create_keys()
+    node = Blockchain(wallet.public_key, storage=BlockStoreStorage('store'))
+    node.mine_block()
+
+    recipient = 'b' * 70000
+    signature = wallet.sign_transaction(wallet.public_key, recipient, 1)
+    assert not node.add_transaction(wallet.public_key, recipient, signature, 1)
+    assert node.add_transactions([Transaction(wallet.public_key, recipient, signature, 1)]) == [False]
+    assert node.open_transactions == []
+
+    # Mining keeps working
+    assert node.mine_block()
+    assert len(node) == 3
+
+def test_load_open_transactions_drops_transactions_it_cant_store(workdir):
+    (workdir / 'mempool.txt').write_text(json.dumps([
+        {'sender': 'a', 'recipient': 'b' * 70000, 'signature': '', 'amount': 1},
+        {'sender': 'a', 'recipient': 'b', 'signature': '', 'amount': 1},
+    ]))
+
+    assert [tx.recipient for tx in load_open_transactions('mempool.txt')] == ['b']
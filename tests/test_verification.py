@@ -0,0 +1,105 @@
+'''
+    Verification tests - block headers, timestamps and difficulty retargeting
+'''
+# std lib imports
+import hashlib
+import multiprocessing
+from time import time
+
+import pytest
+
+# Own imports
+from block import Block
+from blockchain import Blockchain
+from transaction import Transaction
+from util.difficulty import (median_time, next_difficulty, DEFAULT_DIFFICULTY, MAX_FUTURE_BLOCK_TIME,
+                             MAX_RETARGET_STEP, RETARGET_WINDOW)
+from util.mining import ProofOfWorkMiner
+from util.verification import Verification
+
+START_TIME = 1552800000.0
+
+def make_blocks(interval, count=RETARGET_WINDOW, difficulty=DEFAULT_DIFFICULTY):
+    '''
+        Create the blocks of a retarget window (only their timestamps matter) after a genesis block
+    '''
+    blocks = [Block(0, 'genesis', [], 100, 0)]
+    for index in range(1, count):
+        blocks.append(Block(index, blocks[-1].hash, [], 0, START_TIME + index * interval, difficulty=difficulty))
+    return blocks
+
+def test_next_difficulty_goes_up_when_blocks_are_fast(retarget):
+    assert next_difficulty(make_blocks(retarget / 2)) == DEFAULT_DIFFICULTY + 1
+    assert next_difficulty(make_blocks(retarget / 10)) == DEFAULT_DIFFICULTY + MAX_RETARGET_STEP
+
+def test_next_difficulty_goes_down_when_blocks_are_slow(retarget):
+    assert next_difficulty(make_blocks(retarget * 2)) == DEFAULT_DIFFICULTY - 1
+    assert next_difficulty(make_blocks(retarget * 100)) == DEFAULT_DIFFICULTY - MAX_RETARGET_STEP
+
+def test_next_difficulty_only_changes_at_the_end_of_a_window(retarget):
+    assert next_difficulty(make_blocks(1, RETARGET_WINDOW - 1)) == DEFAULT_DIFFICULTY
+    assert next_difficulty(make_blocks(retarget)) == DEFAULT_DIFFICULTY
+
+def test_next_difficulty_stays_fixed_without_a_target_interval():
+    # The fixed_difficulty fixture turns the retargeting off
+    assert next_difficulty(make_blocks(1)) == DEFAULT_DIFFICULTY
+
+def test_verify_block_rejects_a_timestamp_before_the_median(make_block):
+    previous_blocks = make_blocks(10, 5)
+    median = median_time(previous_blocks)
+    assert median == START_TIME + 25
+
+    assert not Verification.verify_block(make_block(previous_blocks, [], timestamp=median), previous_blocks)
+    assert Verification.verify_block(make_block(previous_blocks, [], timestamp=median + 1), previous_blocks)
+
+def test_verify_block_rejects_a_timestamp_in_the_future(make_block):
+    previous_blocks = make_blocks(10, 5)
+
+    future = time() + MAX_FUTURE_BLOCK_TIME * 2
+    assert not Verification.verify_block(make_block(previous_blocks, [], timestamp=future), previous_blocks)
+    assert Verification.verify_block(make_block(previous_blocks, [], timestamp=time()), previous_blocks)
+
+def leading_zero_bits(digest):
+    '''
+        Count the leading zero bits of a digest the slow way
+    '''
+    bits = bin(int.from_bytes(digest, 'big'))[2:].zfill(len(digest) * 8)
+    return len(bits) - len(bits.lstrip('0'))
+
+@pytest.mark.parametrize('difficulty', [1, 4, 8, 12])
+def test_valid_seeded_proof_matches_valid_proof(difficulty):
+    transactions = [Transaction('alice', 'bob', 'signature', 2.5), Transaction('bob', 'carol', 'signature', 1)]
+    last_hash = 'previous'
+    hasher = Verification.proof_hasher(Verification.proof_prefix(transactions, last_hash))
+    guess_prefix = (str([tx.to_ordered_dict() for tx in transactions]) + last_hash).encode()
+
+    valid_proofs = 0
+    for proof in range(2000):
+        seeded = Verification.valid_seeded_proof(hasher, proof, difficulty)
+        assert seeded == Verification.valid_proof(transactions, last_hash, proof, difficulty)
+
+        # The hash of the whole guess, computed without the midstate
+        digest = hashlib.sha256(guess_prefix + str(proof).encode()).digest()
+        assert seeded == (leading_zero_bits(digest) >= difficulty)
+        valid_proofs += seeded
+
+    # The hasher is copied for every guess, so it's left untouched
+    assert hasher.digest() == hashlib.sha256(guess_prefix).digest()
+    assert valid_proofs > 0 or difficulty >= 12
+
+def test_mining_processes_find_the_lowest_proof_and_shut_down():
+    transactions = [Transaction('alice', 'bob', 'signature', 2.5)]
+    expected = ProofOfWorkMiner().proof_of_work(transactions, 'previous', 10)
+
+    node = Blockchain('node', mining_workers=2, nonce_range=50)
+    assert node.miner.proof_of_work(transactions, 'previous', 10) == expected
+
+    node.mine_block()
+    assert Verification.verify_chain(node)
+
+    # Closing stops the pool, the next round starts a new one
+    node.close()
+    assert not multiprocessing.active_children()
+    assert node.miner.proof_of_work(transactions, 'previous', 10) == expected
+    node.close()
+    assert not multiprocessing.active_children()
@@ -0,0 +1,186 @@
+'''
+    Api tests - malformed requests are answered with 400 instead of failing
+'''
+# std lib imports
+import json
+
+import pytest
+
+# Own imports
+from block import Block
+from blockchain import Blockchain, MINING_REWARD
+from util.files import load_peer_nodes
+from wallet import Wallet
+
+@pytest.fixture
+def client():
+    import web
+
+    wallet = Wallet()
+    wallet.create_keys()
+    web.app.wallet = wallet
+    web.app.blockchain = Blockchain(wallet.public_key)
+    web.app.gossip.blockchain = web.app.blockchain
+    web.app.blockchain.mine_block()
+
+    return web.app.test_client()
+
+@pytest.mark.parametrize('amount', ['5', True, None, 0, -1, [1], 2 ** 63])
+def test_transaction_rejects_an_invalid_amount(client, amount):
+    response = client.post('/transaction', json={'recipient': 'bob', 'amount': amount})
+    assert response.status_code == 400
+
+def test_transaction_rejects_an_invalid_recipient(client):
+    response = client.post('/transaction', json={'recipient': 5, 'amount': 1})
+    assert response.status_code == 400
+
+    response = client.post('/transaction', json=['recipient', 'amount'])
+    assert response.status_code == 400
+
+    # Text fields of the binary format hold up to 65535 bytes
+    response = client.post('/transaction', json={'recipient': 'b' * 70000, 'amount': 1})
+    assert response.status_code == 400
+
+def test_transaction_is_added(client):
+    response = client.post('/transaction', json={'recipient': 'bob', 'amount': 1.5})
+    assert response.status_code == 201
+    assert response.get_json()['balance'] == MINING_REWARD - 1.5
+
+def test_transaction_batch_checks_every_transaction_against_the_remaining_balance(client, monkeypatch):
+    blockchain = client.application.blockchain
+    wallet = client.application.wallet
+    other = Wallet()
+    other.create_keys()
+
+    # An open transaction is already debited before the batch
+    signature = wallet.sign_transaction(wallet.public_key, 'bob', 1)
+    assert blockchain.add_transaction(wallet.public_key, 'bob', signature, 1)
+
+    def signed(sender_wallet, recipient, amount, signature=None):
+        return {
+            'sender': sender_wallet.public_key,
+            'recipient': recipient,
+            'amount': amount,
+            'signature': signature or sender_wallet.sign_transaction(sender_wallet.public_key, recipient, amount),
+        }
+
+    first = signed(wallet, 'carol', 4)
+    remaining = MINING_REWARD - 1 - 4 - 3
+    batch = [
+        first,
+        signed(wallet, 'dave', 3),
+        signed(wallet, 'erin', remaining + 0.5),
+        first,
+        signed(wallet, 'frank', 0.5, signature=first['signature']),
+        signed(other, 'carol', 1),
+        {'sender': wallet.public_key, 'amount': 1},
+        signed(wallet, 'grace', remaining),
+    ]
+
+    saves = []
+    save_open_transactions = blockchain.storage.save_open_transactions
+    monkeypatch.setattr(blockchain.storage, 'save_open_transactions',
+                        lambda *args: saves.append(args) or save_open_transactions(*args))
+
+    response = client.post('/transactions/batch', json={'transactions': batch})
+    assert response.status_code == 200
+    assert response.get_json() == {
+        'accepted': 3,
+        'rejected': 5,
+        'results': [True, True, False, False, False, False, False, True],
+    }
+
+    # The accepted transactions are saved with a single write
+    assert len(saves) == 1
+    assert [tx.recipient for tx in blockchain.open_transactions] == ['bob', 'carol', 'dave', 'grace']
+    assert blockchain.get_balance() == 0
+    assert blockchain.get_balance(other.public_key) == 0
+
+def test_transaction_batch_rejects_a_body_without_transactions(client):
+    for body in [None, [], {'transactions': 'all'}, {'transactions': {}}]:
+        response = client.post('/transactions/batch', json=body)
+        assert response.status_code == 400
+
+def test_chain_serializes_every_block_once(client, monkeypatch):
+    blockchain = client.application.blockchain
+    blockchain.mine_block()
+    blockchain.mine_block()
+
+    serialized = []
+    to_dict = Block.to_dict
+    monkeypatch.setattr(Block, 'to_dict', lambda block: serialized.append(block.index) or to_dict(block))
+
+    response = client.get('/chain')
+    blocks = json.loads(response.data)
+    assert [block['index'] for block in blocks] == [0, 1, 2, 3]
+
+    # Only blocks that weren't served or saved before are serialized, and only once
+    served = list(serialized)
+    assert len(served) == len(set(served))
+
+    assert json.loads(client.get('/chain').data) == blocks
+    assert json.loads(client.get('/chain?from_height=2&limit=1').data) == blocks[2:3]
+    assert serialized == served
+
+    # Appending a block only serializes the new block
+    blockchain.mine_block()
+    serialized.clear()
+    client.get('/chain')
+    assert serialized in ([], [4])
+
+def test_broadcast_blocks_skips_malformed_blocks(client, make_block):
+    block = make_block(client.application.blockchain.chain, [], 'peer').to_dict()
+    malformed = [
+        dict(block, index='1'),
+        dict(block, proof=None),
+        dict(block, previous_hash=[]),
+        dict(block, difficulty='8'),
+        dict(block, transactions={}),
+        dict(block, transactions=[{'sender': 'a', 'recipient': 'b', 'signature': '', 'amount': 'x'}]),
+        dict(block, index=-1),
+        dict(block, index=2 ** 64),
+        dict(block, proof=-5),
+        dict(block, difficulty=256),
+        dict(block, transactions=[{'sender': 'a', 'recipient': 'b' * 70000, 'signature': '', 'amount': 1}]),
+        'block',
+    ]
+
+    response = client.post('/broadcast/blocks', json={'blocks': malformed})
+    assert response.status_code == 200
+    assert response.get_json()['added'] == 0
+
+    response = client.post('/broadcast/blocks', json=[block])
+    assert response.status_code == 400
+
+    response = client.post('/broadcast/blocks', json={'blocks': [block]})
+    assert response.get_json()['added'] == 1
+
+@pytest.mark.parametrize('body', [
+    ['localhost:5001'],
+    {},
+    {'nodes': [5]},
+    {'nodes': 'localhost:5001'},
+    {'nodes': ['localhost:5001', None]},
+    {'node': 'localhost'},
+    {'node': 'localhost:port'},
+    {'node': 'localhost:70000'},
+    {'node': ':5001'},
+    {'node': 'local host:5001'},
+])
+def test_add_nodes_rejects_invalid_nodes(client, body):
+    response = client.post('/nodes', json=body)
+    assert response.status_code == 400
+    assert client.get('/nodes').status_code == 200
+
+def test_add_nodes(client):
+    response = client.post('/nodes', json={'nodes': ['localhost:5001', '[::1]:5002']})
+    assert response.status_code == 201
+
+    response = client.post('/nodes', json={'node': '127.0.0.1:5003'})
+    assert response.get_json()['all_nodes'] == ['127.0.0.1:5003', '[::1]:5002', 'localhost:5001']
+
+    assert load_peer_nodes() == ['127.0.0.1:5003', '[::1]:5002', 'localhost:5001']
+
+def test_load_peer_nodes_drops_invalid_nodes(workdir):
+    (workdir / 'peers.txt').write_text(json.dumps([5, 'localhost:5001', 'nothing']))
+    assert load_peer_nodes() == ['localhost:5001']
@@ -1,4 +1,5 @@
 # std lib imports
+import sys
 from collections import OrderedDict
 
 # Own imports
@@ -13,15 +14,39 @@ class Transaction(Printable):
             :recipient: the transaction recipient
             :amount: the transaction amount
 
+        A transaction can't be changed after it's created, the blocks holding it memoize their
+        hash and json.
+
         Functions:
             :to_ordered_dict: return the transaction as an ordered dict (primarily for hashing)
     '''
+    __slots__ = ('sender', 'recipient', 'amount', 'signature')
+
     def __init__(self, sender, recipient, signature, amount):
-        self.sender = sender
-        self.recipient = recipient
+        # Addresses are interned so every public key is only stored once, no matter how
+        # many transactions it's part of
+        self.sender = sys.intern(sender)
+        self.recipient = sys.intern(recipient)
         self.amount = amount
         self.signature = signature
 
+    def __setattr__(self, name, value):
+        # Every attribute is only set once, by __init__ or when unpickling
+        if hasattr(self, name):
+            raise AttributeError(f'The {name} of a transaction can\'t be changed')
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name):
+        raise AttributeError(f'The {name} of a transaction can\'t be changed')
+
+    def __setstate__(self, state):
+        # Pickles from before __slots__ was used hold a plain dict
+        if isinstance(state, tuple):
+            state = state[1]
+
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def to_ordered_dict(self):
         '''
             Convert the transaction into an ordered dict
@@ -0,0 +1,341 @@
+'''
+    Binary format module - a compact, versioned binary encoding of blocks and transactions
+
+    Hex encoded keys, signatures and hashes are stored as raw bytes and numbers as fixed width
+    fields, which makes a block a little under half the size of its json. Decoding works on a
+    memoryview, so a block can be read straight out of a larger buffer (or a memory mapped file).
+
+    Block layout (big endian):
+        :version: 1 byte, FORMAT_VERSION
+        :index: 8 bytes, unsigned
+        :proof: 8 bytes, unsigned
+        :flags: 1 byte, the optional fields that are present (not in version 1)
+        :timestamp: number field
+        :merkle_root: text field, only present with FLAG_MERKLE_ROOT
+        :difficulty: 1 byte, only present with FLAG_DIFFICULTY
+        :previous_hash: text field
+        :transaction count: 4 bytes, unsigned
+        :transactions: every transaction as sender, recipient, signature (text fields) and amount (number field)
+
+    Number field: 1 byte tag (NUMBER_INT or NUMBER_FLOAT) followed by an 8 byte int or double.
+    Text field: 1 byte tag (TEXT_HEX or TEXT_UTF8), a 2 byte length and the bytes. Lower case hex
+    strings are stored as the bytes they encode, everything else as utf8.
+
+    File layout:
+        :magic: FILE_MAGIC
+        :version: 1 byte, FORMAT_VERSION (files and blocks of any of SUPPORTED_VERSIONS can be read)
+        :records: length prefixed records (4 byte length), the blocks followed by a single
+                  record with the open transactions (a transaction count and the transactions)
+'''
+
+# std lib imports
+import os
+import struct
+
+# Own imports
+from block import Block
+from transaction import Transaction
+
+FILE_MAGIC = b'CZBC'
+FORMAT_VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+
+# Optional block fields present in a version 2 block
+FLAG_MERKLE_ROOT = 0x01
+FLAG_DIFFICULTY = 0x02
+
+NUMBER_INT = 0
+NUMBER_FLOAT = 1
+TEXT_HEX = 0
+TEXT_UTF8 = 1
+
+BLOCK_HEADER = struct.Struct('>BQQ')
+FLAGS = struct.Struct('>B')
+DIFFICULTY = struct.Struct('>B')
+NUMBER = struct.Struct('>B8s')
+INT = struct.Struct('>q')
+FLOAT = struct.Struct('>d')
+TEXT_HEADER = struct.Struct('>BH')
+COUNT = struct.Struct('>I')
+RECORD_LENGTH = struct.Struct('>I')
+
+# The largest values the fixed width fields hold
+MAX_TEXT_SIZE = 0xFFFF
+MAX_UNSIGNED = 2 ** 64 - 1
+MIN_INT = -2 ** 63
+MAX_INT = 2 ** 63 - 1
+MAX_DIFFICULTY_FIELD = 0xFF
+
+def fits_text(text):
+    '''
+        Check whether a string fits a text field (any string of up to MAX_TEXT_SIZE utf8 bytes)
+    '''
+    try:
+        return len(text.encode('utf-8')) <= MAX_TEXT_SIZE
+    except UnicodeEncodeError:
+        return False
+
+def fits_number(number):
+    '''
+        Check whether an int or float fits a number field
+    '''
+    return isinstance(number, float) or MIN_INT <= number <= MAX_INT
+
+def fits_unsigned(number):
+    '''
+        Check whether an int fits an unsigned 8 byte field (the index and the proof of a block)
+    '''
+    return 0 <= number <= MAX_UNSIGNED
+
+def fits_transaction(transaction):
+    '''
+        Check whether a transaction can be encoded, a transaction that can't would make every
+        save of a block containing it fail
+    '''
+    texts = (transaction.sender, transaction.recipient, transaction.signature)
+    return all(fits_text(text) for text in texts) and fits_number(transaction.amount)
+
+def encode_number(number):
+    '''
+        Encode an int or float as a tagged fixed width field (the type is kept so
+        the json, and therefore the hash, of the block stays the same)
+    '''
+    if isinstance(number, float):
+        return bytes([NUMBER_FLOAT]) + FLOAT.pack(number)
+
+    return bytes([NUMBER_INT]) + INT.pack(number)
+
+def decode_number(view, offset):
+    '''
+        Decode a number field
+
+        Returns:
+            The number and the offset after the field
+    '''
+    tag = view[offset]
+    number_format = FLOAT if tag == NUMBER_FLOAT else INT
+    number, = number_format.unpack_from(view, offset + 1)
+
+    return number, offset + NUMBER.size
+
+def encode_text(text):
+    '''
+        Encode a string as a tagged length prefixed field, lower case hex is stored as raw bytes
+    '''
+    try:
+        raw = bytes.fromhex(text)
+        tag = TEXT_HEX if raw.hex() == text else TEXT_UTF8
+    except ValueError:
+        tag = TEXT_UTF8
+
+    if tag == TEXT_UTF8:
+        raw = text.encode('utf-8')
+
+    if len(raw) > 0xFFFF:
+        raise ValueError('Text fields are limited to 65535 bytes')
+
+    return TEXT_HEADER.pack(tag, len(raw)) + raw
+
+def decode_text(view, offset):
+    '''
+        Decode a text field
+
+        Returns:
+            The string and the offset after the field
+    '''
+    tag, length = TEXT_HEADER.unpack_from(view, offset)
+    start = offset + TEXT_HEADER.size
+    raw = view[start:start + length]
+
+    text = raw.hex() if tag == TEXT_HEX else str(raw, 'utf-8')
+    return text, start + length
+
+def encode_transaction(transaction):
+    '''
+        Encode a transaction
+
+        Returns:
+            The transaction as bytes
+    '''
+    return b''.join([
+        encode_text(transaction.sender),
+        encode_text(transaction.recipient),
+        encode_text(transaction.signature),
+        encode_number(transaction.amount)
+    ])
+
+def decode_transaction(view, offset):
+    '''
+        Decode a transaction
+
+        Returns:
+            The transaction and the offset after it
+    '''
+    sender, offset = decode_text(view, offset)
+    recipient, offset = decode_text(view, offset)
+    signature, offset = decode_text(view, offset)
+    amount, offset = decode_number(view, offset)
+
+    return Transaction(sender, recipient, signature, amount), offset
+
+def encode_transactions(transactions):
+    '''
+        Encode a list of transactions as a count followed by the transactions
+    '''
+    transactions = list(transactions)
+    return COUNT.pack(len(transactions)) + b''.join(encode_transaction(tx) for tx in transactions)
+
+def decode_transactions(view, offset):
+    '''
+        Decode a list of transactions
+
+        Returns:
+            The transactions and the offset after them
+    '''
+    count, = COUNT.unpack_from(view, offset)
+    offset += COUNT.size
+    transactions = []
+
+    for _ in range(count):
+        transaction, offset = decode_transaction(view, offset)
+        transactions.append(transaction)
+
+    return transactions, offset
+
+def encode_block(block):
+    '''
+        Encode a block
+
+        Returns:
+            The block as bytes
+    '''
+    flags = 0
+    optional_fields = []
+
+    if block.merkle_root is not None:
+        flags |= FLAG_MERKLE_ROOT
+        optional_fields.append(encode_text(block.merkle_root))
+
+    if block.difficulty is not None:
+        flags |= FLAG_DIFFICULTY
+        optional_fields.append(DIFFICULTY.pack(block.difficulty))
+
+    return b''.join([
+        BLOCK_HEADER.pack(FORMAT_VERSION, block.index, block.proof),
+        FLAGS.pack(flags),
+        encode_number(block.timestamp),
+        *optional_fields,
+        encode_text(block.previous_hash),
+        encode_transactions(block.transactions)
+    ])
+
+def decode_block(view, offset=0):
+    '''
+        Decode a block
+
+        Arguments:
+            :view: a memoryview (or bytes) holding the block
+            :offset: the offset of the block within the view
+
+        Returns:
+            The decoded block
+
+        Raises:
+            ValueError if the block was encoded with an unknown format version
+    '''
+    view = memoryview(view)
+    version, index, proof = BLOCK_HEADER.unpack_from(view, offset)
+    offset += BLOCK_HEADER.size
+
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError(f'Unknown block format version {version}')
+
+    # Version 1 blocks don't have any optional fields
+    flags = 0
+    if version >= 2:
+        flags, = FLAGS.unpack_from(view, offset)
+        offset += FLAGS.size
+
+    timestamp, offset = decode_number(view, offset)
+
+    merkle_root = None
+    if flags & FLAG_MERKLE_ROOT:
+        merkle_root, offset = decode_text(view, offset)
+
+    difficulty = None
+    if flags & FLAG_DIFFICULTY:
+        difficulty, = DIFFICULTY.unpack_from(view, offset)
+        offset += DIFFICULTY.size
+
+    previous_hash, offset = decode_text(view, offset)
+    transactions, offset = decode_transactions(view, offset)
+
+    return Block(index, previous_hash, transactions, proof, timestamp, merkle_root, difficulty)
+
+def encode_record(payload):
+    '''
+        Prefix a payload with its length
+    '''
+    return RECORD_LENGTH.pack(len(payload)) + payload
+
+def save_binary(filename, blockchain, open_transactions):
+    '''
+        Save the blockchain and the open transactions to a binary file
+
+        Arguments:
+            :filename: the file to write
+            :blockchain: the blockchain to save
+            :open_transactions: a list of open transactions
+    '''
+    temp_filename = filename + '.tmp'
+
+    # Write to a temporary file first so a crash (or a block that can't be encoded) never
+    # leaves a half written file behind
+    with open(temp_filename, 'wb') as open_file:
+        open_file.write(FILE_MAGIC + bytes([FORMAT_VERSION]))
+
+        for block in blockchain:
+            open_file.write(encode_record(encode_block(block)))
+
+        open_file.write(encode_record(encode_transactions(open_transactions)))
+        open_file.flush()
+        os.fsync(open_file.fileno())
+
+    os.replace(temp_filename, filename)
+
+def load_binary(filename):
+    '''
+        Load the blockchain and the open transactions from a binary file
+
+        Arguments:
+            :filename: the file to read
+
+        Returns:
+            The blockchain and the open transactions
+
+        Raises:
+            ValueError if the file isn't a binary blockchain file
+    '''
+    with open(filename, 'rb') as open_file:
+        view = memoryview(open_file.read())
+
+    header_size = len(FILE_MAGIC) + 1
+    if bytes(view[:len(FILE_MAGIC)]) != FILE_MAGIC or view[len(FILE_MAGIC)] not in SUPPORTED_VERSIONS:
+        raise ValueError(f'{filename} is not a supported binary blockchain file')
+
+    # Collect the offsets of the records first, the last one holds the open transactions
+    records = []
+    offset = header_size
+
+    while offset < len(view):
+        length, = RECORD_LENGTH.unpack_from(view, offset)
+        records.append(offset + RECORD_LENGTH.size)
+        offset += RECORD_LENGTH.size + length
+
+    if not records:
+        raise ValueError(f'{filename} doesn\'t contain any records')
+
+    blockchain = [decode_block(view, record) for record in records[:-1]]
+    open_transactions, _ = decode_transactions(view, records[-1])
+
+    return (blockchain, open_transactions)
@@ -0,0 +1,350 @@
+'''
+    Block log module - an append only storage format for the blockchain
+
+    Every mined block is appended as one record to a segment file, so persisting a block
+    costs the same no matter how long the chain is. The open transactions are kept in a
+    separate small file that is replaced as a whole.
+
+    Record layout (big endian):
+        :length: 4 bytes, the length of the payload
+        :checksum: 4 bytes, the crc32 of the payload
+        :payload: the block as json
+'''
+
+# std lib imports
+import json
+import os
+import struct
+import threading
+import zlib
+
+# Own imports
+from util.files import parse_json_block, load_data, load_open_transactions, save_open_transactions
+from util.lazy_chain import LazyChain
+
+RECORD_HEADER = struct.Struct('>II')
+
+# Segments are rolled over once they grow beyond this size
+DEFAULT_SEGMENT_SIZE = 16 * 1024 * 1024
+
+# The amount of appended blocks between two fsync calls
+DEFAULT_SYNC_EVERY = 8
+
+def encode_record(payload):
+    '''
+        Frame a payload as a block log record
+
+        Arguments:
+            :payload: the bytes to frame
+
+        Returns:
+            The record as bytes
+    '''
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+def read_records(open_file):
+    '''
+        Read the records of a segment one at a time
+
+        Arguments:
+            :open_file: the segment, opened in binary mode
+
+        Returns:
+            A generator of (offset, payload) tuples, it stops at the end of the segment or at the
+            first torn record
+    '''
+    while True:
+        offset = open_file.tell()
+        header = open_file.read(RECORD_HEADER.size)
+
+        if len(header) < RECORD_HEADER.size:
+            return
+
+        length, checksum = RECORD_HEADER.unpack(header)
+        payload = open_file.read(length)
+
+        # A record that was only partly written or got corrupted
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return
+
+        yield offset, payload
+
+class BlockLogStorage:
+    '''
+        Stores the blockchain as an append only log of block records split over segment files
+
+        Attributes:
+            :directory: the directory containing the segments and the open transactions file
+            :segment_size: the size at which a new segment is started
+            :sync_every: the amount of appended blocks after which the segment is fsynced
+            :lazy: only keep the locations of the blocks in memory and read them when they're accessed
+    '''
+    def __init__(self, directory='blockchain', segment_size=DEFAULT_SEGMENT_SIZE, sync_every=DEFAULT_SYNC_EVERY,
+                 lazy=False):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.sync_every = sync_every
+        self.lazy = lazy
+        self.__segment = None
+        self.__unsynced = 0
+        self.__readers = {}
+        self.__readers_lock = threading.Lock()
+
+    @property
+    def mempool_path(self):
+        '''
+            The path of the open transactions file
+        '''
+        return os.path.join(self.directory, 'mempool.txt')
+
+    def segment_path(self, number):
+        '''
+            Get the path of a segment file
+
+            Arguments:
+                :number: the number of the segment
+        '''
+        return os.path.join(self.directory, f'blocks-{number:08d}.log')
+
+    def segment_numbers(self):
+        '''
+            Get the numbers of every segment on disk, in order
+        '''
+        numbers = []
+
+        for name in os.listdir(self.directory):
+            if name.startswith('blocks-') and name.endswith('.log'):
+                numbers.append(int(name[len('blocks-'):-len('.log')]))
+
+        return sorted(numbers)
+
+    def scan(self):
+        '''
+            Read every record within the log one at a time, a torn record at the end of the log
+            (left behind by a crash during an append) is cut off
+
+            Returns:
+                A generator of ((segment number, offset), payload) tuples, in order
+
+            Raises:
+                IOError if a segment other than the last one is corrupted
+        '''
+        numbers = self.segment_numbers()
+
+        for number in numbers:
+            path = self.segment_path(number)
+
+            with open(path, 'r+b') as open_file:
+                end = 0
+
+                for offset, payload in read_records(open_file):
+                    end = offset + RECORD_HEADER.size + len(payload)
+                    yield (number, offset), payload
+
+                if end == os.fstat(open_file.fileno()).st_size:
+                    continue
+
+                if number != numbers[-1]:
+                    raise IOError(f'Block log segment {path} is corrupted')
+
+                print(f'Truncating a torn record at the end of {path}')
+                open_file.truncate(end)
+                open_file.flush()
+                os.fsync(open_file.fileno())
+
+    def iter_blocks(self):
+        '''
+            Parse the blocks within the log one at a time
+
+            Returns:
+                A generator of blocks, in order
+        '''
+        for _, payload in self.scan():
+            yield parse_json_block(json.loads(payload))
+
+    def read_block(self, location):
+        '''
+            Read a single block from the log
+
+            Arguments:
+                :location: the (segment number, offset) of the blocks record
+
+            Returns:
+                The block stored at the location
+        '''
+        number, offset = location
+
+        # Every segment is opened once for reading, the reads don't move a shared file position
+        # so several threads can read from the same segment
+        with self.__readers_lock:
+            open_file = self.__readers.get(number)
+            if open_file is None:
+                open_file = self.__readers[number] = open(self.segment_path(number), 'rb')
+
+        length, _ = RECORD_HEADER.unpack(os.pread(open_file.fileno(), RECORD_HEADER.size, offset))
+        payload = os.pread(open_file.fileno(), length, offset + RECORD_HEADER.size)
+
+        return parse_json_block(json.loads(payload))
+
+    def load(self):
+        '''
+            Load the blockchain from the log, an empty log is started from the existing
+            blockchain file (see load_data)
+
+            Returns:
+                The blockchain (a LazyChain in lazy mode) and the open transactions
+        '''
+        os.makedirs(self.directory, exist_ok=True)
+
+        if self.lazy:
+            # Only remember where every block is, they're parsed when they're accessed
+            locations = [location for location, _ in self.scan()]
+            blockchain = LazyChain(locations, self.read_block) if locations else []
+        else:
+            blockchain = list(self.iter_blocks())
+
+        open_transactions = load_open_transactions(self.mempool_path)
+
+        if not blockchain:
+            blockchain, open_transactions = load_data(from_json=True)
+
+            for block in blockchain:
+                self.append_block(block)
+            self.flush()
+            self.save_open_transactions(blockchain, open_transactions)
+
+        print('Block log loaded')
+        return (blockchain, open_transactions)
+
+    def append_block(self, block):
+        '''
+            Append a single block record to the last segment
+
+            Arguments:
+                :block: the block to append
+        '''
+        if self.__segment is None:
+            numbers = self.segment_numbers()
+            number = numbers[-1] if numbers else 0
+            self.__segment = open(self.segment_path(number), 'ab')
+
+        # Start a new segment once the current one is full
+        if self.__segment.tell() >= self.segment_size:
+            number = self.segment_numbers()[-1] + 1
+            self.flush()
+            self.__segment.close()
+            self.__segment = open(self.segment_path(number), 'ab')
+
+        payload = block.to_json().encode()
+        self.__segment.write(encode_record(payload))
+        self.__unsynced += 1
+
+        if self.__unsynced >= self.sync_every:
+            self.flush()
+        else:
+            self.__segment.flush()
+
+    def truncate(self, height):
+        '''
+            Cut the log off right before the record of a block
+
+            Arguments:
+                :height: the index of the first block to remove
+        '''
+        self.close()
+
+        location = None
+        records = self.scan()
+
+        for count, (record_location, _) in enumerate(records):
+            if count == height:
+                location = record_location
+                break
+        records.close()
+
+        if location is None:
+            return
+
+        number, offset = location
+
+        with open(self.segment_path(number), 'r+b') as open_file:
+            open_file.truncate(offset)
+            os.fsync(open_file.fileno())
+
+        for later_number in self.segment_numbers():
+            if later_number > number:
+                os.remove(self.segment_path(later_number))
+
+    def replace_blocks(self, blockchain, start, blocks, open_transactions):
+        '''
+            Replace every block from a height onward (after resolving a conflict with a peer node)
+
+            Arguments:
+                :blockchain: the current blockchain
+                :start: the index of the first replaced block
+                :blocks: the blocks replacing them
+                :open_transactions: all open transactions
+
+            Returns:
+                The new blockchain (the replacing blocks are kept in memory in lazy mode)
+        '''
+        # Tips of the current chain keep the blocks that are cut off
+        if isinstance(blockchain, LazyChain):
+            blockchain.detach(start)
+
+        self.truncate(start)
+
+        new_chain = blockchain[:start]
+        for block in blocks:
+            self.append_block(block)
+            new_chain.append(block)
+
+        self.flush()
+        self.save_open_transactions(new_chain, open_transactions)
+        return new_chain
+
+    def save_block(self, blockchain, block, open_transactions):
+        '''
+            Persist a block that was just appended to the blockchain
+
+            Arguments:
+                :blockchain: the blockchain (the block is the last block on it)
+                :block: the block that was appended
+                :open_transactions: the open transactions left after appending the block
+        '''
+        self.append_block(block)
+        self.save_open_transactions(blockchain, open_transactions)
+
+    def save_open_transactions(self, blockchain, open_transactions):
+        '''
+            Replace the open transactions file
+
+            Arguments:
+                :blockchain: the blockchain (unused, the blocks are already in the log)
+                :open_transactions: all open transactions
+        '''
+        save_open_transactions(self.mempool_path, open_transactions)
+
+    def flush(self):
+        '''
+            fsync every appended block to disk
+        '''
+        if self.__segment is not None:
+            self.__segment.flush()
+            os.fsync(self.__segment.fileno())
+
+        self.__unsynced = 0
+
+    def close(self):
+        '''
+            fsync and close the current segment
+        '''
+        if self.__segment is not None:
+            self.flush()
+            self.__segment.close()
+            self.__segment = None
+
+        with self.__readers_lock:
+            for open_file in self.__readers.values():
+                open_file.close()
+            self.__readers = {}
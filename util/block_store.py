@@ -0,0 +1,478 @@
+'''
+    Block store module - a memory mapped block store with a height to offset index
+
+    Blocks are appended to a data file in the binary format (see util.binary_format) and the
+    offset of every block is appended to an index file as a fixed width field. Fetching the
+    block at any height is a lookup in the index and a decode straight out of the memory mapped
+    data file, without parsing any of its neighbours. Nothing is read at startup, so a chain
+    larger than memory can be opened instantly.
+
+    Files:
+        :blocks.dat: length prefixed (4 bytes) binary block records
+        :blocks.idx: the offset (8 bytes) of the record of every height
+        :blocks.len: the amount of blocks (8 bytes), the index keeps the entries past it that
+                     were left behind when a shorter fork replaced the chain
+        :mempool.txt: the open transactions (see save_open_transactions)
+'''
+
+# std lib imports
+import mmap
+import os
+import struct
+
+# Own imports
+from util.binary_format import decode_block, encode_block, RECORD_LENGTH
+from util.files import load_data, load_open_transactions, save_open_transactions
+from util.lru import LRUCache
+
+INDEX_ENTRY = struct.Struct('>Q')
+CHAIN_LENGTH = struct.Struct('>Q')
+
+# The amount of decoded blocks kept in memory
+DEFAULT_CACHE_SIZE = 256
+
+def map_file(open_file):
+    '''
+        Memory map a file for reading
+
+        Returns:
+            The memory map, None for an empty file (which can't be mapped)
+    '''
+    size = os.fstat(open_file.fileno()).st_size
+
+    if not size:
+        return None
+
+    return mmap.mmap(open_file.fileno(), size, access=mmap.ACCESS_READ)
+
+def read_length(open_file):
+    '''
+        Read the amount of blocks of a store
+
+        Returns:
+            The amount of blocks, None if it wasn't written yet
+    '''
+    data = os.pread(open_file.fileno(), CHAIN_LENGTH.size, 0)
+
+    if len(data) < CHAIN_LENGTH.size:
+        return None
+
+    return CHAIN_LENGTH.unpack(data)[0]
+
+def write_length(open_file, length):
+    '''
+        Write the amount of blocks of a store (a single write of 8 bytes, so a reader sees either
+        the old or the new length)
+    '''
+    os.pwrite(open_file.fileno(), CHAIN_LENGTH.pack(length), 0)
+
+
+class BlockStore:
+    '''
+        A memory mapped, append only store of blocks indexed by height
+
+        Attributes:
+            :directory: the directory containing the store files
+            :readonly: open the store for reading only (several processes can read a store
+                       that a single process writes to, see refresh)
+    '''
+    def __init__(self, directory='blockstore', readonly=False):
+        self.directory = directory
+        self.readonly = readonly
+
+        if not readonly:
+            os.makedirs(directory, exist_ok=True)
+            self.recover()
+
+        # The index and the length are written at their positions, the data is only appended to
+        self.__data = open(os.path.join(directory, 'blocks.dat'), 'rb' if readonly else 'a+b')
+        self.__index = open(os.path.join(directory, 'blocks.idx'), 'rb' if readonly else 'r+b')
+        self.__length_file = open(os.path.join(directory, 'blocks.len'), 'rb' if readonly else 'r+b')
+        self.__data_map = None
+        self.__index_map = None
+        self.__length = 0
+        self.__index_size = 0
+        self.__data_size = 0
+        self.refresh()
+
+    def recover(self):
+        '''
+            Drop whatever a crash during an append left behind: a partly written index entry,
+            index entries of records that weren't completely written and data after the last
+            indexed record
+        '''
+        data_path = os.path.join(self.directory, 'blocks.dat')
+        index_path = os.path.join(self.directory, 'blocks.idx')
+        length_path = os.path.join(self.directory, 'blocks.len')
+
+        # The files are created on the first start
+        for path in (data_path, index_path, length_path):
+            open(path, 'ab').close()
+
+        with open(data_path, 'r+b') as data, open(index_path, 'r+b') as index, open(length_path, 'r+b') as length_file:
+            data_size = os.fstat(data.fileno()).st_size
+            length = os.fstat(index.fileno()).st_size // INDEX_ENTRY.size
+            end = 0
+
+            # Stores written before the length was recorded are as long as their index
+            stored_length = read_length(length_file)
+            if stored_length is not None:
+                length = min(length, stored_length)
+
+            # Walk back to the last index entry that points at a complete record
+            while length:
+                index.seek((length - 1) * INDEX_ENTRY.size)
+                offset, = INDEX_ENTRY.unpack(index.read(INDEX_ENTRY.size))
+                data.seek(offset)
+                header = data.read(RECORD_LENGTH.size)
+
+                if len(header) == RECORD_LENGTH.size:
+                    record_end = offset + RECORD_LENGTH.size + RECORD_LENGTH.unpack(header)[0]
+
+                    if record_end <= data_size:
+                        end = record_end
+                        break
+
+                length -= 1
+
+            if index.seek(0, os.SEEK_END) != length * INDEX_ENTRY.size or data_size != end:
+                print(f'Truncating an incomplete append in {self.directory}')
+                index.truncate(length * INDEX_ENTRY.size)
+                data.truncate(end)
+
+            if stored_length != length:
+                write_length(length_file, length)
+
+    def refresh(self):
+        '''
+            Pick up blocks appended since the store was opened or last refreshed (by this
+            or by another process)
+
+            Returns:
+                The amount of blocks within the store
+        '''
+        index_size = os.fstat(self.__index.fileno()).st_size
+        data_size = os.fstat(self.__data.fileno()).st_size
+        length = min(read_length(self.__length_file) or 0, index_size // INDEX_ENTRY.size)
+
+        # Replaced blocks grow the data file without changing the length
+        if index_size != self.__index_size or data_size != self.__data_size:
+            # Mapped regions that are still in use are kept alive by their memoryviews
+            self.__index_map = map_file(self.__index)
+            self.__data_map = map_file(self.__data)
+            self.__index_size = index_size
+            self.__data_size = data_size
+
+        self.__length = length
+        return self.__length
+
+    def __len__(self):
+        return self.__length
+
+    def offset(self, height):
+        '''
+            Look up the offset of the record of a block
+
+            Arguments:
+                :height: the index of the block
+        '''
+        if not 0 <= height < self.__length:
+            raise IndexError('block height out of range')
+
+        offset, = INDEX_ENTRY.unpack_from(self.__index_map, height * INDEX_ENTRY.size)
+        return offset
+
+    def get(self, height):
+        '''
+            Read the block at a height straight out of the memory mapped data file
+
+            Arguments:
+                :height: the index of the block
+
+            Returns:
+                The block
+        '''
+        return self.read(self.offset(height))
+
+    def read(self, offset):
+        '''
+            Read the block record at an offset (records stay readable after their blocks were
+            replaced, the data file only grows)
+
+            Arguments:
+                :offset: the offset of the record
+
+            Returns:
+                The block
+        '''
+        return decode_block(self.__data_map, offset + RECORD_LENGTH.size)
+
+    def append(self, block):
+        '''
+            Append a block, the record is written before its index entry so the index never
+            points at a record that isn't completely written
+
+            Arguments:
+                :block: the block to append (its index has to be the next height)
+        '''
+        if self.readonly:
+            raise IOError('The block store was opened for reading only')
+
+        if block.index != self.__length:
+            raise ValueError(f'Expected a block with index {self.__length}, got {block.index}')
+
+        payload = encode_block(block)
+        offset = self.__data.seek(0, os.SEEK_END)
+        self.__data.write(RECORD_LENGTH.pack(len(payload)) + payload)
+        self.__data.flush()
+
+        # The entry may overwrite one a shorter fork left behind, the length is raised last
+        os.pwrite(self.__index.fileno(), INDEX_ENTRY.pack(offset), self.__length * INDEX_ENTRY.size)
+        write_length(self.__length_file, self.__length + 1)
+
+        self.refresh()
+
+    def replace(self, start, blocks):
+        '''
+            Replace every block from a height onward, with fewer or more blocks. The files never
+            shrink (so a reader never touches a mapped region past the end of a file): the new records
+            are appended to the data file, their index entries overwrite the old ones and the length
+            is set to the end of the new blocks.
+
+            The length drops to the start while the index entries are overwritten, so a crash in
+            between leaves the blocks before the start instead of a mix of both forks.
+
+            Arguments:
+                :start: the index of the first replaced block
+                :blocks: the blocks replacing them
+        '''
+        if self.readonly:
+            raise IOError('The block store was opened for reading only')
+
+        if not 0 <= start <= self.__length:
+            raise ValueError(f'Blocks can only be replaced from a height up to {self.__length}, got {start}')
+
+        offsets = []
+        self.__data.seek(0, os.SEEK_END)
+
+        for height, block in enumerate(blocks, start):
+            if block.index != height:
+                raise ValueError(f'Expected a block with index {height}, got {block.index}')
+
+            payload = encode_block(block)
+            offsets.append(self.__data.tell())
+            self.__data.write(RECORD_LENGTH.pack(len(payload)) + payload)
+        self.__data.flush()
+
+        write_length(self.__length_file, start)
+        os.pwrite(self.__index.fileno(), b''.join(INDEX_ENTRY.pack(offset) for offset in offsets),
+                  start * INDEX_ENTRY.size)
+        write_length(self.__length_file, start + len(blocks))
+
+        self.refresh()
+
+    def flush(self):
+        '''
+            fsync the data and the index to disk
+        '''
+        if not self.readonly:
+            os.fsync(self.__data.fileno())
+            os.fsync(self.__index.fileno())
+            os.fsync(self.__length_file.fileno())
+
+    def close(self):
+        '''
+            Close the store files
+        '''
+        self.flush()
+        self.__data.close()
+        self.__index.close()
+        self.__length_file.close()
+
+
+class StoredChain:
+    '''
+        A list like view of the blocks within a block store, blocks are decoded from the store
+        when they're accessed and a bounded amount of them is cached. Slicing returns another
+        view of a fixed range that shares the cache, the full chain grows with the store.
+
+        Attributes:
+            :store: the block store holding the blocks
+    '''
+    def __init__(self, store, start=0, stop=None, cache=None, offsets=None):
+        self.store = store
+        self.__start = start
+        self.__stop = stop
+        self.__cache = LRUCache(DEFAULT_CACHE_SIZE) if cache is None else cache
+        self.__offsets = {} if offsets is None else offsets
+
+    def __len__(self):
+        stop = len(self.store) if self.__stop is None else self.__stop
+        return stop - self.__start
+
+    def __iter__(self):
+        for height in range(self.__start, self.__start + len(self)):
+            yield self.__load(height)
+
+    def __getitem__(self, index):
+        length = len(self)
+
+        if isinstance(index, slice):
+            start, stop, step = index.indices(length)
+
+            if step != 1:
+                return [self[position] for position in range(start, stop, step)]
+
+            start = self.__start + start
+            return StoredChain(self.store, start, max(start, self.__start + stop), self.__cache, self.__offsets)
+
+        if index < 0:
+            index += length
+
+        if not 0 <= index < length:
+            raise IndexError('chain index out of range')
+
+        return self.__load(self.__start + index)
+
+    def __load(self, height):
+        '''
+            Get the block at a height, decoding it from the store if it isn't cached
+        '''
+        block = self.__cache.get(height)
+
+        if block is None:
+            offset = self.__offsets.get(height)
+            block = self.store.get(height) if offset is None else self.store.read(offset)
+            self.__cache.put(height, block)
+
+        return block
+
+    def detach(self, start):
+        '''
+            Keep reading the blocks from a height onward from their current records, right before
+            the store replaces them. The chain stops growing with the store, so a ChainTip of it
+            keeps the fork it was taken from. (only possible on the full chain)
+
+            Arguments:
+                :start: the index of the first block that is about to be replaced
+        '''
+        if self.__start or self.__stop is not None:
+            raise ValueError('Only the full chain can be detached')
+
+        length = len(self.store)
+        self.__offsets.update((height, self.store.offset(height)) for height in range(start, length))
+        self.__stop = length
+
+    def append(self, block):
+        '''
+            Append a block to the store (only possible on the full chain)
+
+            Arguments:
+                :block: the block to append
+        '''
+        if self.__start or self.__stop is not None:
+            raise ValueError('Blocks can only be appended to the full chain')
+
+        self.store.append(block)
+        self.__cache.put(block.index, block)
+
+
+class BlockStoreStorage:
+    '''
+        Stores the blockchain in a memory mapped block store, the blocks are appended to the
+        store as soon as they're appended to the chain
+
+        Attributes:
+            :directory: the directory of the block store and the open transactions file
+    '''
+    def __init__(self, directory='blockstore'):
+        self.directory = directory
+        self.store = None
+
+    @property
+    def mempool_path(self):
+        '''
+            The path of the open transactions file
+        '''
+        return os.path.join(self.directory, 'mempool.txt')
+
+    def load(self):
+        '''
+            Open the block store, an empty store is started from the existing
+            blockchain file (see load_data)
+
+            Returns:
+                The blockchain (a StoredChain) and the open transactions
+        '''
+        self.store = BlockStore(self.directory)
+        blockchain = StoredChain(self.store)
+        open_transactions = load_open_transactions(self.mempool_path)
+
+        if not len(blockchain):
+            seed_chain, open_transactions = load_data(from_json=True)
+
+            for block in seed_chain:
+                blockchain.append(block)
+            self.store.flush()
+            save_open_transactions(self.mempool_path, open_transactions)
+
+        print('Block store loaded')
+        return (blockchain, open_transactions)
+
+    def save_block(self, blockchain, block, open_transactions):
+        '''
+            Persist a block that was just appended to the blockchain (the store already
+            holds the block, only the open transactions are saved)
+
+            Arguments:
+                :blockchain: the blockchain (the block is the last block on it)
+                :block: the block that was appended
+                :open_transactions: the open transactions left after appending the block
+        '''
+        save_open_transactions(self.mempool_path, open_transactions)
+
+    def save_open_transactions(self, blockchain, open_transactions):
+        '''
+            Replace the open transactions file
+
+            Arguments:
+                :blockchain: the blockchain (unused, the blocks are already in the store)
+                :open_transactions: all open transactions
+        '''
+        save_open_transactions(self.mempool_path, open_transactions)
+
+    def replace_blocks(self, blockchain, start, blocks, open_transactions):
+        '''
+            Replace every block from a height onward (after resolving a conflict with a peer node)
+
+            Arguments:
+                :blockchain: the current blockchain
+                :start: the index of the first replaced block
+                :blocks: the blocks replacing them
+                :open_transactions: all open transactions
+
+            Returns:
+                The new blockchain (a StoredChain with an empty cache, the old one holds replaced blocks)
+        '''
+        # Tips of the current chain keep reading the replaced blocks
+        blockchain.detach(start)
+        self.store.replace(start, list(blocks))
+        self.store.flush()
+        save_open_transactions(self.mempool_path, open_transactions)
+
+        return StoredChain(self.store)
+
+    def flush(self):
+        '''
+            fsync the block store to disk
+        '''
+        if self.store:
+            self.store.flush()
+
+    def close(self):
+        '''
+            Close the block store
+        '''
+        if self.store:
+            self.store.close()
+            self.store = None
@@ -0,0 +1,195 @@
+'''
+    Chain view module - a read only view of a block store that another process writes to
+
+    A node that stores its blockchain in a block store (see util.block_store) can be read by any
+    amount of other processes. Every view maps the same store files, so the blocks are shared
+    through the page cache instead of being loaded into every process. Refreshing a view only
+    looks at the index for new entries and applies the new blocks to its ledger, the chain is
+    never loaded again from scratch.
+
+    Opening a view (and a reorg of the node) decodes every block into the ledger, which takes
+    time in the length of the chain. A view given the snapshots of the node (see util.snapshot)
+    starts from the latest one instead and only decodes the blocks appended after it.
+'''
+
+# std lib imports
+import os
+import threading
+
+# Own imports
+from util.block_store import BlockStore, StoredChain
+from util.files import load_open_transactions
+from util.ledger import Ledger
+from blockchain import ChainTip
+from mempool import Mempool
+
+class ChainView:
+    '''
+        A read only blockchain on top of a block store, it answers the same reads as
+        Blockchain (chain, balances, transactions and inclusion proofs)
+
+        Attributes:
+            :directory: the directory of the block store written by the node
+            :snapshots: the SnapshotManager of the node the ledger is started from (optional)
+            :tip: the ChainTip of the last refresh
+    '''
+    def __init__(self, directory='blockstore', snapshots=None):
+        self.directory = directory
+        self.snapshots = snapshots
+        self.store = BlockStore(directory, readonly=True)
+        self.__lock = threading.Lock()
+        self.__mempool_stat = None
+        self.__mempool = Mempool()
+        self.__rebuild()
+        self.refresh()
+
+    @property
+    def mempool_path(self):
+        '''
+            The path of the open transactions file of the node
+        '''
+        return os.path.join(self.directory, 'mempool.txt')
+
+    def __rebuild(self):
+        '''
+            Start over with an empty ledger and a new chain (with an empty cache)
+        '''
+        self.__chain = StoredChain(self.store)
+        self.__ledger = Ledger()
+        self.__applied = 0
+        self.__last_offset = None
+        self.tip = ChainTip(self.__chain, 0)
+
+    def refresh(self):
+        '''
+            Pick up the blocks and open transactions the node saved since the last refresh
+
+            Returns:
+                The amount of blocks on the chain
+        '''
+        with self.__lock:
+            length = self.store.refresh()
+
+            # Replacing blocks points their index entries at new records (or drops them when the
+            # new fork is shorter), the ledger can't take blocks back so it is built again
+            if self.__applied and (self.__applied > length or self.store.offset(self.__applied - 1) != self.__last_offset):
+                self.__rebuild()
+
+            if not self.__applied and self.snapshots:
+                snapshot = self.snapshots.latest(self.__chain)
+
+                if snapshot:
+                    self.__ledger = snapshot.ledger
+                    self.__applied = snapshot.height + 1
+
+            for height in range(self.__applied, length):
+                self.__ledger.apply_block(self.__chain[height])
+
+            if length > self.__applied:
+                self.__applied = length
+            if self.__applied:
+                self.__last_offset = self.store.offset(self.__applied - 1)
+
+            if length != self.tip.length:
+                self.tip = ChainTip(self.__chain, length)
+
+            self.__refresh_mempool()
+            return length
+
+    def __refresh_mempool(self):
+        '''
+            Load the open transactions again if the node replaced its open transactions file
+        '''
+        try:
+            stat = os.stat(self.mempool_path)
+        except OSError:
+            return
+
+        stat = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+        if stat != self.__mempool_stat:
+            self.__mempool = Mempool(load_open_transactions(self.mempool_path))
+            self.__mempool_stat = stat
+
+    def __len__(self):
+        return self.tip.length
+
+    @property
+    def chain(self):
+        '''
+            Return a copied version of the blockchain
+        '''
+        return self.tip.get_blocks(0)
+
+    def get_blocks(self, start, stop=None):
+        '''
+            Get part of the blockchain (see Blockchain.get_blocks)
+        '''
+        return self.tip.get_blocks(start, stop)
+
+    def get_last_blockchain_value(self):
+        '''
+            Grab the last block from the blockchain
+        '''
+        return self.tip.last_block
+
+    @property
+    def open_transactions(self):
+        '''
+            Get a copy of the open transactions the node saved last
+        '''
+        with self.__lock:
+            return list(self.__mempool)
+
+    def get_amount_sent(self, participant):
+        '''
+            Get the amount of coins sent by a participant (open and closed)
+        '''
+        with self.__lock:
+            return self.__ledger.amount_sent(participant) + self.__mempool.pending_total(participant)
+
+    def get_amount_received(self, participant):
+        '''
+            Get the total amount received by the participant
+        '''
+        with self.__lock:
+            return self.__ledger.amount_received(participant)
+
+    def get_balance(self, participant):
+        '''
+            Gets the total balance of a single participant
+        '''
+        with self.__lock:
+            return self.__ledger.balance(participant) - self.__mempool.pending_total(participant)
+
+    def get_transactions(self, participant, offset=0, limit=None):
+        '''
+            Get the mined transactions a participant sent or received (see Blockchain.get_transactions)
+        '''
+        transactions = []
+
+        with self.__lock:
+            for block_index, position in self.__ledger.transaction_locations(participant, offset, limit):
+                transaction = self.__chain[block_index].transactions[position]
+                transactions.append((block_index, position, transaction))
+
+        return transactions
+
+    def get_transaction_count(self, participant):
+        '''
+            Get the amount of mined transactions a participant sent or received
+        '''
+        with self.__lock:
+            return self.__ledger.transaction_count(participant)
+
+    def get_inclusion_proof(self, block_index, position):
+        '''
+            Create a merkle proof for a transaction (see Blockchain.get_inclusion_proof)
+        '''
+        return self.tip.get_inclusion_proof(block_index, position)
+
+    def close(self):
+        '''
+            Close the block store files
+        '''
+        self.store.close()
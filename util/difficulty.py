@@ -0,0 +1,107 @@
+'''
+    Difficulty module - for the proof of work target and retargeting it toward a steady block interval
+
+    The difficulty of a block is the amount of leading zero bits its proof of work hash needs.
+    Every RETARGET_WINDOW blocks the difficulty is adjusted from the timestamps of the previous
+    window, so blocks keep arriving roughly every target interval no matter how many cores mine.
+'''
+# std lib imports
+from functools import lru_cache
+from math import log2
+from statistics import median
+
+# The difficulty of blocks mined before difficulties were stored (two leading hex zeros)
+DEFAULT_DIFFICULTY = 8
+MIN_DIFFICULTY = 1
+MAX_DIFFICULTY = 64
+
+# The amount of seconds between blocks the difficulty is adjusted toward (None keeps the difficulty fixed),
+# every node of a network has to use the same interval, otherwise they reject each others blocks
+TARGET_BLOCK_INTERVAL = 10
+
+# The amount of blocks between adjustments (and the amount of blocks the interval is measured over)
+RETARGET_WINDOW = 10
+
+# The most the difficulty changes in a single adjustment, in bits (a factor 4 in either direction)
+MAX_RETARGET_STEP = 2
+
+# The amount of seconds the timestamp of a block may be ahead of the local clock
+MAX_FUTURE_BLOCK_TIME = 120
+
+@lru_cache(maxsize=None)
+def difficulty_target(difficulty):
+    '''
+        Get the highest digest that meets a difficulty
+
+        Arguments:
+            :difficulty: the amount of leading zero bits
+
+        Returns:
+            The target as 32 bytes, a raw sha256 digest meets the difficulty if it is
+            lower than or equal to the target
+    '''
+    return ((1 << (256 - difficulty)) - 1).to_bytes(32, 'big')
+
+def block_difficulty(block):
+    '''
+        Get the difficulty a block was mined at
+
+        Returns:
+            The difficulty of the block, DEFAULT_DIFFICULTY for blocks without one
+    '''
+    return DEFAULT_DIFFICULTY if block.difficulty is None else block.difficulty
+
+def chain_work(blocks):
+    '''
+        Get the amount of work it took to mine a run of blocks, every block takes 2**difficulty
+        hashes on average
+
+        Returns:
+            The expected amount of hashes of every block together
+    '''
+    return sum(2 ** block_difficulty(block) for block in blocks)
+
+def median_time(previous_blocks):
+    '''
+        Get the median timestamp of the last blocks, the timestamp of the next block has to be later
+
+        Arguments:
+            :previous_blocks: the last RETARGET_WINDOW (or less) blocks before the next block, oldest first
+
+        Returns:
+            The median timestamp, None if none of the blocks has a reliable timestamp
+    '''
+    # Blocks mined before difficulties were stored (and the genesis block) don't have reliable timestamps
+    timestamps = [block.timestamp for block in previous_blocks[-RETARGET_WINDOW:] if block.difficulty is not None]
+    return median(timestamps) if timestamps else None
+
+def next_difficulty(previous_blocks):
+    '''
+        Calculate the difficulty of the next block, adjusted toward TARGET_BLOCK_INTERVAL
+
+        Arguments:
+            :previous_blocks: the last RETARGET_WINDOW (or less) blocks before the next block, oldest first
+
+        Returns:
+            The difficulty of the next block
+    '''
+    last_block = previous_blocks[-1]
+    difficulty = block_difficulty(last_block)
+
+    if TARGET_BLOCK_INTERVAL is None or (last_block.index + 1) % RETARGET_WINDOW:
+        return difficulty
+
+    # Blocks mined before difficulties were stored (and the genesis block) don't have reliable
+    # timestamps, they all got the time their node was started
+    timestamps = [block.timestamp for block in previous_blocks if block.difficulty is not None]
+
+    if len(timestamps) < 2:
+        return difficulty
+
+    interval = (timestamps[-1] - timestamps[0]) / (len(timestamps) - 1)
+
+    # Every doubling of the work halves the interval
+    step = MAX_RETARGET_STEP if interval <= 0 else round(log2(TARGET_BLOCK_INTERVAL / interval))
+    step = max(-MAX_RETARGET_STEP, min(MAX_RETARGET_STEP, step))
+
+    return max(MIN_DIFFICULTY, min(MAX_DIFFICULTY, difficulty + step))
@@ -4,12 +4,15 @@
 
 # std lib imports
 import json
+import math
+import os
 import pickle
 from collections import OrderedDict
 
 # Own imports
 from block import Block
 from transaction import Transaction
+from util.binary_format import fits_number, fits_text, fits_transaction, fits_unsigned, MAX_DIFFICULTY_FIELD
 
 def save_data(blockchain, open_transactions, to_json=False):
     '''
@@ -35,17 +38,12 @@ def save_data(blockchain, open_transactions, to_json=False):
 
             # Write the blockchain to file as either text or binary
             if to_json:
-                # Create json compatible formats of our objects
-                saveable_chain = [block.__dict__.copy() for block in blockchain]
-
-                # Make all transactions hashable
-                for block in saveable_chain:
-                    block['transactions'] = [tx.to_ordered_dict() for tx in block['transactions']]
-
+                # Every block already holds its json, only the open transactions need converting
+                saveable_chain = ', '.join(block.to_json() for block in blockchain)
                 saveable_tx = [tx.to_ordered_dict() for tx in open_transactions]
 
-                # Write saveable objects to file
-                open_file.write(json.dumps(saveable_chain))
+                # Write saveable objects to file (the chain as a json list)
+                open_file.write('[' + saveable_chain + ']')
                 open_file.write('\n')
                 open_file.write(json.dumps(saveable_tx))
             else:
@@ -58,12 +56,34 @@ def save_data(blockchain, open_transactions, to_json=False):
     except IOError:
         print('File couldnt be saved')
 
+def is_integer(value):
+    '''
+        Check whether a decoded json value is an integer (booleans are integers in python)
+    '''
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def is_number(value):
+    '''
+        Check whether a decoded json value is a finite number
+    '''
+    return is_integer(value) or (isinstance(value, float) and math.isfinite(value))
+
+def valid_amount(amount):
+    '''
+        Check whether a decoded json value can be sent as an amount of coins
+    '''
+    return is_number(amount) and fits_number(amount) and amount > 0
+
 def parse_json_tx(open_tx):
     '''
         parse a json transaction
 
         Arguments:
             :json_ot: the json version of the open transaction
+
+        Raises:
+            KeyError if a field is missing, TypeError if a field has the wrong type, ValueError
+            if a field doesn't fit the binary format (see util.binary_format)
     '''
     # Create the transaction data
     sender = open_tx['sender']
@@ -71,8 +91,15 @@ def parse_json_tx(open_tx):
     signature = open_tx['signature']
     amount = open_tx['amount']
 
+    if not all(isinstance(field, str) for field in (sender, recipient, signature)) or not is_number(amount):
+        raise TypeError('The transaction has a field of the wrong type')
+
     # Create the transaction and return it
     transaction = Transaction(sender, recipient, signature, amount)
+
+    if not fits_transaction(transaction):
+        raise ValueError('The transaction has a field that is too large')
+
     return transaction
 
 
@@ -85,6 +112,10 @@ def parse_json_block(block):
 
         Returns:
             the parsed blocked to be added to the blockchain
+
+        Raises:
+            KeyError if a field is missing, TypeError if a field has the wrong type, ValueError
+            if a field doesn't fit the binary format (see util.binary_format)
     '''
 
     # block metadata
@@ -93,6 +124,26 @@ def parse_json_block(block):
     transactions = []
     proof = block['proof']
     timestamp = block['timestamp']
+    merkle_root = block.get('merkle_root')
+    difficulty = block.get('difficulty')
+
+    # Blocks of peer nodes are compared and hashed, a field of the wrong type can't get that far
+    valid_fields = (
+        is_integer(index) and isinstance(previous_hash, str) and is_integer(proof) and is_number(timestamp)
+        and (merkle_root is None or isinstance(merkle_root, str))
+        and (difficulty is None or is_integer(difficulty))
+        and isinstance(block['transactions'], list)
+    )
+    if not valid_fields:
+        raise TypeError('The block has a field of the wrong type')
+
+    fitting_fields = (
+        fits_unsigned(index) and fits_unsigned(proof) and fits_number(timestamp) and fits_text(previous_hash)
+        and (merkle_root is None or fits_text(merkle_root))
+        and (difficulty is None or 0 <= difficulty <= MAX_DIFFICULTY_FIELD)
+    )
+    if not fitting_fields:
+        raise ValueError('The block has a field that is out of range')
 
     # Parse all transactions within the block
     for curr_tx in block['transactions']:
@@ -100,7 +151,7 @@ def parse_json_block(block):
         transactions.append(transaction)
 
     # Create the new block
-    parsed_block = Block(index, previous_hash, transactions, proof, timestamp)
+    parsed_block = Block(index, previous_hash, transactions, proof, timestamp, merkle_root, difficulty)
     return parsed_block
 
 def load_data(from_json=False):
@@ -171,6 +222,99 @@ def load_data(from_json=False):
         print("Blockchain and open transactions loaded")
         return (blockchain, open_transactions)
 
+def save_open_transactions(filename, open_transactions):
+    '''
+        Replace a file holding only the open transactions (as a json list)
+
+        Arguments:
+            :filename: the file to write
+            :open_transactions: all open transactions
+    '''
+    saveable_tx = [tx.to_ordered_dict() for tx in open_transactions]
+    temp_filename = filename + '.tmp'
+
+    try:
+        # Write to a temporary file first so a crash never leaves a half written file behind
+        with open(temp_filename, 'w') as open_file:
+            open_file.write(json.dumps(saveable_tx))
+        os.replace(temp_filename, filename)
+    except IOError:
+        print('Open transactions couldnt be saved')
+
+def load_open_transactions(filename):
+    '''
+        Load a file holding only the open transactions
+
+        Arguments:
+            :filename: the file to read
+
+        Returns:
+            A list of open transactions (empty if the file doesn't exist)
+    '''
+    try:
+        with open(filename, 'r') as open_file:
+            json_transactions = json.loads(open_file.read())
+    except IOError:
+        return []
+
+    transactions = []
+    for json_tx in json_transactions:
+        try:
+            transactions.append(parse_json_tx(json_tx))
+        except ValueError:
+            # Accepted before the size of transactions was checked, it would fail every block
+            print('Dropping an open transaction that doesnt fit the binary format')
+
+    return transactions
+
+def valid_peer_node(node):
+    '''
+        Check whether a decoded json value is the address (host:port) of a peer node
+    '''
+    if not isinstance(node, str):
+        return False
+
+    host, _, port = node.rpartition(':')
+    valid_host = bool(host) and not any(character.isspace() or character in '/?#@' for character in host)
+
+    return valid_host and port.isdigit() and 0 < int(port) < 65536
+
+def save_peer_nodes(peer_nodes, filename='peers.txt'):
+    '''
+        Save the peer nodes of the node (as a json list)
+
+        Arguments:
+            :peer_nodes: the addresses (host:port) of the peer nodes
+            :filename: the file to write
+    '''
+    try:
+        with open(filename, 'w') as open_file:
+            open_file.write(json.dumps(sorted(peer_nodes)))
+    except IOError:
+        print('Peer nodes couldnt be saved')
+
+def load_peer_nodes(filename='peers.txt'):
+    '''
+        Load the peer nodes of the node
+
+        Arguments:
+            :filename: the file to read
+
+        Returns:
+            A list of peer node addresses (empty if the file doesn't exist)
+    '''
+    try:
+        with open(filename, 'r') as open_file:
+            peer_nodes = json.loads(open_file.read())
+    except (IOError, ValueError):
+        return []
+
+    # Addresses saved before they were checked
+    if not isinstance(peer_nodes, list):
+        return []
+
+    return [node for node in peer_nodes if valid_peer_node(node)]
+
 def save_keys(private_key, public_key):
     '''
         Save a pair of keys to a file
@@ -0,0 +1,344 @@
+'''
+    Gossip module - for announcing transactions and blocks to peer nodes and resolving conflicts with them
+
+    Announcements are collected for a short moment and sent as a single request per peer node over
+    a persistent HTTP/1.1 connection, instead of a new connection and request for every item.
+'''
+
+# std lib imports
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import json
+import threading
+import time
+import traceback
+
+# Own imports
+from util.files import parse_json_block
+from util.hash_util import hash_transaction
+from util.lru import LRUCache
+
+# The amount of seconds announcements are collected before they're sent
+DEFAULT_BATCH_INTERVAL = 0.05
+
+# The maximum amount of transactions sent to a peer node in a single request
+DEFAULT_MAX_BATCH = 500
+
+# The amount of seconds before a request to a peer node is given up
+DEFAULT_TIMEOUT = 5
+
+# The amount of peer nodes announced to at the same time
+DEFAULT_FANOUT = 8
+
+# The amount of blocks fetched from a peer node before falling back to its whole chain
+FORK_DEPTH = 100
+
+# The amount of announced and received transactions remembered, so a transaction that comes back
+# from another peer node isn't opened again after it was mined
+DEFAULT_SEEN_SIZE = 100000
+
+class PeerConnections:
+    '''
+        A pool of persistent HTTP/1.1 connections, one per peer node, every connection handles
+        one request at a time
+
+        Attributes:
+            :timeout: the amount of seconds before a request is given up
+    '''
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self.__connections = {}
+        self.__locks = {}
+        self.__lock = threading.Lock()
+
+    def __peer_lock(self, peer):
+        '''
+            Get the lock guarding the connection to a peer node
+        '''
+        with self.__lock:
+            return self.__locks.setdefault(peer, threading.Lock())
+
+    def request(self, peer, method, path, body=None):
+        '''
+            Send a request to a peer node, reusing the open connection to it
+
+            Arguments:
+                :peer: the address (host:port) of the peer node
+                :method: the http method
+                :path: the path (and query string) of the request
+                :body: a json body (optional)
+
+            Returns:
+                The status code, the headers and the body of the response
+
+            Raises:
+                OSError or http.client.HTTPException if the peer node can't be reached
+        '''
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+
+        with self.__peer_lock(peer):
+            for attempt in range(2):
+                connection = self.__connections.get(peer)
+
+                if connection is None:
+                    connection = http.client.HTTPConnection(peer, timeout=self.timeout)
+                    self.__connections[peer] = connection
+
+                try:
+                    connection.request(method, path, body, headers)
+                    response = connection.getresponse()
+                    data = response.read()
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    del self.__connections[peer]
+
+                    # The peer node may have closed a kept alive connection in the meantime
+                    if attempt:
+                        raise
+                    continue
+
+                if response.will_close:
+                    connection.close()
+                    del self.__connections[peer]
+
+                return response.status, response.headers, data
+
+    def close(self):
+        '''
+            Close every connection
+        '''
+        with self.__lock:
+            for connection in self.__connections.values():
+                connection.close()
+            self.__connections = {}
+
+
+class Gossip:
+    '''
+        Announces new transactions and blocks to the peer nodes of a blockchain in batches on a
+        background thread, and fetches the chains of the peer nodes for resolving conflicts
+
+        Attributes:
+            :blockchain: the blockchain whose peer nodes are announced to
+            :batch_interval: the amount of seconds announcements are collected before they're sent
+            :max_batch: the maximum amount of transactions sent in a single request
+            :connections: the pooled connections to the peer nodes
+    '''
+    def __init__(self, blockchain, batch_interval=DEFAULT_BATCH_INTERVAL, max_batch=DEFAULT_MAX_BATCH,
+                 timeout=DEFAULT_TIMEOUT):
+        self.blockchain = blockchain
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch
+        self.connections = PeerConnections(timeout)
+        self.__transactions = []
+        self.__blocks = []
+        self.__resolve = False
+        self.__running = True
+        self.__condition = threading.Condition()
+        self.__thread = None
+        self.__executor = ThreadPoolExecutor(max_workers=DEFAULT_FANOUT)
+        self.__seen = LRUCache(DEFAULT_SEEN_SIZE)
+
+    def __notify(self):
+        '''
+            Wake the background thread up, it is started by the first announcement
+        '''
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__run, daemon=True)
+            self.__thread.start()
+
+        self.__condition.notify()
+
+    def mark_seen(self, transaction):
+        '''
+            Remember a transaction that was announced or received
+
+            Arguments:
+                :transaction: the transaction
+
+            Returns:
+                True if the transaction wasn't seen before, False otherwise
+        '''
+        digest = hash_transaction(transaction)
+
+        if digest in self.__seen:
+            return False
+
+        self.__seen.put(digest, True)
+        return True
+
+    def announce_transaction(self, transaction):
+        '''
+            Queue a transaction for the next announcement to the peer nodes
+
+            Arguments:
+                :transaction: the transaction that was added to the open transactions
+        '''
+        self.mark_seen(transaction)
+
+        with self.__condition:
+            self.__transactions.append(transaction)
+            self.__notify()
+
+    def announce_block(self, block):
+        '''
+            Queue a block for the next announcement to the peer nodes
+
+            Arguments:
+                :block: the block that was appended to the blockchain
+        '''
+        with self.__condition:
+            self.__blocks.append(block)
+            self.__notify()
+
+    def request_resolve(self):
+        '''
+            Resolve conflicts with the peer nodes on the background thread (for example after a peer
+            node announced a block that doesn't follow the last block of the blockchain)
+        '''
+        with self.__condition:
+            self.__resolve = True
+            self.__notify()
+
+    def __run(self):
+        '''
+            Send the queued announcements until the gossip is shut down
+        '''
+        while True:
+            with self.__condition:
+                while self.__running and not (self.__transactions or self.__blocks or self.__resolve):
+                    self.__condition.wait()
+
+                if not self.__running:
+                    return
+
+            # Collect the announcements that arrive right after the first one into the same batch
+            time.sleep(self.batch_interval)
+
+            with self.__condition:
+                blocks, self.__blocks = self.__blocks, []
+                transactions, self.__transactions = self.__transactions, []
+                resolve, self.__resolve = self.__resolve, False
+
+            # A failed round is logged and dropped, the thread keeps gossiping the next ones
+            try:
+                if blocks or transactions:
+                    self.send(blocks, transactions)
+
+                if resolve:
+                    self.resolve_conflicts()
+            except Exception:
+                print('A gossip round failed')
+                traceback.print_exc()
+
+    def send(self, blocks, transactions):
+        '''
+            Announce blocks and transactions to every peer node
+
+            Arguments:
+                :blocks: the blocks to announce (in order)
+                :transactions: the transactions to announce
+        '''
+        requests = []
+
+        # Transactions first, so the blocks close the ones they contain on the peer nodes
+        for start in range(0, len(transactions), self.max_batch):
+            batch = [tx.to_ordered_dict() for tx in transactions[start:start + self.max_batch]]
+            requests.append(('/broadcast/transactions', json.dumps({'transactions': batch})))
+
+        if blocks:
+            body = '{"blocks": [' + ', '.join(block.to_json() for block in blocks) + ']}'
+            requests.append(('/broadcast/blocks', body))
+
+        def announce(peer):
+            for path, body in requests:
+                try:
+                    self.connections.request(peer, 'POST', path, body)
+                except (OSError, http.client.HTTPException):
+                    print(f'Peer node {peer} couldnt be reached')
+                    return
+
+        list(self.__executor.map(announce, self.blockchain.get_peer_nodes()))
+
+    def fetch_blocks(self, peer, from_height, limit=None):
+        '''
+            Fetch part of the chain of a peer node
+
+            Arguments:
+                :peer: the address of the peer node
+                :from_height: the index of the first block
+                :limit: the maximum amount of blocks (defaults to every block)
+
+            Returns:
+                The length of the chain of the peer node and the fetched blocks
+
+            Raises:
+                ValueError if the peer node didn't return its chain
+        '''
+        path = f'/chain?from_height={from_height}'
+        if limit is not None:
+            path += f'&limit={limit}'
+
+        status, headers, body = self.connections.request(peer, 'GET', path)
+
+        if status != 200:
+            raise ValueError(f'Peer node {peer} answered with status {status}')
+
+        blocks = [parse_json_block(block) for block in json.loads(body)]
+        return int(headers['X-Chain-Length']), blocks
+
+    def fetch_chain(self, peer):
+        '''
+            Fetch the blocks of a peer node that may be missing from the blockchain. Only the last
+            FORK_DEPTH blocks are fetched, unless the peer node forked off before them.
+
+            A shorter chain can still have taken more work to mine, so only a peer node that is
+            more than FORK_DEPTH blocks behind is skipped.
+
+            Arguments:
+                :peer: the address of the peer node
+
+            Returns:
+                A list of blocks (empty if the chain of the peer node can't replace the blockchain)
+        '''
+        length = len(self.blockchain)
+        peer_length, _ = self.fetch_blocks(peer, length, 0)
+
+        if peer_length < length - FORK_DEPTH:
+            return []
+
+        start = max(min(length, peer_length) - FORK_DEPTH, 0)
+        _, blocks = self.fetch_blocks(peer, start)
+
+        if start and blocks and blocks[0].previous_hash != self.blockchain.get_blocks(start - 1, start)[0].hash:
+            _, blocks = self.fetch_blocks(peer, 0)
+
+        return blocks
+
+    def resolve_conflicts(self):
+        '''
+            Replace the blockchain with the valid chain of the peer nodes that took the most work to mine
+
+            Returns:
+                True if the blockchain was replaced, False otherwise
+        '''
+        chains = []
+
+        for peer in self.blockchain.get_peer_nodes():
+            try:
+                chains.append(self.fetch_chain(peer))
+            except (OSError, http.client.HTTPException, ValueError, KeyError, TypeError):
+                print(f'The chain of peer node {peer} couldnt be fetched')
+
+        return self.blockchain.resolve_conflicts(chains)
+
+    def shutdown(self):
+        '''
+            Stop the background thread and close the connections
+        '''
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify()
+
+        self.__executor.shutdown()
+        self.connections.close()
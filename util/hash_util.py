@@ -13,6 +13,19 @@ def hash_string_256(input_string):
     '''
     return hl.sha256(input_string).hexdigest()
 
+def seeded_sha256(prefix):
+    '''
+        Create a sha256 object that already consumed a prefix, copy it in order to
+        hash several strings starting with the same prefix without rehashing it
+
+        Arguments:
+            :prefix: the bytes every hashed string starts with
+
+        Returns:
+            a sha256 hash object seeded with the prefix
+    '''
+    return hl.sha256(prefix)
+
 def hash_block(block):
     '''
         Hash a block and then returned the hashed block to the user
@@ -23,11 +36,24 @@ def hash_block(block):
         Returns:
             a string containing the hex digest of the sha 256 hash
     '''
-    # Get a hashable version of our block
-    hashable_block = block.__dict__.copy()
-    hashable_block['transactions'] = [tx.to_ordered_dict() for tx in hashable_block['transactions']]
-    # Stringify and encode the block, return sha 256
-    stringified_block = json.dumps(hashable_block).encode()
+    # The transactions of a block with a merkle root are committed to by the root, so only
+    # the header is hashed (and a light client can check the hash without the transactions)
+    if block.merkle_root is not None:
+        return hash_string_256(json.dumps(block.to_header_dict()).encode())
+
+    # Encode the (memoized) json of the block, return sha 256
+    stringified_block = block.to_json().encode()
     return hash_string_256(stringified_block)
 
+def hash_transaction(transaction):
+    '''
+        Hash a transaction, identical signed transactions have the same hash
+
+        Arguments:
+            :transaction: The transaction to be hashed
 
+        Returns:
+            a string containing the hex digest of the sha 256 hash
+    '''
+    stringified_tx = json.dumps(transaction.to_ordered_dict()).encode()
+    return hash_string_256(stringified_tx)
@@ -0,0 +1,121 @@
+'''
+    Jobs module - for mining blocks in the background
+'''
+
+# std lib imports
+import json
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Own imports
+from util.lru import LRUCache
+
+# The amount of finished jobs that can still be looked up
+DEFAULT_MAX_JOBS = 1000
+
+class MiningJob:
+    '''
+        A single block that is mined in the background
+
+        Attributes:
+            :job_id: the id clients use to look up the job
+            :status: pending, running, done or failed
+            :block: the mined block once the job is done
+    '''
+    def __init__(self):
+        self.job_id = uuid.uuid4().hex
+        self.status = 'pending'
+        self.block = None
+
+    def to_json(self):
+        '''
+            Convert the job into json (primarily for the http api), the block is
+            included as its memoized json
+        '''
+        block_json = self.block.to_json() if self.block else 'null'
+        return f'{{"job_id": {json.dumps(self.job_id)}, "status": {json.dumps(self.status)}, "block": {block_json}}}'
+
+
+class MiningJobs:
+    '''
+        Runs mining jobs one after the other on a background thread, so requests that
+        start mining return straight away
+
+        Attributes:
+            :max_jobs: the amount of jobs that are remembered
+    '''
+    def __init__(self, max_jobs=DEFAULT_MAX_JOBS):
+        self.max_jobs = max_jobs
+        self.__jobs = LRUCache(max_jobs)
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+        self.__changed = threading.Condition()
+
+    def submit(self, blockchain):
+        '''
+            Start mining a block in the background
+
+            Arguments:
+                :blockchain: the blockchain to mine the block on
+
+            Returns:
+                The new job
+        '''
+        job = MiningJob()
+        self.__jobs.put(job.job_id, job)
+        self.__executor.submit(self.__run, job, blockchain)
+
+        return job
+
+    def __run(self, job, blockchain):
+        '''
+            Mine the block of a job and update its status
+        '''
+        self.__set_status(job, 'running')
+
+        try:
+            job.block = blockchain.mine_block()
+        except Exception as error:
+            print(f'Mining job {job.job_id} failed: {error}')
+            job.block = None
+
+        self.__set_status(job, 'done' if job.block else 'failed')
+
+    def __set_status(self, job, status):
+        '''
+            Change the status of a job and wake up everyone waiting for it
+        '''
+        with self.__changed:
+            job.status = status
+            self.__changed.notify_all()
+
+    def get(self, job_id):
+        '''
+            Look up a job
+
+            Returns:
+                The job, None if it doesn't exist (anymore)
+        '''
+        return self.__jobs.get(job_id)
+
+    def wait(self, job, status, timeout=None):
+        '''
+            Wait until the status of a job isn't the given status anymore
+
+            Arguments:
+                :job: the job to wait for
+                :status: the status the caller last saw
+                :timeout: the maximum amount of seconds to wait
+
+            Returns:
+                The current status of the job
+        '''
+        with self.__changed:
+            self.__changed.wait_for(lambda: job.status != status, timeout)
+            return job.status
+
+    def shutdown(self):
+        '''
+            Finish the submitted jobs and stop the background thread
+        '''
+        self.__executor.shutdown(wait=True)
@@ -0,0 +1,80 @@
+'''
+    Lazy chain module - a list like blockchain that only loads blocks from disk when they're accessed
+'''
+
+# Own imports
+from util.lru import LRUCache
+
+# The amount of blocks read from disk that are kept in memory
+DEFAULT_CACHE_SIZE = 256
+
+class LazyChain:
+    '''
+        A sequence of blocks where every block is either kept in memory or referenced by its
+        location on disk. Blocks on disk are read when they're accessed and a bounded amount of
+        them is cached. Slicing returns another lazy chain that shares the cache, which can be
+        used from several threads at once.
+
+        Attributes:
+            :read_block: a function that reads the block stored at a location
+            :cache_size: the amount of blocks read from disk that are kept in memory
+    '''
+    def __init__(self, entries, read_block, cache_size=DEFAULT_CACHE_SIZE, cache=None):
+        self.__entries = entries
+        self.read_block = read_block
+        self.cache_size = cache_size
+        self.__cache = LRUCache(cache_size) if cache is None else cache
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __iter__(self):
+        for index in range(len(self.__entries)):
+            yield self.__load(index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return LazyChain(self.__entries[index], self.read_block, self.cache_size, self.__cache)
+
+        return self.__load(index)
+
+    def __load(self, index):
+        '''
+            Get a block, reading it from disk if it isn't in memory
+
+            Arguments:
+                :index: the position of the block within this chain
+        '''
+        entry = self.__entries[index]
+
+        # Blocks appended after loading are kept in memory
+        if not isinstance(entry, tuple):
+            return entry
+
+        block = self.__cache.get(entry)
+
+        if block is None:
+            block = self.read_block(entry)
+            self.__cache.put(entry, block)
+
+        return block
+
+    def detach(self, start):
+        '''
+            Read every block from a position onward into memory, right before their records are
+            removed from disk, so a ChainTip of this chain keeps the fork it was taken from
+
+            Arguments:
+                :start: the position of the first block that is about to be removed
+        '''
+        for index in range(start, len(self.__entries)):
+            self.__entries[index] = self.__load(index)
+
+    def append(self, block):
+        '''
+            Append a block, it is kept in memory
+
+            Arguments:
+                :block: the block to append
+        '''
+        self.__entries.append(block)
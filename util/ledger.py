@@ -0,0 +1,140 @@
+'''
+    Ledger module - for keeping track of participant balances as blocks are appended
+'''
+
+from collections import defaultdict
+
+class Ledger:
+    '''
+        A per address index of the coins sent and received on the blockchain, open
+        transactions are tracked by the mempool
+
+        Attributes:
+            :sent: the total amount each address has sent within mined blocks
+            :received: the total amount each address has received within mined blocks
+            :history: the (block index, transaction position) of every transaction of each address
+    '''
+    def __init__(self):
+        self.sent = defaultdict(int)
+        self.received = defaultdict(int)
+        self.history = defaultdict(list)
+
+    def apply_block(self, block):
+        '''
+            Add every transaction within a newly appended block to the ledger
+
+            Arguments:
+                :block: the block that was appended to the blockchain
+        '''
+        for position, transaction in enumerate(block.transactions):
+            self.sent[transaction.sender] += transaction.amount
+            self.received[transaction.recipient] += transaction.amount
+
+            location = (block.index, position)
+            self.history[transaction.sender].append(location)
+
+            # Don't list a transaction twice when someone sends coins to themselves
+            if transaction.recipient != transaction.sender:
+                self.history[transaction.recipient].append(location)
+
+    def apply_blocks(self, blocks):
+        '''
+            Add every transaction within a list of blocks to the ledger
+
+            Arguments:
+                :blocks: the blocks that were appended to the blockchain (in order)
+        '''
+        for block in blocks:
+            self.apply_block(block)
+
+    def amount_sent(self, address):
+        '''
+            Get the amount of coins sent by an address (strictly closed)
+
+            Arguments:
+                :address: the address to look up
+
+            Returns:
+                The amount the address has sent
+        '''
+        return self.sent.get(address, 0)
+
+    def amount_received(self, address):
+        '''
+            Get the amount of coins received by an address (strictly closed)
+
+            Arguments:
+                :address: the address to look up
+
+            Returns:
+                The amount the address has received
+        '''
+        return self.received.get(address, 0)
+
+    def balance(self, address):
+        '''
+            Get the balance of an address within mined blocks
+
+            Arguments:
+                :address: the address to look up
+
+            Returns:
+                The balance of the address
+        '''
+        return self.amount_received(address) - self.amount_sent(address)
+
+    def transaction_locations(self, address, offset=0, limit=None):
+        '''
+            Get where the transactions of an address are on the blockchain (oldest first)
+
+            Arguments:
+                :address: the address to look up
+                :offset: the amount of transactions to skip
+                :limit: the maximum amount of transactions (defaults to every transaction)
+
+            Returns:
+                A list of (block index, transaction position) tuples
+        '''
+        locations = self.history.get(address, [])
+        stop = None if limit is None else offset + limit
+
+        return locations[offset:stop]
+
+    def transaction_count(self, address):
+        '''
+            Get the amount of mined transactions an address is part of
+
+            Arguments:
+                :address: the address to look up
+        '''
+        return len(self.history.get(address, []))
+
+    def to_dict(self):
+        '''
+            Convert the ledger into a dict (primarily for snapshots)
+        '''
+        return {
+            'sent': self.sent,
+            'received': self.received,
+            'history': self.history
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        '''
+            Create a ledger from a dict created by to_dict
+
+            Arguments:
+                :state: the ledger as a dict
+
+            Returns:
+                The ledger
+        '''
+        ledger = cls()
+        ledger.sent.update(state['sent'])
+        ledger.received.update(state['received'])
+
+        for address, locations in state['history'].items():
+            ledger.history[address] = [tuple(location) for location in locations]
+
+        return ledger
@@ -0,0 +1,67 @@
+'''
+    LRU module - a bounded least recently used cache
+'''
+
+# std lib imports
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    '''
+        A dict like cache that drops the least recently used entry once it's full,
+        it can be shared between threads
+
+        Attributes:
+            :max_size: the maximum amount of entries in the cache
+    '''
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    def get(self, key, default=None):
+        '''
+            Get an entry and mark it as recently used
+
+            Arguments:
+                :key: the key of the entry
+                :default: returned when the entry isn't cached
+
+            Returns:
+                The cached value or the default
+        '''
+        with self.__lock:
+            try:
+                self.__entries.move_to_end(key)
+            except KeyError:
+                return default
+
+            return self.__entries[key]
+
+    def put(self, key, value):
+        '''
+            Add or replace an entry, dropping the least recently used one if the cache is full
+
+            Arguments:
+                :key: the key of the entry
+                :value: the value to cache
+        '''
+        with self.__lock:
+            self.__entries[key] = value
+            self.__entries.move_to_end(key)
+
+            if len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+
+    def clear(self):
+        '''
+            Remove every entry
+        '''
+        with self.__lock:
+            self.__entries.clear()
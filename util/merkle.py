@@ -0,0 +1,116 @@
+'''
+    Merkle module - for merkle roots over the transactions of a block and inclusion proofs
+
+    Leaves and inner nodes are hashed with a different prefix byte so a leaf can never be
+    passed off as an inner node. A node without a sibling is moved up a level unchanged.
+'''
+import hashlib as hl
+
+from util.hash_util import hash_transaction
+
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+def leaf_hash(transaction):
+    '''
+        Hash a transaction as a leaf of the merkle tree
+
+        Returns:
+            the leaf hash as bytes
+    '''
+    return hl.sha256(LEAF_PREFIX + bytes.fromhex(hash_transaction(transaction))).digest()
+
+def node_hash(left, right):
+    '''
+        Hash two sibling nodes of the merkle tree
+
+        Returns:
+            the parent hash as bytes
+    '''
+    return hl.sha256(NODE_PREFIX + left + right).digest()
+
+def next_level(level):
+    '''
+        Hash every pair of nodes on a level of the tree
+
+        Returns:
+            the level above it
+    '''
+    parents = [node_hash(level[index], level[index + 1]) for index in range(0, len(level) - 1, 2)]
+
+    # A node without a sibling moves up unchanged
+    if len(level) % 2:
+        parents.append(level[-1])
+
+    return parents
+
+def merkle_root(transactions):
+    '''
+        Calculate the merkle root over a list of transactions
+
+        Arguments:
+            :transactions: the transactions of a block
+
+        Returns:
+            a string containing the hex digest of the root
+    '''
+    level = [leaf_hash(tx) for tx in transactions]
+
+    if not level:
+        return hl.sha256(b'').hexdigest()
+
+    while len(level) > 1:
+        level = next_level(level)
+
+    return level[0].hex()
+
+def merkle_proof(transactions, position):
+    '''
+        Create a proof that the transaction at a position is part of the merkle tree
+
+        Arguments:
+            :transactions: the transactions of a block
+            :position: the position of the transaction to prove
+
+        Returns:
+            A list of the sibling hashes from the leaf up to the root, as dicts holding the
+            side the sibling is on ('left' or 'right') and its hex digest
+    '''
+    level = [leaf_hash(tx) for tx in transactions]
+    proof = []
+
+    while len(level) > 1:
+        sibling = position ^ 1
+
+        if sibling < len(level):
+            side = 'left' if sibling < position else 'right'
+            proof.append({'side': side, 'hash': level[sibling].hex()})
+
+        level = next_level(level)
+        position //= 2
+
+    return proof
+
+def verify_merkle_proof(transaction, proof, root):
+    '''
+        Verify that a transaction is part of a merkle tree, without any of the other transactions
+
+        Arguments:
+            :transaction: the transaction to verify
+            :proof: the proof created by merkle_proof
+            :root: the hex digest of the merkle root
+
+        Returns:
+            True if the proof leads from the transaction to the root, False otherwise
+    '''
+    current = leaf_hash(transaction)
+
+    for step in proof:
+        sibling = bytes.fromhex(step['hash'])
+
+        if step['side'] == 'left':
+            current = node_hash(sibling, current)
+        else:
+            current = node_hash(current, sibling)
+
+    return current.hex() == root
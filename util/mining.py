@@ -0,0 +1,152 @@
+'''
+    Mining module - for searching the proof of work nonce space across several processes
+'''
+# std lib imports
+import multiprocessing
+
+# Own imports
+from util.difficulty import DEFAULT_DIFFICULTY
+from util.verification import Verification
+
+# How many nonces a worker checks before looking at whether another worker already found a proof
+DEFAULT_NONCE_RANGE = 5000
+
+# The mining processes are started fresh instead of forked, a node forking while its other threads
+# (the http server, gossip, write behind saves) hold locks would hand those locks to the workers. The
+# workers import the main module, so scripts mining with several workers need a __main__ guard
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# Shared between the mining processes, holds the lowest proof found so far (-1 when none is found yet)
+_best_proof = None
+
+def _init_worker(best_proof):
+    '''
+        Pool initializer for storing the shared best proof inside of each mining process
+
+        Arguments:
+            :best_proof: the shared value holding the lowest proof found so far
+    '''
+    global _best_proof
+    _best_proof = best_proof
+
+def search_range(prefix, start, stop, difficulty=DEFAULT_DIFFICULTY):
+    '''
+        Search a range of nonces for a valid proof
+
+        Arguments:
+            :prefix: the encoded transactions and previous hash (see Verification.proof_prefix)
+            :start: the first nonce to check
+            :stop: the nonce to stop at (exclusive)
+            :difficulty: the amount of leading zero bits the hash needs
+
+        Returns:
+            The first valid proof within the range, None if there isn't one
+    '''
+    # The prefix is only hashed once, every nonce only hashes its own digits
+    hasher = Verification.proof_hasher(prefix)
+
+    for proof in range(start, stop):
+        if Verification.valid_seeded_proof(hasher, proof, difficulty):
+            return proof
+
+    return None
+
+def _mine_worker(worker_id, workers, nonce_range, prefix, difficulty):
+    '''
+        Search every n-th nonce range until this worker, or another one, finds a proof
+
+        Arguments:
+            :worker_id: the index of this worker (the first range it checks)
+            :workers: the total amount of workers (the stride between ranges)
+            :nonce_range: the amount of nonces in a single range
+            :prefix: the encoded transactions and previous hash
+            :difficulty: the amount of leading zero bits the hash needs
+    '''
+    chunk = worker_id
+
+    while True:
+        start = chunk * nonce_range
+
+        # Any proof in this range would be higher than the one that was already found
+        found = _best_proof.value
+        if found != -1 and found < start:
+            return
+
+        proof = search_range(prefix, start, start + nonce_range, difficulty)
+
+        if proof is not None:
+            with _best_proof.get_lock():
+                if _best_proof.value == -1 or proof < _best_proof.value:
+                    _best_proof.value = proof
+            return
+
+        chunk += workers
+
+
+class ProofOfWorkMiner:
+    '''
+        Proof of work engine that splits the nonce space across a pool of processes
+
+        The nonce space is cut into ranges of `nonce_range` nonces, and worker n checks
+        ranges n, n + workers, n + 2 * workers, ... A worker stops as soon as the lowest proof
+        found by any worker is below the start of its next range, so the returned proof is
+        always the lowest valid one (the same proof a single core search would find).
+
+        Attributes:
+            :workers: the amount of processes used for mining (1 mines on the current process,
+                      None uses every core)
+            :nonce_range: the amount of nonces a worker checks between looking for a found proof
+    '''
+    def __init__(self, workers=1, nonce_range=DEFAULT_NONCE_RANGE):
+        self.workers = max(1, workers or multiprocessing.cpu_count())
+        self.nonce_range = nonce_range
+        self.__pool = None
+        self.__best_proof = None
+
+    def proof_of_work(self, transactions, last_hash, difficulty=DEFAULT_DIFFICULTY):
+        '''
+            Calculate a valid proof of work
+
+            Arguments:
+                :transactions: the list of transactions on the block
+                :last_hash: the hash of the previous block
+                :difficulty: the amount of leading zero bits the hash needs
+
+            Returns:
+                proof number that generates a valid hash
+        '''
+        # Serialize the transactions and previous hash once for the whole mining round
+        prefix = Verification.proof_prefix(transactions, last_hash)
+
+        if self.workers == 1:
+            hasher = Verification.proof_hasher(prefix)
+            proof = 0
+
+            while not Verification.valid_seeded_proof(hasher, proof, difficulty):
+                proof += 1
+
+            return proof
+
+        # The pool is started on the first mining round and reused afterwards
+        if self.__pool is None:
+            context = multiprocessing.get_context(START_METHOD)
+            self.__best_proof = context.Value('q', -1)
+            self.__pool = context.Pool(self.workers, _init_worker, (self.__best_proof,))
+
+        self.__best_proof.value = -1
+        jobs = [
+            (worker_id, self.workers, self.nonce_range, prefix, difficulty)
+            for worker_id in range(self.workers)
+        ]
+        self.__pool.starmap(_mine_worker, jobs)
+
+        return self.__best_proof.value
+
+    def close(self):
+        '''
+            Shut down the mining processes, a later mining round starts a new pool
+        '''
+        if self.__pool is not None:
+            self.__pool.terminate()
+            self.__pool.join()
+            self.__pool = None
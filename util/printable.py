@@ -6,5 +6,7 @@ class Printable:
     '''
         For objects that are all printable as a dictionary (helper class)
     '''
+    __slots__ = ()
+
     def __repr__(self):
-        return str(self.__dict__)
+        return str({name: getattr(self, name) for name in self.__slots__})
@@ -0,0 +1,135 @@
+'''
+    Snapshot module - for checkpoints of the ledger that let a node start without replaying the whole chain
+'''
+
+# std lib imports
+import json
+import os
+
+# Own imports
+from util.ledger import Ledger
+
+# The amount of blocks between two snapshots
+DEFAULT_SNAPSHOT_INTERVAL = 100
+
+# The amount of snapshots kept on disk
+DEFAULT_KEEP = 2
+
+class Snapshot:
+    '''
+        The state of the ledger at a certain block
+
+        Attributes:
+            :height: the index of the last block included in the ledger
+            :tip_hash: the hash of that block
+            :verified_height: the amount of blocks that were verified when the snapshot was taken
+            :ledger: the ledger after applying every block up to and including the tip
+    '''
+    def __init__(self, height, tip_hash, verified_height, ledger):
+        self.height = height
+        self.tip_hash = tip_hash
+        self.verified_height = verified_height
+        self.ledger = ledger
+
+    def to_dict(self):
+        '''
+            Convert the snapshot into a dict (primarily for saving)
+        '''
+        return {
+            'height': self.height,
+            'tip_hash': self.tip_hash,
+            'verified_height': self.verified_height,
+            'ledger': self.ledger.to_dict()
+        }
+
+
+class SnapshotManager:
+    '''
+        Writes a snapshot every couple of blocks and finds the latest one on startup
+
+        Attributes:
+            :directory: the directory the snapshots are saved in
+            :interval: the amount of blocks between two snapshots
+            :keep: the amount of snapshots kept on disk
+    '''
+    def __init__(self, directory='snapshots', interval=DEFAULT_SNAPSHOT_INTERVAL, keep=DEFAULT_KEEP):
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+
+    def snapshot_heights(self):
+        '''
+            Get the heights of every snapshot on disk, in order
+        '''
+        if not os.path.isdir(self.directory):
+            return []
+
+        heights = []
+        for name in os.listdir(self.directory):
+            if name.startswith('snapshot-') and name.endswith('.json'):
+                heights.append(int(name[len('snapshot-'):-len('.json')]))
+
+        return sorted(heights)
+
+    def snapshot_path(self, height):
+        '''
+            Get the path of the snapshot at a height
+        '''
+        return os.path.join(self.directory, f'snapshot-{height:010d}.json')
+
+    def is_due(self, height):
+        '''
+            Check if a snapshot should be taken after appending the block at a height
+        '''
+        return height > 0 and height % self.interval == 0
+
+    def save(self, snapshot):
+        '''
+            Save a snapshot and remove the oldest ones
+
+            Arguments:
+                :snapshot: the snapshot to save
+        '''
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.snapshot_path(snapshot.height)
+        temp_path = path + '.tmp'
+
+        try:
+            with open(temp_path, 'w') as open_file:
+                open_file.write(json.dumps(snapshot.to_dict()))
+            os.replace(temp_path, path)
+        except IOError:
+            print('Snapshot couldnt be saved')
+            return
+
+        for height in self.snapshot_heights()[:-self.keep]:
+            os.remove(self.snapshot_path(height))
+
+    def latest(self, blockchain):
+        '''
+            Find the latest snapshot that matches a blockchain
+
+            Arguments:
+                :blockchain: the loaded blocks (a list like sequence)
+
+            Returns:
+                The snapshot, None if there isn't a matching one
+        '''
+        for height in reversed(self.snapshot_heights()):
+            # Snapshots of blocks that aren't (or aren't anymore) on the chain are skipped
+            if height >= len(blockchain):
+                continue
+
+            try:
+                with open(self.snapshot_path(height), 'r') as open_file:
+                    state = json.loads(open_file.read())
+            except (IOError, ValueError):
+                continue
+
+            if blockchain[height].hash != state['tip_hash']:
+                continue
+
+            ledger = Ledger.from_dict(state['ledger'])
+            return Snapshot(state['height'], state['tip_hash'], state['verified_height'], ledger)
+
+        return None
@@ -0,0 +1,141 @@
+'''
+    Storage module - for the storage backends the blockchain persists itself with
+'''
+
+# std lib imports
+import struct
+
+# Own imports
+from block import Block
+from util.binary_format import save_binary, load_binary
+from util.files import save_data, load_data
+
+class FileStorage:
+    '''
+        Stores the whole blockchain and the open transactions within a single file,
+        the file is completely rewritten on every change (see save_data)
+
+        Attributes:
+            :to_json: store the blockchain as json (blockchain.txt) or as a pickle (blockchain.p)
+    '''
+    # Every save writes the whole chain (see WriteBehindStorage)
+    saves_whole_chain = True
+
+    def __init__(self, to_json=True):
+        self.to_json = to_json
+
+    def load(self):
+        '''
+            Load the blockchain from disk
+
+            Returns:
+                The blockchain and the open transactions
+        '''
+        return load_data(from_json=self.to_json)
+
+    def save_block(self, blockchain, block, open_transactions):
+        '''
+            Persist a block that was just appended to the blockchain
+
+            Arguments:
+                :blockchain: the blockchain (the block is the last block on it)
+                :block: the block that was appended
+                :open_transactions: the open transactions left after appending the block
+        '''
+        save_data(blockchain, open_transactions, to_json=self.to_json)
+
+    def save_open_transactions(self, blockchain, open_transactions):
+        '''
+            Persist the open transactions
+
+            Arguments:
+                :blockchain: the blockchain
+                :open_transactions: all open transactions
+        '''
+        save_data(blockchain, open_transactions, to_json=self.to_json)
+
+    def replace_blocks(self, blockchain, start, blocks, open_transactions):
+        '''
+            Replace every block from a height onward (after resolving a conflict with a peer node)
+
+            Arguments:
+                :blockchain: the current blockchain
+                :start: the index of the first replaced block
+                :blocks: the blocks replacing them
+                :open_transactions: all open transactions
+
+            Returns:
+                The new blockchain
+        '''
+        blockchain = blockchain[:start] + list(blocks)
+        self.save_open_transactions(blockchain, open_transactions)
+        return blockchain
+
+    def flush(self):
+        '''
+            Make sure everything saved so far is on disk (every save is written straight away)
+        '''
+
+    def close(self):
+        '''
+            Release the storage
+        '''
+
+
+class BinaryFileStorage(FileStorage):
+    '''
+        Stores the whole blockchain and the open transactions within a single file in the
+        compact binary format (see util.binary_format), the file is rewritten on every change
+
+        Attributes:
+            :filename: the binary blockchain file
+    '''
+    def __init__(self, filename='blockchain.bin'):
+        super().__init__(to_json=False)
+        self.filename = filename
+
+    def load(self):
+        '''
+            Load the blockchain from disk, starting a new blockchain if there is no file yet
+
+            Returns:
+                The blockchain and the open transactions
+
+            Raises:
+                IOError if the file can't be read or is corrupted, a new blockchain would be
+                saved over it
+        '''
+        try:
+            return load_binary(self.filename)
+        except FileNotFoundError:
+            print('File couldnt be loaded, creating a new blockchain')
+
+            # Create the genesis block (see load_data)
+            genesis_block = Block(0, 'genesis', [], 100, 0)
+            return ([genesis_block], [])
+        except (ValueError, IndexError, struct.error) as error:
+            raise IOError(f'{self.filename} is corrupted or not a supported binary blockchain file') from error
+
+    def save_block(self, blockchain, block, open_transactions):
+        '''
+            Persist a block that was just appended to the blockchain
+
+            Arguments:
+                :blockchain: the blockchain (the block is the last block on it)
+                :block: the block that was appended
+                :open_transactions: the open transactions left after appending the block
+        '''
+        self.save_open_transactions(blockchain, open_transactions)
+
+    def save_open_transactions(self, blockchain, open_transactions):
+        '''
+            Persist the open transactions
+
+            Arguments:
+                :blockchain: the blockchain
+                :open_transactions: all open transactions
+        '''
+        try:
+            save_binary(self.filename, blockchain, open_transactions)
+        except IOError:
+            print('File couldnt be saved')
@@ -2,15 +2,100 @@
     Verification module - for handling blockchain related verification
 '''
 
-from util.hash_util import hash_string_256, hash_block
+# std lib imports
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from time import time
+
+# Own imports
+from util.difficulty import (block_difficulty, difficulty_target, median_time, next_difficulty,
+                             DEFAULT_DIFFICULTY, MAX_FUTURE_BLOCK_TIME, RETARGET_WINDOW)
+from util.hash_util import seeded_sha256
+from util.merkle import merkle_root
 from wallet import Wallet
 
+# Executors used for batch signature verification, reused between batches
+_executors = {}
+
+def _verify_signature(transaction):
+    '''
+        Verify the signature of a single transaction within a batch, a malformed
+        transaction is invalid instead of failing the whole batch
+    '''
+    try:
+        return Wallet.verify_signature(transaction)
+    except (ValueError, TypeError, IndexError):
+        return False
+
+def _get_executor(workers, use_processes):
+    '''
+        Get the (shared) executor for a batch verification
+
+        Arguments:
+            :workers: the maximum amount of workers (None for the executors default)
+            :use_processes: use a process pool instead of a thread pool
+    '''
+    key = (workers, use_processes)
+    executor = _executors.get(key)
+
+    if executor is None:
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        executor = _executors[key] = executor_class(max_workers=workers)
+
+    return executor
+
 class Verification:
     '''
         Module for Blockchain verification handling 
     '''
     @staticmethod
-    def valid_proof(transactions, last_hash, proof):
+    def proof_prefix(transactions, last_hash):
+        '''
+            Serialize the part of a proof of work guess that stays the same for every proof
+
+            Arguments:
+                :transactions: the list of transactions on the block
+                :last_hash: the hash of the previous block
+
+            Returns:
+                The encoded transactions and previous hash
+        '''
+        hashable_txs = [tx.to_ordered_dict() for tx in transactions]
+        return (str(hashable_txs) + str(last_hash)).encode()
+
+    @staticmethod
+    def proof_hasher(prefix):
+        '''
+            Create a hash object seeded with a proof prefix (see proof_prefix)
+
+            Arguments:
+                :prefix: the encoded transactions and previous hash
+
+            Returns:
+                A sha256 hash object to pass to valid_seeded_proof
+        '''
+        return seeded_sha256(prefix)
+
+    @staticmethod
+    def valid_seeded_proof(hasher, proof, difficulty=DEFAULT_DIFFICULTY):
+        '''
+            Check to see if the current proof is valid, only hashing the proof digits
+
+            Arguments:
+                :hasher: a hash object created by proof_hasher (it is left untouched)
+                :proof: the proof number used for attempting to generate a valid hash
+                :difficulty: the amount of leading zero bits the hash needs
+
+            Returns:
+                True if the guessed hash has enough leading zero bits, False otherwise
+        '''
+        guess = hasher.copy()
+        guess.update(str(proof).encode())
+
+        # Compare the raw digest instead of hex encoding it
+        return guess.digest() <= difficulty_target(difficulty)
+
+    @classmethod
+    def valid_proof(cls, transactions, last_hash, proof, difficulty=DEFAULT_DIFFICULTY):
         '''
             Check to see if the current proof is valid
 
@@ -18,41 +103,98 @@ class Verification:
                 :transactions: the list of transactions on the block
                 :last_hash: the hash of the previous block
                 :proof: the proof number used for attempting to generate a valid hash
+                :difficulty: the amount of leading zero bits the hash needs
 
             Returns:
-                True if the guessed hash has two leading 0s, False otherwise
+                True if the guessed hash has enough leading zero bits, False otherwise
         '''
-        hashable_txs = [tx.to_ordered_dict() for tx in transactions]
-        guess = (str(hashable_txs) + str(last_hash) + str(proof)).encode()
-        guessed_hash = hash_string_256(guess)
+        hasher = cls.proof_hasher(cls.proof_prefix(transactions, last_hash))
+        return cls.valid_seeded_proof(hasher, proof, difficulty)
 
-        return guessed_hash[:2] == '00'
+    @classmethod
+    def verify_block(cls, block, previous_blocks):
+        '''
+            Verify a block against the blocks before it
+
+            Arguments:
+                :block: the block to verify
+                :previous_blocks: the last RETARGET_WINDOW (or less) blocks before the block, oldest first
+
+            Returns:
+                True if the block is valid, False otherwise
+        '''
+        previous_block = previous_blocks[-1]
+
+        if block.index != previous_block.index + 1:
+            print('The index of the block doesnt follow the previous block')
+            return False
+
+        # Ensure the current blocks previous hash matches the hash of the previous block
+        if block.previous_hash != previous_block.hash:
+            print('The previous hash doesnt match the hash of the block on the blockchain ')
+            return False
+
+        # Blocks mined before difficulties were stored were all mined at the default difficulty
+        difficulty = block_difficulty(block)
+        if block.difficulty is not None or previous_block.difficulty is not None:
+            if difficulty != next_difficulty(previous_blocks):
+                print('The difficulty of the block is invalid')
+                return False
+
+        # The retargeting is only as good as the timestamps it is calculated from
+        if block.difficulty is not None:
+            median = median_time(previous_blocks)
+            if median is not None and block.timestamp <= median:
+                print('The timestamp of the block isnt later than the median of the previous blocks')
+                return False
+
+        if block.timestamp > time() + MAX_FUTURE_BLOCK_TIME:
+            print('The timestamp of the block is too far in the future')
+            return False
+
+        #Select every part of the list except for the last element 
+        # in the transactions (the reward transaction) because it is not part of the proof of work calculation
+        if not cls.valid_proof(block.transactions[:-1], block.previous_hash, block.proof, difficulty):
+            print('Proof of work is invalid')
+            return False
+
+        # The block hash only covers the merkle root, so it has to match the transactions
+        if block.merkle_root is not None and block.merkle_root != merkle_root(block.transactions):
+            print('The merkle root doesnt match the transactions of the block')
+            return False
+
+        return True
 
     @classmethod
-    def verify_chain(cls, blockchain):
+    def verify_chain(cls, blockchain, incremental=False):
         '''
             Verify the current blockchain
 
+            Arguments:
+                :blockchain: the blockchain to verify
+                :incremental: only verify the blocks appended since the last successful verification
+
             Returns:
                 True if the blockchain is valid, False otherwise
         '''
+        start = blockchain.verified_height if incremental else 0
+
+        # Grab the previous blocks as well in order to check the hash and the difficulty of the first new block
+        first_index = max(start - RETARGET_WINDOW, 0)
+        blocks = blockchain.get_blocks(first_index)
 
         # Enumerate the blockchain in order to retrieve the current block & it's index
-        for index, block in enumerate(blockchain.chain):
-            if index == 0:
+        for offset, block in enumerate(blocks):
+            index = first_index + offset
+            if index == 0 or index < start:
                 continue
 
-            # Ensure the current blocks previous hash matches the hash of the previous block
-            if block.previous_hash != hash_block(blockchain.chain[index - 1]):
-                print('The previous hash doesnt match the hash of the block on the blockchain ')
-                return False
+            previous_blocks = blocks[max(offset - RETARGET_WINDOW, 0):offset]
 
-            #Select every part of the list except for the last element 
-            # in the transactions (the reward transaction) because it is not part of the proof of work calculation
-            if not cls.valid_proof(block.transactions[:-1], block.previous_hash, block.proof):
-                print('Proof of work is invalid')
+            if not cls.verify_block(block, previous_blocks):
                 return False
 
+        blockchain.verified_height = first_index + len(blocks)
         return True
 
     @staticmethod
@@ -72,23 +214,61 @@ class Verification:
         if check_funds:
             # Validate the signature on the transaction before checking the users funds
             if Wallet.verify_transaction(transaction):
-                sender_balance = get_balance()
+                sender_balance = get_balance(transaction.sender)
                 return sender_balance >= transaction.amount and transaction.amount > 0 and Wallet.verify_transaction(transaction)
             return False
 
         return Wallet.verify_transaction(transaction)
 
+    @staticmethod
+    def verify_signatures(transactions, workers=None, use_processes=False):
+        '''
+            Verify the signatures of a batch of transactions in parallel
+
+            Arguments:
+                :transactions: a list of transaction objects
+                :workers: the maximum amount of threads or processes to verify with
+                :use_processes: verify with a process pool instead of a thread pool
+
+            Returns:
+                A list with True or False for every transaction, in the same order
+        '''
+        transactions = list(transactions)
+
+        # Transactions that were verified before don't need to be verified again
+        results = [Wallet.cached_verification(tx) for tx in transactions]
+        unverified = [index for index, valid in enumerate(results) if valid is None]
+
+        if not unverified:
+            return results
+
+        batch = [transactions[index] for index in unverified]
+
+        if workers == 1 or len(batch) == 1:
+            verified = map(_verify_signature, batch)
+        else:
+            executor = _get_executor(workers, use_processes)
+            chunksize = max(1, len(batch) // (4 * (workers or 4))) if use_processes else 1
+            verified = executor.map(_verify_signature, batch, chunksize=chunksize)
+
+        for index, valid in zip(unverified, verified):
+            results[index] = valid
+            Wallet.cache_verification(transactions[index], valid)
+
+        return results
+
     @classmethod
-    def verify_transactions(cls, open_transactions, get_balance):
+    def verify_transactions(cls, open_transactions, get_balance, workers=None, use_processes=False):
         '''
             Validate that all open transactions within the open transactions
 
             Arguments:
                 :open_transactions: a list of open transaction objects
                 :get_balance: A reference to a function that can calculate the balance of a bc participant
+                :workers: the maximum amount of threads or processes to verify with
+                :use_processes: verify with a process pool instead of a thread pool
 
             Returns:
                 True if all transactions are valid, False otherwise.
         '''
-        return all(cls.verify_transaction(tx, get_balance, check_funds=False) for tx in open_transactions)
-
+        return all(cls.verify_signatures(open_transactions, workers, use_processes))
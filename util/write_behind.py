@@ -0,0 +1,214 @@
+'''
+    Write behind module - a storage wrapper that saves on a background thread
+
+    Saves are queued and merged: any amount of open transaction saves turns into one write of the
+    latest open transactions, and a backend that rewrites its whole file on every save (FileStorage)
+    writes the chain once for any amount of queued blocks. The queue is written once it holds
+    `max_pending` saves or `flush_interval` seconds after the first queued save, so callers
+    never wait on the disk unless they ask for a durability barrier (see flush).
+'''
+
+# std lib imports
+import threading
+import time
+
+# The amount of seconds between a first queued save and writing the queue
+DEFAULT_FLUSH_INTERVAL = 0.5
+
+# The amount of queued saves that are written straight away
+DEFAULT_MAX_PENDING = 1000
+
+class WriteBehindStorage:
+    '''
+        Wraps a storage backend (FileStorage, BlockLogStorage, ...) and saves to it on a background
+        thread, it can be passed to Blockchain like any other backend
+
+        Attributes:
+            :storage: the wrapped storage backend
+            :flush_interval: the amount of seconds a save may stay queued
+            :max_pending: the amount of queued saves that are written straight away
+            :sync_blocks: make every appended block durable before save_block returns
+    '''
+    def __init__(self, storage, flush_interval=DEFAULT_FLUSH_INTERVAL, max_pending=DEFAULT_MAX_PENDING,
+                 sync_blocks=True):
+        self.storage = storage
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.sync_blocks = sync_blocks
+        self.__blockchain = None
+        self.__length = 0
+        self.__blocks = []
+        self.__open_transactions = None
+        self.__queued = 0
+        self.__written = 0
+        self.__first_queued = None
+        self.__flush_requested = False
+        self.__error = None
+        self.__running = True
+        self.__condition = threading.Condition()
+        self.__write_lock = threading.Lock()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def load(self):
+        '''
+            Load the blockchain from the wrapped storage
+
+            Returns:
+                The blockchain and the open transactions
+        '''
+        return self.storage.load()
+
+    def __enqueue(self, blockchain, open_transactions, block=None):
+        '''
+            Queue a save, the open transactions are copied and the length of the chain is kept so the
+            saved chain and open transactions always match
+
+            Returns:
+                The number of the save (see flush)
+        '''
+        open_transactions = list(open_transactions)
+
+        with self.__condition:
+            self.__blockchain = blockchain
+            self.__length = len(blockchain)
+            self.__open_transactions = open_transactions
+
+            if block is not None:
+                self.__blocks.append(block)
+
+            self.__queued += 1
+            if self.__first_queued is None:
+                self.__first_queued = time.monotonic()
+
+            self.__condition.notify()
+            return self.__queued
+
+    def save_block(self, blockchain, block, open_transactions):
+        '''
+            Queue a block that was just appended to the blockchain, with sync_blocks the
+            block is durable once this returns
+
+            Arguments:
+                :blockchain: the blockchain (the block is the last block on it)
+                :block: the block that was appended
+                :open_transactions: the open transactions left after appending the block
+        '''
+        number = self.__enqueue(blockchain, open_transactions, block)
+
+        if self.sync_blocks:
+            self.flush(number)
+
+    def save_open_transactions(self, blockchain, open_transactions):
+        '''
+            Queue a save of the open transactions
+
+            Arguments:
+                :blockchain: the blockchain
+                :open_transactions: all open transactions
+        '''
+        self.__enqueue(blockchain, open_transactions)
+
+    def replace_blocks(self, blockchain, start, blocks, open_transactions):
+        '''
+            Replace every block from a height onward, after writing everything that is queued
+
+            Returns:
+                The new blockchain (see the replace_blocks of the wrapped storage)
+        '''
+        self.flush()
+
+        with self.__write_lock:
+            return self.storage.replace_blocks(blockchain, start, blocks, open_transactions)
+
+    def __run(self):
+        '''
+            Write the queue whenever it is full, the oldest save is due or a flush was requested
+        '''
+        while True:
+            with self.__condition:
+                while self.__running:
+                    if self.__queued != self.__written:
+                        waited = time.monotonic() - self.__first_queued
+                        remaining = self.flush_interval - waited
+
+                        if self.__flush_requested or remaining <= 0 or self.__queued - self.__written >= self.max_pending:
+                            break
+
+                        self.__condition.wait(remaining)
+                    else:
+                        self.__condition.wait()
+
+                if not self.__running and self.__queued == self.__written:
+                    return
+
+                blockchain, blocks = self.__blockchain[:self.__length], self.__blocks
+                open_transactions, queued = self.__open_transactions, self.__queued
+                self.__blocks = []
+                self.__first_queued = None
+                self.__flush_requested = False
+
+            try:
+                self.__write(blockchain, blocks, open_transactions)
+            except (IOError, OSError) as error:
+                print('Queued saves couldnt be written')
+                self.__error = error
+
+            with self.__condition:
+                self.__written = queued
+                self.__condition.notify_all()
+
+    def __write(self, blockchain, blocks, open_transactions):
+        '''
+            Write a merged batch of saves to the wrapped storage
+        '''
+        with self.__write_lock:
+            # One rewrite of the latest state covers every queued save
+            if getattr(self.storage, 'saves_whole_chain', False) or not blocks:
+                self.storage.save_open_transactions(blockchain, open_transactions)
+                return
+
+            for block in blocks:
+                self.storage.save_block(blockchain, block, open_transactions)
+
+    def flush(self, number=None):
+        '''
+            Durability barrier: write every queued save and fsync the wrapped storage
+
+            Arguments:
+                :number: only wait for the saves up to this number (defaults to every queued save)
+
+            Raises:
+                IOError if writing a queued save failed since the last flush
+        '''
+        with self.__condition:
+            target = self.__queued if number is None else number
+
+            if self.__written < target:
+                self.__flush_requested = True
+                self.__condition.notify_all()
+
+            while self.__written < target:
+                self.__condition.wait()
+
+            error, self.__error = self.__error, None
+
+        if error:
+            raise IOError('Queued saves couldnt be written') from error
+
+        with self.__write_lock:
+            self.storage.flush()
+
+    def close(self):
+        '''
+            Write everything that is queued, stop the background thread and close the wrapped storage
+        '''
+        try:
+            self.flush()
+        finally:
+            with self.__condition:
+                self.__running = False
+                self.__condition.notify_all()
+
+            self.__thread.join()
+            self.storage.close()
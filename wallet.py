@@ -13,6 +13,15 @@ from Crypto import Random
 
 # own imports
 from util.files import save_keys, load_keys
+from util.lru import LRUCache
+
+# The maximum amount of verification results and parsed public keys kept in memory
+SIGNATURE_CACHE_SIZE = 100000
+PUBLIC_KEY_CACHE_SIZE = 10000
+
+# Shared by every wallet within the process, a signed transaction is only verified once
+verified_signatures = LRUCache(SIGNATURE_CACHE_SIZE)
+public_keys = LRUCache(PUBLIC_KEY_CACHE_SIZE)
 
 class Wallet:
     '''
@@ -107,14 +116,30 @@ class Wallet:
         return str_signature
 
     @staticmethod
-    def verify_transaction(transaction):
+    def import_public_key(sender):
+        '''
+            Create an RSA public key object from a hex encoded public key, every key is only parsed once
+
+            Parameters:
+                :sender: the hex encoded public key
+        '''
+        public_key = public_keys.get(sender)
+
+        if public_key is None:
+            # Convert the public key into a binary encoded byte string and then
+            # create an RSA public key object from it
+            binary_key = binascii.unhexlify(sender)
+            public_key = RSA.importKey(binary_key)
+            public_keys.put(sender, public_key)
+
+        return public_key
+
+    @staticmethod
+    def verify_signature(transaction):
         '''
-            Verify a transaction from a user
+            Verify the signature of a transaction (without looking at the cached results)
         '''
-        # Convert the public key into a binary encoded byte string and then 
-        # create an RSA public key object from it
-        binary_key = binascii.unhexlify(transaction.sender)
-        public_key = RSA.importKey(binary_key)
+        public_key = Wallet.import_public_key(transaction.sender)
 
         # Create a new verifier object from the senders public key
         verifier = PKCS1_v1_5.new(public_key)
@@ -128,3 +153,36 @@ class Wallet:
         # Confirm whether or not the signature generated from the senders public key matches the
         # signature attached to the transaction
         return verifier.verify(payload, binary_signature)
+
+    @staticmethod
+    def cached_verification(transaction):
+        '''
+            Look up the verification result of a transaction that was already verified
+
+            Returns:
+                True or False if the transaction was verified before, None otherwise
+        '''
+        # The amount is part of the key as it's signed, 1 and 1.0 have different signatures
+        key = (transaction.sender, transaction.recipient, str(transaction.amount), transaction.signature)
+        return verified_signatures.get(key)
+
+    @staticmethod
+    def cache_verification(transaction, valid):
+        '''
+            Remember the verification result of a transaction
+        '''
+        key = (transaction.sender, transaction.recipient, str(transaction.amount), transaction.signature)
+        verified_signatures.put(key, valid)
+
+    @staticmethod
+    def verify_transaction(transaction):
+        '''
+            Verify a transaction from a user, every distinct transaction is only verified once
+        '''
+        valid = Wallet.cached_verification(transaction)
+
+        if valid is None:
+            valid = Wallet.verify_signature(transaction)
+            Wallet.cache_verification(transaction, valid)
+
+        return valid
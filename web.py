@@ -1,17 +1,68 @@
-from flask import Flask, jsonify
+import argparse
+import os
+import signal
+import subprocess
+import sys
+
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
+from werkzeug.serving import WSGIRequestHandler
 
 from blockchain import Blockchain
+from chain_api import chain_api
+from util.binary_format import fits_text
+from util.block_log import BlockLogStorage
+from util.block_store import BlockStoreStorage
+from util.files import parse_json_block, parse_json_tx, valid_amount, valid_peer_node
+from util.gossip import Gossip
+from util.jobs import MiningJobs
+from util.snapshot import SnapshotManager
+from util.write_behind import WriteBehindStorage
 from wallet import Wallet
 
 # Setup server
 app = Flask(__name__)
 CORS(app)
 
+# The read only routes are shared with the reader processes (see reader.py)
+app.register_blueprint(chain_api)
+
 # Setup wallet
 app.wallet = Wallet()
 app.blockchain = Blockchain(app.wallet.public_key)
 
+# Setup background mining
+app.mining_jobs = MiningJobs()
+
+# Setup announcing transactions and blocks to the peer nodes
+app.gossip = Gossip(app.blockchain)
+app.blockchain.gossip = app.gossip
+
+# Seconds between keep alive messages on a mining job stream
+STREAM_HEARTBEAT = 15
+
+# The maximum amount of transactions within a single /transactions/batch request
+MAX_TRANSACTION_BATCH = 10000
+
+def parse_transactions(json_transactions):
+    '''
+        Parse a list of json transactions sent to the api
+
+        Returns:
+            A list of transactions, with None for every malformed transaction
+    '''
+    transactions = []
+
+    for json_tx in json_transactions:
+        try:
+            transaction = parse_json_tx(json_tx)
+        except (KeyError, TypeError, ValueError):
+            transaction = None
+
+        transactions.append(transaction if transaction and valid_amount(transaction.amount) else None)
+
+    return transactions
+
 @app.route('/', methods=['GET'])
 def get_root():
     '''
@@ -36,7 +87,8 @@ def create_keys():
             'private_key': wallet.private_key,
         }
 
-        app.blockchain = Blockchain(wallet.public_key)
+        # Switch the wallet of the loaded blockchain instead of loading it again
+        app.blockchain.hosting_node = wallet.public_key
         return (jsonify(response), 201)
 
     # Keys weren't saved
@@ -57,7 +109,8 @@ def load_keys():
             'public_key': wallet.public_key,
             'private_key': wallet.private_key,
         }
-        app.blockchain = Blockchain(wallet.public_key)
+        # Switch the wallet of the loaded blockchain instead of loading it again
+        app.blockchain.hosting_node = wallet.public_key
         return (jsonify(response), 201)
 
     # Couldnt load the wallets 
@@ -66,50 +119,442 @@ def load_keys():
     }
     return (jsonify(response), 500)
 
-@app.route('/chain', methods=['GET'])
-def get_chain():
+@app.route('/transaction', methods=['POST'])
+def add_transaction():
     '''
-        Get a snapshot of the current chain
+        Send coins from the wallet to a recipient
+
+        Json body:
+            :recipient: the recipient of the coins
+            :amount: the amount of coins
 
         Status codes & Returns:
-           :200: returns a snapshot of the chain in json 
+            :201: the transaction was added to the open transactions (and announced to the peer nodes)
+            :400: the recipient or the amount is missing or invalid (the amount has to be a positive number)
+            :500: the wallet isn't set up or the transaction is invalid
     '''
+    wallet = app.wallet
     blockchain = app.blockchain
-    chain_snapshot = blockchain.chain
-    dict_chain = [block.__dict__.copy() for block in chain_snapshot]
-    for block in dict_chain:
-        block['transactions'] = [transaction.__dict__ for transaction in block['transactions']]
-    return (jsonify(dict_chain), 200)
+    values = request.get_json(silent=True)
+
+    if wallet.public_key is None:
+        response = {
+            'message': 'No wallet set up',
+        }
+        return (jsonify(response), 500)
+
+    if not isinstance(values, dict) or 'recipient' not in values or 'amount' not in values:
+        response = {
+            'message': 'The recipient and the amount are required',
+        }
+        return (jsonify(response), 400)
+
+    recipient = values['recipient']
+    amount = values['amount']
+
+    if not isinstance(recipient, str) or not fits_text(recipient) or not valid_amount(amount):
+        response = {
+            'message': 'The recipient has to be a string (of up to 65535 bytes) and the amount a positive number',
+        }
+        return (jsonify(response), 400)
+
+    signature = wallet.sign_transaction(wallet.public_key, recipient, amount)
+
+    if blockchain.add_transaction(wallet.public_key, recipient, signature, amount):
+        response = {
+            'message': 'Transaction added',
+            'transaction': {
+                'sender': wallet.public_key,
+                'recipient': recipient,
+                'signature': signature,
+                'amount': amount,
+            },
+            'balance': blockchain.get_balance(),
+        }
+        return (jsonify(response), 201)
+
+    response = {
+        'message': 'Adding the transaction failed',
+    }
+    return (jsonify(response), 500)
+
+@app.route('/transactions/batch', methods=['POST'])
+def add_transaction_batch():
+    '''
+        Add a batch of signed transactions, every transaction is accepted or rejected on its own
+
+        Json body:
+            :transactions: a list of transactions (sender, recipient, signature and amount)
+
+        Status codes & Returns:
+            :200: returns the amount of accepted and rejected transactions and whether each one
+                  was accepted (in the same order)
+            :400: the body doesn't contain a list of transactions, or too many of them
+    '''
+    blockchain = app.blockchain
+    values = request.get_json(silent=True)
+
+    if not isinstance(values, dict) or not isinstance(values.get('transactions'), list):
+        response = {
+            'message': 'A list of transactions is required',
+        }
+        return (jsonify(response), 400)
+
+    if len(values['transactions']) > MAX_TRANSACTION_BATCH:
+        response = {
+            'message': f'A batch can contain at most {MAX_TRANSACTION_BATCH} transactions',
+        }
+        return (jsonify(response), 400)
+
+    transactions = parse_transactions(values['transactions'])
+    valid = [tx for tx in transactions if tx is not None]
+
+    added = iter(blockchain.add_transactions(valid))
+    results = [tx is not None and next(added) for tx in transactions]
+
+    response = {
+        'accepted': sum(results),
+        'rejected': len(results) - sum(results),
+        'results': results,
+    }
+    return (jsonify(response), 200)
+
+@app.route('/broadcast/transactions', methods=['POST'])
+def broadcast_transactions():
+    '''
+        Receive a batch of transactions announced by a peer node
+
+        Json body:
+            :transactions: a list of transactions
+
+        Status codes & Returns:
+            :200: returns the amount of transactions that were added to the open transactions
+            :400: the body doesn't contain a list of transactions
+    '''
+    blockchain = app.blockchain
+    values = request.get_json(silent=True)
+
+    if not isinstance(values, dict) or not isinstance(values.get('transactions'), list):
+        response = {
+            'message': 'A list of transactions is required',
+        }
+        return (jsonify(response), 400)
+
+    # Transactions that went around the network back to this node are ignored
+    transactions = [
+        tx for tx in parse_transactions(values['transactions'])
+        if tx is not None and app.gossip.mark_seen(tx)
+    ]
+    results = blockchain.add_transactions(transactions)
+
+    response = {
+        'message': 'Transactions received',
+        'added': sum(results),
+    }
+    return (jsonify(response), 200)
+
+@app.route('/broadcast/blocks', methods=['POST'])
+def broadcast_blocks():
+    '''
+        Receive blocks announced by a peer node, in order
+
+        Json body:
+            :blocks: a list of blocks
+
+        Status codes & Returns:
+            :200: returns the amount of blocks that were appended to the chain
+            :400: the body doesn't contain a list of blocks
+            :409: the blocks don't follow the local chain, the conflict is resolved with the peer nodes
+    '''
+    blockchain = app.blockchain
+    values = request.get_json(silent=True)
+
+    if not isinstance(values, dict) or not isinstance(values.get('blocks'), list):
+        response = {
+            'message': 'A list of blocks is required',
+        }
+        return (jsonify(response), 400)
+
+    added = 0
+    for json_block in values['blocks']:
+        try:
+            block = parse_json_block(json_block)
+        except (KeyError, TypeError, ValueError):
+            continue
+
+        if blockchain.add_block(block):
+            added += 1
+            continue
+
+        # The peer node has a longer chain, either ahead of this one or forked off its last block
+        tip = blockchain.get_last_blockchain_value()
+        if block.index > len(blockchain) or (block.index == len(blockchain) and block.previous_hash != tip.hash):
+            app.gossip.request_resolve()
+            response = {
+                'message': 'The blocks dont follow the local chain, resolving conflicts',
+                'added': added,
+            }
+            return (jsonify(response), 409)
+
+    response = {
+        'message': 'Blocks received',
+        'added': added,
+    }
+    return (jsonify(response), 200)
+
+@app.route('/resolve-conflicts', methods=['POST'])
+def resolve_conflicts():
+    '''
+        Replace the local chain with the valid chain of the peer nodes that took the most work to mine
+
+        Status codes & Returns:
+            :200: returns whether the local chain was replaced
+    '''
+    replaced = app.gossip.resolve_conflicts()
+
+    response = {
+        'message': 'Chain was replaced' if replaced else 'Local chain kept',
+        'replaced': replaced,
+        'length': len(app.blockchain),
+    }
+    return (jsonify(response), 200)
+
+@app.route('/nodes', methods=['GET'])
+def get_nodes():
+    '''
+        Get the peer nodes
+
+        Status codes & Returns:
+            :200: returns the addresses (host:port) of every peer node
+    '''
+    response = {
+        'all_nodes': app.blockchain.get_peer_nodes(),
+    }
+    return (jsonify(response), 200)
+
+@app.route('/nodes', methods=['POST'])
+def add_nodes():
+    '''
+        Add peer nodes
+
+        Json body:
+            :node: the address (host:port) of a peer node, or
+            :nodes: a list of addresses
+
+        Status codes & Returns:
+            :201: returns the addresses of every peer node
+            :400: no node was given or a node isn't an address (host:port)
+    '''
+    blockchain = app.blockchain
+    values = request.get_json(silent=True)
+
+    if not isinstance(values, dict):
+        values = {}
+
+    nodes = values.get('nodes') or ([values['node']] if values.get('node') else [])
+
+    if not nodes:
+        response = {
+            'message': 'No node was given',
+        }
+        return (jsonify(response), 400)
+
+    if not isinstance(nodes, list) or not all(valid_peer_node(node) for node in nodes):
+        response = {
+            'message': 'Every node has to be an address (host:port)',
+        }
+        return (jsonify(response), 400)
+
+    for node in nodes:
+        blockchain.add_peer_node(node)
+
+    response = {
+        'message': 'Nodes added',
+        'all_nodes': blockchain.get_peer_nodes(),
+    }
+    return (jsonify(response), 201)
+
+@app.route('/nodes/<node>', methods=['DELETE'])
+def remove_node(node):
+    '''
+        Remove a peer node
+
+        Status codes & Returns:
+            :200: returns the addresses of the remaining peer nodes
+    '''
+    blockchain = app.blockchain
+    blockchain.remove_peer_node(node)
+
+    response = {
+        'message': 'Node removed',
+        'all_nodes': blockchain.get_peer_nodes(),
+    }
+    return (jsonify(response), 200)
 
 @app.route('/mine', methods=['POST'])
 def mine():
     '''
-        Mine a block on the blockchain
+        Start mining a block on the blockchain in the background
+
+        Status codes & Returns:
+            :202: the mining job was started, returns the job (poll /mine/<job_id> for the result)
+            :500: the wallet isn't set up
     '''
     # reference bc and wallet
     blockchain = app.blockchain
     wallet = app.wallet
 
-    # mine a new block
-    block = blockchain.mine_block()
+    # Mining can't succeed without a wallet
+    if not blockchain.hosting_node:
+        response = {
+            'message': 'Adding a block failed',
+            'wallet_set_up': wallet.public_key is not None
+        }
+        return (jsonify(response), 500)
+
+    job = app.mining_jobs.submit(blockchain)
+    body = f'{{"message": "Mining started", "job": {job.to_json()}}}'
+    return Response(body, status=202, mimetype='application/json', headers={'Location': f'/mine/{job.job_id}'})
 
-    # Check if a block was returned
-    if block:
-        dict_block = block.__dict__.copy()
-        dict_block['transactions'] = [transaction.__dict__ for transaction in dict_block['transactions']]
+@app.route('/mine/<job_id>', methods=['GET'])
+def get_mining_job(job_id):
+    '''
+        Poll a mining job
 
+        Status codes & Returns:
+            :200: returns the job, including the block once it is done
+            :404: the job doesn't exist
+    '''
+    job = app.mining_jobs.get(job_id)
+
+    if not job:
         response = {
-            'message': 'A block was successfully added to the blockchain',
-            'block': dict_block
+            'message': 'Mining job not found',
         }
-        return (jsonify(response), 201)
+        return (jsonify(response), 404)
 
-    # Mining the block was unsuccessful
-    response = {
-        'message': 'Adding a block failed',
-        'wallet_set_up': not wallet.public_key
-    }
-    return (jsonify(response), 500)
+    # The block is embedded as its memoized json instead of being serialized again
+    body = f'{{"job": {job.to_json()}}}'
+    return Response(body, status=200, mimetype='application/json')
+
+@app.route('/mine/<job_id>/stream', methods=['GET'])
+def stream_mining_job(job_id):
+    '''
+        Stream the status changes of a mining job as server sent events, the stream ends
+        once the job is done or failed
+
+        Status codes & Returns:
+            :200: an event stream of the job
+            :404: the job doesn't exist
+    '''
+    mining_jobs = app.mining_jobs
+    job = mining_jobs.get(job_id)
+
+    if not job:
+        response = {
+            'message': 'Mining job not found',
+        }
+        return (jsonify(response), 404)
+
+    def events():
+        status = None
+
+        while status not in ('done', 'failed'):
+            new_status = mining_jobs.wait(job, status, timeout=STREAM_HEARTBEAT)
+
+            # Keep the connection alive while the job is still running
+            if new_status == status:
+                yield ': heartbeat\n\n'
+                continue
+
+            status = new_status
+            yield f'data: {job.to_json()}\n\n'
+
+    return Response(events(), mimetype='text/event-stream')
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
+    # Several nodes can run on one machine, each from its own directory (for its own blockchain and wallet files)
+    parser = argparse.ArgumentParser(description='Run a blockchain node')
+    parser.add_argument('-p', '--port', type=int, default=5000, help='the port to listen on')
+    parser.add_argument('--host', default='0.0.0.0', help='the address to listen on')
+    parser.add_argument('--peer', action='append', default=[], help='the address (host:port) of a peer node, can be repeated')
+    parser.add_argument('--write-behind', action='store_true', help='save open transactions on a background thread')
+    storage_group = parser.add_mutually_exclusive_group()
+    storage_group.add_argument('--block-store', help='store the blockchain in a block store within this directory')
+    storage_group.add_argument('--block-log', help='store the blockchain in an append only block log within this directory')
+    parser.add_argument('--lazy', action='store_true', help='only read the blocks of the block log when they\'re accessed')
+    parser.add_argument('--mempool-size', type=int, help='the maximum amount of open transactions, the oldest ones are evicted')
+    parser.add_argument('--mempool-max-age', type=float, help='the amount of seconds a transaction can stay open before it\'s evicted')
+    parser.add_argument('--snapshots', help='save ledger snapshots within this directory and start from the latest one')
+    parser.add_argument('--readers', type=int, default=0, help='the amount of processes serving the read only routes (see reader.py)')
+    parser.add_argument('--reader-port', type=int, help='the port the reader processes listen on (defaults to port + 1)')
+    args = parser.parse_args()
+
+    if args.lazy and not args.block_log:
+        parser.error('--lazy requires --block-log')
+
+    if args.readers and args.block_log:
+        parser.error('the reader processes read the blockchain from a block store, --readers can\'t be used with --block-log')
+
+    # The reader processes read the blockchain from the block store
+    if args.readers and not args.block_store:
+        args.block_store = 'blockstore'
+
+    if args.snapshots:
+        app.blockchain.snapshots = SnapshotManager(args.snapshots)
+
+    if args.mempool_size is not None:
+        app.blockchain.mempool_max_size = args.mempool_size
+
+    if args.mempool_max_age is not None:
+        app.blockchain.mempool_max_age = args.mempool_max_age
+
+    if args.block_store:
+        # The block store is started from the blockchain file the first time
+        app.blockchain.storage = BlockStoreStorage(args.block_store)
+
+    if args.block_log:
+        # The block log is started from the blockchain file the first time as well
+        app.blockchain.storage = BlockLogStorage(args.block_log, lazy=args.lazy)
+
+    # Reload with the new settings (the mempool is rebuilt with its limits as well)
+    if args.snapshots or args.block_store or args.block_log or args.mempool_size is not None \
+            or args.mempool_max_age is not None:
+        app.blockchain.load_data()
+
+    if args.write_behind:
+        app.blockchain.storage = WriteBehindStorage(app.blockchain.storage)
+
+    for peer in args.peer:
+        app.blockchain.add_peer_node(peer)
+
+    # Keep connections alive, peer nodes send every announcement over the same connection
+    WSGIRequestHandler.protocol_version = 'HTTP/1.1'
+
+    readers = None
+    if args.readers:
+        reader_port = args.reader_port or args.port + 1
+        reader_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reader.py')
+        reader_args = [
+            sys.executable, reader_script, '--host', args.host, '--port', str(reader_port),
+            '--block-store', args.block_store, '--workers', str(args.readers)
+        ]
+
+        # The reader processes start their ledgers from the snapshots of the node as well
+        if args.snapshots:
+            reader_args += ['--snapshots', args.snapshots]
+
+        readers = subprocess.Popen(reader_args)
+
+    # Stopping the node runs the clean up below as well (the reader processes and the queued saves)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    try:
+        app.run(host=args.host, port=args.port, threaded=True)
+    finally:
+        if readers:
+            readers.terminate()
+            readers.wait()
+
+        # Stop the mining processes and write everything that is still queued
+        app.blockchain.close()